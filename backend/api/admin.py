@@ -1,3 +1,16 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import DiaryEntry, ResumeVersion
+
+
+@admin.register(DiaryEntry)
+class DiaryEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'entry_date', 'entry_type', 'created_at')
+    list_filter = ('entry_type',)
+    search_fields = ('user', 'content')
+
+
+@admin.register(ResumeVersion)
+class ResumeVersionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'number', 'provider', 'last_entry_id', 'delta_entries', 'created_at')
+    search_fields = ('user',)
@@ -4,10 +4,17 @@ from django.apps import AppConfig
 This module defines the configuration for the 'api' application.
 
 Classes:
-    ApiConfig: Configures the 'api' application with default settings.
+    ApiConfig: Configures the 'api' application with default settings and registers its system checks.
 """
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.core import checks
+
+        from .checks import check_hedging
+
+        checks.register(check_hedging)
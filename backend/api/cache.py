@@ -0,0 +1,358 @@
+"""
+Content-addressed cache for the structured resume JSON produced by the AI providers.
+
+Every entry is keyed by a SHA-256 digest of the unstructured input text together with
+everything that can change the provider output (provider, model, prompt version and
+temperature), so an unchanged resume never pays for a second LLM round trip.
+
+Classes:
+    CacheBackend: Minimal byte-oriented interface implemented by every storage backend.
+    MemoryLRUBackend: In-process LRU bounded by the total size of the stored payloads.
+    DiskBackend: One file per entry under a local directory, written atomically.
+    S3Backend: One object per entry under an S3 prefix next to the source text.
+    NullBackend: Backend that never stores anything (cache disabled).
+    ResultCache: JSON (de)serialization on top of a backend plus hit/miss accounting.
+
+Functions:
+    make_cache_key(text, provider, model, prompt_version, temperature): Builds the content hash.
+    build_result_cache(): Creates the ResultCache configured in settings.
+    get_result_cache(): Returns the process-wide ResultCache, building it on first use.
+    cache_metric_lines(): Exposes the counters of the process-wide ResultCache on /metrics.
+"""
+import os
+import json
+import time
+import logging
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .metrics import REGISTRY
+from .storage import get_s3_client, is_missing_key_error
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(text, provider, model, prompt_version, temperature):
+    """
+    Builds the content-addressed key for a provider result.
+
+    Args:
+        text (str): The unstructured resume text sent to the provider.
+        provider (str): Provider name (e.g. 'deepseek', 'chatgpt').
+        model (str): Model identifier sent in the payload.
+        prompt_version (str): Version of the instruction prompt.
+        temperature (float): Sampling temperature sent in the payload.
+    Returns:
+        str: Hex SHA-256 digest identifying the result.
+    """
+    digest = hashlib.sha256()
+    for part in (provider, model, str(prompt_version), repr(float(temperature))):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(text.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CacheBackend:
+    """Stores opaque byte payloads by key. Subclasses implement get/set/delete."""
+
+    name = 'base'
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class NullBackend(CacheBackend):
+    name = 'none'
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, key):
+        pass
+
+
+class MemoryLRUBackend(CacheBackend):
+    """
+    Thread-safe LRU cache that evicts the least recently used entries once the total
+    size of the stored payloads exceeds max_bytes.
+    """
+
+    name = 'memory'
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous)
+            self._entries[key] = value
+            self.current_bytes += len(value)
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def delete(self, key):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= len(previous)
+
+
+class DiskBackend(CacheBackend):
+    """Stores each entry as <directory>/<key[:2]>/<key><suffix>."""
+
+    name = 'disk'
+
+    def __init__(self, directory, suffix='.json'):
+        self.directory = str(directory)
+        self.suffix = suffix
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}{self.suffix}")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as handle:
+                return handle.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                handle.write(value)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3Backend(CacheBackend):
+    """Stores each entry as s3://<bucket>/<prefix><key><suffix>."""
+
+    name = 's3'
+
+    def __init__(self, bucket, prefix, client=None, suffix='.json', content_type='application/json'):
+        self._client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.suffix = suffix
+        self.content_type = content_type
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = get_s3_client()
+        return self._client
+
+    def _key(self, key):
+        return f"{self.prefix}{key}{self.suffix}"
+
+    def get(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if is_missing_key_error(e):
+                return None
+            raise
+        return obj['Body'].read()
+
+    def set(self, key, value):
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self._key(key),
+            Body=value,
+            ContentType=self.content_type,
+        )
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+
+class ResultCache:
+    """
+    Caches parsed provider results and keeps counters of how much work the cache saved.
+
+    Each entry stores the result together with the provider latency measured when it was
+    generated, so every hit adds that latency to `saved_seconds`.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.errors = 0
+        self.saved_seconds = 0.0
+
+    def get(self, key):
+        """
+        Returns the cached result for key, or None on a miss.
+
+        Backend failures are counted and treated as misses so a broken cache never
+        breaks resume generation.
+        """
+        try:
+            raw = self.backend.get(key)
+            entry = json.loads(raw) if raw is not None else None
+        except Exception as e:
+            logger.warning("Resume cache read failed (%s): %s", self.backend.name, e)
+            with self._lock:
+                self.errors += 1
+                self.misses += 1
+            return None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += entry.get('elapsed', 0.0)
+        return entry['result']
+
+    def set(self, key, result, elapsed=0.0):
+        """
+        Stores result under key.
+
+        Args:
+            key (str): Key returned by make_cache_key.
+            result (dict): Parsed structured resume.
+            elapsed (float): Seconds the provider call took to produce the result.
+        """
+        entry = {'result': result, 'elapsed': elapsed, 'created_at': time.time()}
+        try:
+            self.backend.set(key, json.dumps(entry, separators=(',', ':')).encode('utf-8'))
+        except Exception as e:
+            logger.warning("Resume cache write failed (%s): %s", self.backend.name, e)
+            with self._lock:
+                self.errors += 1
+            return
+        with self._lock:
+            self.stores += 1
+
+    def stats(self):
+        """Returns a snapshot of the cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'backend': self.backend.name,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'errors': self.errors,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'provider_calls_saved': self.hits,
+                'provider_seconds_saved': round(self.saved_seconds, 3),
+            }
+        if isinstance(self.backend, MemoryLRUBackend):
+            stats['bytes'] = self.backend.current_bytes
+            stats['max_bytes'] = self.backend.max_bytes
+        return stats
+
+
+def build_result_cache():
+    """
+    Creates the ResultCache selected by settings.RESUME_CACHE_BACKEND.
+
+    Returns:
+        ResultCache: The configured cache.
+    """
+    backend_name = settings.RESUME_CACHE_BACKEND
+    if backend_name == 'memory':
+        backend = MemoryLRUBackend(settings.RESUME_CACHE_MAX_BYTES)
+    elif backend_name == 'disk':
+        backend = DiskBackend(settings.RESUME_CACHE_DIR)
+    elif backend_name == 's3':
+        backend = S3Backend(settings.AWS_STORAGE_BUCKET_NAME, settings.RESUME_CACHE_S3_PREFIX)
+    elif backend_name == 'none':
+        backend = NullBackend()
+    else:
+        raise ValueError(f"Unknown RESUME_CACHE_BACKEND: {backend_name}")
+    return ResultCache(backend)
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Returns the ResultCache of this process, building it on first use."""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = build_result_cache()
+    return _result_cache
+
+
+# Counter name and help text of each ResultCache.stats() value exported on /metrics
+CACHE_METRICS = (
+    ('hits', 'dagbok_resume_cache_hits_total', 'counter', 'Result cache lookups answered from the cache.'),
+    ('misses', 'dagbok_resume_cache_misses_total', 'counter', 'Result cache lookups that missed.'),
+    ('stores', 'dagbok_resume_cache_stores_total', 'counter', 'Results written to the cache.'),
+    ('errors', 'dagbok_resume_cache_errors_total', 'counter', 'Failed cache backend reads and writes.'),
+    ('provider_seconds_saved', 'dagbok_resume_cache_saved_seconds_total', 'counter',
+     'Provider latency avoided by cache hits.'),
+    ('bytes', 'dagbok_resume_cache_bytes', 'gauge', 'Payload bytes held by the in-memory cache.'),
+)
+
+
+def cache_metric_lines():
+    """Returns the result cache counters in Prometheus text format (nothing before the cache is used)."""
+    if _result_cache is None:
+        return []
+    stats = _result_cache.stats()
+    lines = []
+    for field, name, kind, documentation in CACHE_METRICS:
+        if field in stats:
+            lines += [
+                f"# HELP {name} {documentation}",
+                f"# TYPE {name} {kind}",
+                f'{name}{{backend="{stats["backend"]}"}} {stats[field]}',
+            ]
+    return lines
+
+
+REGISTRY.register_collector(cache_metric_lines)
@@ -0,0 +1,20 @@
+"""
+System checks of the 'api' settings, run by manage.py (check, runserver, migrate) at startup.
+
+Functions:
+    check_hedging(app_configs): Warns when RESUME_HEDGE_AFTER is set but cannot take effect.
+"""
+from django.conf import settings
+from django.core.checks import Warning
+
+
+def check_hedging(app_configs, **kwargs):
+    """Hedged calls go to the fallback providers, so RESUME_HEDGE_AFTER does nothing without them."""
+    if settings.RESUME_HEDGE_AFTER > 0 and not settings.RESUME_PROVIDER_FALLBACK:
+        return [Warning(
+            "RESUME_HEDGE_AFTER is set but RESUME_PROVIDER_FALLBACK is off, so no call is ever hedged.",
+            hint="Set RESUME_PROVIDER_FALLBACK=True to let hedged calls reach the other provider, "
+                 "or unset RESUME_HEDGE_AFTER.",
+            id='api.W001',
+        )]
+    return []
@@ -0,0 +1,151 @@
+"""
+Map-reduce processing of diaries too long for a single provider call.
+
+The diary is split on entry boundaries (dated lines or blank-line separated paragraphs) into chunks
+that fit a token budget. Every chunk is structured by the provider concurrently (map) and the partial
+resumes are merged and deduplicated into one (reduce). Chunks go through the same content-addressed
+result cache as whole texts, so after an edit only the chunks whose text changed are sent again.
+
+Functions:
+    estimate_tokens(text): Cheap token count estimate.
+    parse_entry_date(entry): The date opening a diary entry.
+    split_entries(text): Splits a diary into entries.
+    chunk_text(text, max_tokens): Packs entries into chunks of at most max_tokens.
+    reduce_partials(partials): Merges partial resumes in chronological order.
+    process_chunks(chunks, process, workers): Structures chunks concurrently and reduces the results.
+"""
+import re
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from .incremental import merge_resume
+
+# Lines opening a new diary entry: "[2024-05-01]", "2024-05-01", "2024/05/01" or "01/05/2024"
+ENTRY_START_RE = re.compile(r'^\s*\[?(\d{4}[-/]\d{2}[-/]\d{2}|\d{1,2}/\d{1,2}/\d{2,4})\b')
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y', '%d/%m/%y')
+
+# Rough characters-per-token ratio of the providers' tokenizers for English/Portuguese prose
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Returns an estimate of the number of tokens of text."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def parse_entry_date(entry):
+    """Returns the date opening a diary entry, or None if it does not start with a known date format."""
+    match = ENTRY_START_RE.match(entry)
+    if not match:
+        return None
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(match.group(1), date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def split_entries(text):
+    """
+    Splits text into diary entries.
+
+    A new entry starts at every line beginning with a date and after every blank line; the
+    separators are kept so joining the entries gives back the original text.
+    """
+    entries = []
+    current = []
+    previous_blank = False
+    for line in text.splitlines(keepends=True):
+        blank = not line.strip()
+        if current and not blank and (previous_blank or ENTRY_START_RE.match(line)):
+            entries.append(''.join(current))
+            current = []
+        current.append(line)
+        previous_blank = blank
+    if current:
+        entries.append(''.join(current))
+    return entries
+
+
+def _split_oversized(entry, max_chars):
+    """Splits a single entry larger than the budget on line boundaries, then on characters."""
+    pieces = []
+    current = ''
+    for line in entry.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ''
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if len(current) + len(line) > max_chars:
+            pieces.append(current)
+            current = ''
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(text, max_tokens):
+    """
+    Packs consecutive diary entries into chunks of at most max_tokens (estimated).
+
+    Packing is greedy and deterministic, so appending entries to a diary leaves the earlier chunks
+    byte-identical and their cached results reusable.
+
+    Returns:
+        list: The chunks, in diary order. A text within budget is returned as a single chunk.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = ''
+    for entry in split_entries(text):
+        pieces = _split_oversized(entry, max_chars) if len(entry) > max_chars else [entry]
+        for piece in pieces:
+            if current and len(current) + len(piece) > max_chars:
+                chunks.append(current)
+                current = ''
+            current += piece
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def reduce_partials(partials):
+    """
+    Merges partial resumes produced from consecutive chunks of the diary.
+
+    Sections are merged and deduplicated with merge_resume (experience by company and role, skills,
+    education and additional information by value). The title and summary of the latest chunk that
+    has them win, since they describe the most recent state of the career.
+    """
+    resume = {}
+    for partial in partials:
+        resume = merge_resume(resume, partial) if resume else dict(partial)
+        if partial.get('title'):
+            resume['title'] = partial['title']
+        if (partial.get('summary') or {}).get('professional_summary'):
+            resume['summary'] = partial['summary']
+    return resume
+
+
+def process_chunks(chunks, process, workers):
+    """
+    Structures every chunk concurrently and reduces the partial resumes.
+
+    Args:
+        chunks (list): Chunks returned by chunk_text.
+        process (callable): Function (text) -> dict | None structuring one chunk.
+        workers (int): Maximum number of concurrent provider calls.
+    Returns:
+        dict: The merged resume, or None if any chunk failed (its siblings stay cached for the retry).
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks))), thread_name_prefix='resume-chunk') as executor:
+        partials = list(executor.map(process, chunks))
+    if any(partial is None for partial in partials):
+        return None
+    return reduce_partials(partials)
@@ -0,0 +1,235 @@
+"""
+Conditional and pre-compressed responses for the resume endpoints.
+
+A resume is identified by a strong ETag derived from its stored version (the ETag of resume.json in
+S3, or the id of a ResumeVersion), so a request carrying a matching If-None-Match is answered with
+304 before any body is built. Bodies are serialized once per version and kept with their gzip and
+brotli variants in a bounded in-process cache; every encoding gets its own ETag suffix since the
+bytes differ. Responses also carry X-Accel-Expires so the nginx micro-cache in front of /resume/
+(docker/nginx/nginx.conf) can answer dashboard reloads without reaching Django, while browsers are
+told to revalidate every time.
+
+Exported files (PDF resumes) are immutable bytes per version too: file_response answers them with the
+same strong ETag logic plus single byte ranges (Range/If-Range), so an interrupted download resumes
+where it stopped.
+
+Functions:
+    make_etag(version): Returns the strong ETag of a resume version.
+    etag_matches(request, etag): Tells whether If-None-Match names the resume version (any encoding).
+    choose_encoding(request): Picks 'br', 'gzip' or 'identity' from Accept-Encoding.
+    not_modified_response(request, etag): Returns the 304 answer for a resume version.
+    resume_response(request, etag, data): Returns the 200 answer, reusing the stored encoded variants.
+    parse_range(header, size): Returns the (start, end) byte range requested by a Range header.
+    file_response(request, etag, body, content_type, filename, immutable): Returns static bytes with range support.
+"""
+import re
+import gzip
+import json
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import content_disposition_header
+
+from .cache import MemoryLRUBackend
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip variants are produced
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed: the encoding overhead outweighs the saving
+MIN_COMPRESS_BYTES = 256
+ENCODING_SUFFIXES = {'identity': '', 'gzip': '-gzip', 'br': '-br'}
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def make_etag(version):
+    """Returns the strong ETag ("<version>") of a resume version token (e.g. an S3 ETag or 'rv42')."""
+    return '"%s"' % str(version).strip('"')
+
+
+def _base_etag(etag):
+    etag = etag.strip()
+    if etag.startswith('W/'):
+        etag = etag[2:]
+    for suffix in ('-gzip"', '-br"'):
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+def etag_matches(request, etag):
+    """
+    Returns True if the If-None-Match header of request names the version etag.
+
+    Weak comparison is used, as RFC 9110 requires for If-None-Match, and the encoding suffixes are
+    ignored so a client holding the gzip variant gets a 304 too.
+    """
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    return any(_base_etag(candidate) == etag for candidate in header.split(','))
+
+
+def choose_encoding(request):
+    """Returns the best content coding accepted by the client among 'br', 'gzip' and 'identity'."""
+    accepted = {}
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return 'identity'
+
+
+def _encode(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=11)
+    if encoding == 'gzip':
+        # mtime=0 keeps the bytes (and so the ETag) identical across processes
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    return body
+
+
+_variants = None
+_variants_lock = threading.Lock()
+
+
+def _get_variants():
+    global _variants
+    with _variants_lock:
+        if _variants is None:
+            _variants = MemoryLRUBackend(settings.RESUME_VARIANT_CACHE_BYTES)
+        return _variants
+
+
+def _cache_headers(response, etag, encoding):
+    response['ETag'] = etag[:-1] + ENCODING_SUFFIXES[encoding] + '"'
+    response['Vary'] = 'Accept-Encoding'
+    # Browsers revalidate every time (cheap thanks to the ETag); nginx may reuse it for a few seconds
+    response['Cache-Control'] = 'private, no-cache'
+    if settings.RESUME_MICROCACHE_SECONDS:
+        response['X-Accel-Expires'] = str(settings.RESUME_MICROCACHE_SECONDS)
+    return response
+
+
+def not_modified_response(request, etag):
+    """Returns the 304 answer for the resume version etag."""
+    return _cache_headers(HttpResponseNotModified(), etag, choose_encoding(request))
+
+
+def resume_response(request, etag, data):
+    """
+    Returns the resume data as JSON, encoded as the client prefers.
+
+    The serialized body and its compressed variants are stored under the version etag, so they are
+    built once per version and process instead of once per request.
+
+    Args:
+        request: The incoming request.
+        etag (str): ETag returned by make_etag for the version of data.
+        data (dict): The resume.
+    Returns:
+        HttpResponse: 304 if If-None-Match names the version, 200 with the encoded body otherwise.
+    """
+    if etag_matches(request, etag):
+        return not_modified_response(request, etag)
+    variants = _get_variants()
+    identity = variants.get(f"{etag}:identity")
+    if identity is None:
+        # Same bytes as DRF's JSONRenderer produces
+        identity = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        variants.set(f"{etag}:identity", identity)
+
+    encoding = choose_encoding(request) if len(identity) >= MIN_COMPRESS_BYTES else 'identity'
+    body = identity
+    if encoding != 'identity':
+        body = variants.get(f"{etag}:{encoding}")
+        if body is None:
+            body = _encode(identity, encoding)
+            variants.set(f"{etag}:{encoding}", body)
+
+    response = HttpResponse(body, content_type='application/json')
+    if encoding != 'identity':
+        response['Content-Encoding'] = encoding
+    return _cache_headers(response, etag, encoding)
+
+
+def parse_range(header, size):
+    """
+    Returns the byte range requested by a Range header for a body of size bytes.
+
+    Only single ranges are honored; multiple ranges and malformed headers are ignored, which
+    RFC 9110 allows (the whole body is sent instead).
+
+    Returns:
+        tuple: (start, end) inclusive, None to send the whole body, or False if the range cannot be
+            satisfied.
+    """
+    match = RANGE_RE.match((header or '').replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return False
+    return start, end
+
+
+def file_response(request, etag, body, content_type, filename, immutable=False):
+    """
+    Returns an immutable file (one version of an export) as an attachment.
+
+    Args:
+        request: The incoming request.
+        etag (str): Strong ETag identifying body.
+        body (bytes): The file.
+        content_type (str): Its media type.
+        filename (str): Download name sent in Content-Disposition.
+        immutable (bool): True if the URL always names this version, so browsers may keep it without
+            revalidating; otherwise they revalidate every time (cheap thanks to the ETag).
+    Returns:
+        HttpResponse: 304 if If-None-Match names etag, 206 for a satisfiable Range (ignored when an
+            If-Range names another version), 416 for an unsatisfiable one, 200 otherwise.
+    """
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        byte_range = None
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if not if_range or if_range.strip() == etag:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), len(body))
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{len(body)}"
+        elif byte_range is None:
+            response = HttpResponse(body, content_type=content_type)
+        else:
+            start, end = byte_range
+            response = HttpResponse(body[start:end + 1], content_type=content_type, status=206)
+            response['Content-Range'] = f"bytes {start}-{end}/{len(body)}"
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = 'private, max-age=31536000, immutable' if immutable else 'private, no-cache'
+    return response
@@ -0,0 +1,132 @@
+"""
+Near-duplicate collapsing of diary entries before they are sent to a provider.
+
+Daily diaries repeat themselves ("worked on the billing service again"), and every repetition costs
+prompt tokens without adding anything to the resume. Each entry (as split by api/chunking.py) gets a
+64-bit SimHash of its words and word pairs, ignoring its leading date; entries whose fingerprints
+differ in at most settings.RESUME_DEDUP_MAX_DISTANCE bits are collapsed into the first of them,
+annotated with the number of occurrences and their date range. Fingerprints are memoized per entry
+text, so a diary that grows by a few entries only fingerprints the new ones, and candidates are found
+through 16-bit bands of the fingerprint instead of comparing every pair of entries.
+
+Functions:
+    simhash(text): The 64-bit SimHash fingerprint of an entry.
+    hamming(a, b): Number of differing bits between two fingerprints.
+    dedupe_entries(entries): Collapses near-duplicates in a list of entries.
+    dedupe_text(text): Collapses near-duplicate entries of a diary text.
+"""
+import re
+import hashlib
+import functools
+
+from django.conf import settings
+
+from .chunking import ENTRY_START_RE, parse_entry_date, split_entries
+
+WORD_RE = re.compile(r"\w+")
+BANDS = 4
+BAND_BITS = 64 // BANDS
+
+
+def _normalize(entry):
+    """Returns the words of an entry without its leading date, lower-cased."""
+    match = ENTRY_START_RE.match(entry)
+    if match:
+        entry = entry[match.end():]
+    return WORD_RE.findall(entry.lower())
+
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+@functools.lru_cache(maxsize=65536)
+def simhash(text):
+    """Returns the 64-bit SimHash of the words and word pairs of a diary entry (its date ignored)."""
+    words = _normalize(text)
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    # A bit is set when most feature hashes have it set; counting the columns of their binary
+    # strings keeps the 64 per-bit votes in C rather than in a Python loop per feature and bit
+    hashes = [format(_feature_hash(feature), '064b') for feature in features]
+    fingerprint = 0
+    for column in zip(*hashes):
+        fingerprint = fingerprint << 1 | (column.count('1') * 2 > len(hashes))
+    return fingerprint
+
+
+def hamming(a, b):
+    """Returns the number of bits that differ between two fingerprints."""
+    return (a ^ b).bit_count()
+
+
+def _bands(fingerprint):
+    return [(band, fingerprint >> (band * BAND_BITS) & ((1 << BAND_BITS) - 1)) for band in range(BANDS)]
+
+
+def _annotate(entry, dates):
+    """Returns the representative entry with the number of occurrences and their date range."""
+    note = f"(repeated {len(dates)} times"
+    # Parsed dates: '02/01/2024' written day first must not sort after '2024-01-10'
+    known = sorted(date for date in dates if date)
+    if known:
+        first, last = known[0].isoformat(), known[-1].isoformat()
+        note += f", {first} to {last}" if first != last else f", {first}"
+    note += ")"
+    stripped = entry.rstrip()
+    return f"{stripped} {note}{entry[len(stripped):]}"
+
+
+def dedupe_entries(entries, max_distance=None):
+    """
+    Collapses near-duplicate entries into their first occurrence.
+
+    Finding every pair within max_distance bits through the bands is exact when max_distance is
+    below the number of bands (two fingerprints that differ in at most 3 bits agree on at least one
+    of 4 bands); larger distances may miss some pairs.
+
+    Args:
+        entries (list): Diary entries, in order.
+        max_distance (int): Maximum Hamming distance of near-duplicates (default
+            settings.RESUME_DEDUP_MAX_DISTANCE).
+    Returns:
+        list: The entries, near-duplicates removed and representatives annotated, in order.
+    """
+    if max_distance is None:
+        max_distance = settings.RESUME_DEDUP_MAX_DISTANCE
+    buckets = {}
+    groups = []  # [representative index, fingerprint, dates]
+    group_of = {}
+    for index, entry in enumerate(entries):
+        if not entry.strip():
+            continue
+        fingerprint = simhash(entry)
+        date = parse_entry_date(entry)
+        found = None
+        for band in _bands(fingerprint):
+            for group in buckets.get(band, ()):
+                if hamming(groups[group][1], fingerprint) <= max_distance:
+                    found = group
+                    break
+            if found is not None:
+                break
+        if found is not None:
+            groups[found][2].append(date)
+            continue
+        group_of[index] = len(groups)
+        groups.append([index, fingerprint, [date]])
+        for band in _bands(fingerprint):
+            buckets.setdefault(band, []).append(len(groups) - 1)
+
+    result = []
+    for index, entry in enumerate(entries):
+        if not entry.strip():
+            result.append(entry)
+        elif index in group_of:
+            dates = groups[group_of[index]][2]
+            result.append(_annotate(entry, dates) if len(dates) > 1 else entry)
+    return result
+
+
+def dedupe_text(text):
+    """Returns text with its near-duplicate entries collapsed (see dedupe_entries)."""
+    return ''.join(dedupe_entries(split_entries(text)))
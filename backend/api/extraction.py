@@ -0,0 +1,261 @@
+"""
+Extraction, validation and local repair of the resume JSON returned by the AI providers.
+
+Providers wrap the JSON in Markdown code fences, surround it with prose or emit small defects
+(trailing commas, skills inside the summary, a single degree given as a list). Rejecting those
+answers means paying for another slow provider call, so they are fixed here instead.
+
+Functions:
+    iter_json_objects(content): Yields every balanced top-level {...} span of a text in one pass.
+    remove_trailing_commas(text): Drops commas directly followed by '}' or ']' outside strings.
+    parse_llm_json(content): Returns the first JSON object found in a provider response.
+    normalize_resume(data): Coerces a parsed object into the resume schema and reports what was repaired.
+    extract_resume(content): parse_llm_json + normalize_resume.
+"""
+import json
+
+RESUME_SECTIONS = ('title', 'summary', 'education', 'experience', 'skills', 'additional_information')
+EXPERIENCE_FIELDS = ('company', 'role', 'timeline', 'description', 'highlights')
+
+
+def iter_json_objects(content):
+    """
+    Yields the text of every balanced top-level JSON object in content.
+
+    Scans the text once, tracking brace depth and string/escape state, so nested objects,
+    braces inside strings, code fences and surrounding prose are all handled in linear time.
+    """
+    depth = 0
+    start = None
+    in_string = False
+    escape = False
+    for i, char in enumerate(content):
+        if depth == 0:
+            if char == '{':
+                depth = 1
+                start = i
+            continue
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            depth += 1
+        elif char in '}]':
+            depth -= 1
+            if depth == 0:
+                yield content[start:i + 1]
+
+
+def remove_trailing_commas(text):
+    """Returns text without the commas that directly precede a closing brace or bracket."""
+    out = []
+    pending_comma = None
+    in_string = False
+    escape = False
+    for char in text:
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if pending_comma is not None:
+            if char.isspace():
+                pending_comma.append(char)
+                continue
+            if char not in '}]':
+                out.append(',')
+            out.extend(pending_comma)
+            pending_comma = None
+        if char == ',':
+            pending_comma = []
+            continue
+        if char == '"':
+            in_string = True
+        out.append(char)
+    if pending_comma is not None:
+        out.append(',')
+        out.extend(pending_comma)
+    return ''.join(out)
+
+
+def parse_llm_json(content):
+    """
+    Returns the first JSON object found in a provider response, or None.
+
+    Each candidate is parsed as-is first and, if that fails, again after removing trailing commas.
+    """
+    for candidate in iter_json_objects(content):
+        for text in (candidate, remove_trailing_commas(candidate)):
+            try:
+                value = json.loads(text)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(value, dict):
+                return value
+    return None
+
+
+def _as_text_list(value):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value] if value.strip() else []
+    if isinstance(value, dict):
+        items = []
+        for nested in value.values():
+            items.extend(_as_text_list(nested))
+        return items
+    if isinstance(value, (list, tuple)):
+        items = []
+        for nested in value:
+            items.extend(_as_text_list(nested))
+        return items
+    return [str(value)]
+
+
+def _split_skills(value):
+    if isinstance(value, str):
+        return [skill.strip() for skill in value.replace(';', ',').split(',') if skill.strip()]
+    return _as_text_list(value)
+
+
+def _unique(items):
+    seen = set()
+    unique = []
+    for item in items:
+        key = item.casefold()
+        if key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique
+
+
+def _normalize_education(value, repairs):
+    if isinstance(value, list):
+        # [{"institution": ..., "degree": ...}] or ["BSc, University"] instead of {institution: degree}
+        education = {}
+        for item in value:
+            if isinstance(item, dict):
+                institution = item.get('institution') or item.get('school') or item.get('name') or ''
+                details = [str(v) for k, v in item.items() if k not in ('institution', 'school', 'name') and v]
+                education.setdefault(str(institution), []).append(' '.join(details) or str(institution))
+            else:
+                education.setdefault('', []).append(str(item))
+        repairs.append('education: list converted to object')
+        value = education
+    if not isinstance(value, dict):
+        repairs.append('education: dropped invalid value')
+        return {}
+
+    normalized = {}
+    for institution, degrees in value.items():
+        degrees = _as_text_list(degrees)
+        if not degrees:
+            continue
+        if len(degrees) == 1:
+            if not isinstance(value[institution], str):
+                repairs.append(f"education[{institution}]: single degree converted to string")
+            normalized[institution] = degrees[0]
+        else:
+            normalized[institution] = degrees
+    return normalized
+
+
+def _normalize_experience(value, repairs):
+    if isinstance(value, dict):
+        repairs.append('experience: object wrapped in a list')
+        value = [value]
+    if not isinstance(value, list):
+        repairs.append('experience: dropped invalid value')
+        return []
+    experience = []
+    for item in value:
+        if not isinstance(item, dict):
+            repairs.append('experience: dropped non-object item')
+            continue
+        item = dict(item)
+        if 'highlights' in item and not isinstance(item['highlights'], list):
+            repairs.append('experience: highlights converted to list')
+        item['highlights'] = _as_text_list(item.get('highlights'))
+        for field in EXPERIENCE_FIELDS[:-1]:
+            if field in item and not isinstance(item[field], str):
+                item[field] = '' if item[field] is None else str(item[field])
+        experience.append(item)
+    return experience
+
+
+def normalize_resume(data):
+    """
+    Coerces a parsed provider response into the resume schema requested by the prompt.
+
+    Repairs applied locally instead of re-querying the provider:
+        - 'summary' given as a string becomes {'professional_summary': ...};
+        - 'key_skills' (or 'skills') inside 'summary' is moved into the top-level 'skills';
+        - 'skills' given as a comma-separated string or grouped object becomes a flat unique list;
+        - 'education' values are strings for a single degree and lists for several;
+        - 'experience' given as one object is wrapped in a list, and 'highlights' is always a list.
+
+    Args:
+        data (dict): The parsed JSON object.
+    Returns:
+        tuple: (dict resume or None if data does not look like a resume, list of repair descriptions)
+    """
+    repairs = []
+    if not isinstance(data, dict) or not any(section in data for section in RESUME_SECTIONS):
+        return None, repairs
+
+    resume = dict(data)
+    skills = _split_skills(resume.get('skills'))
+    if 'skills' in resume and not isinstance(resume['skills'], list):
+        repairs.append('skills: converted to list')
+
+    summary = resume.get('summary')
+    if isinstance(summary, str):
+        repairs.append('summary: string wrapped in an object')
+        summary = {'professional_summary': summary}
+    if isinstance(summary, dict):
+        summary = dict(summary)
+        for field in ('key_skills', 'skills'):
+            if field in summary:
+                repairs.append(f"summary.{field}: moved to skills")
+                skills.extend(_split_skills(summary.pop(field)))
+        resume['summary'] = summary
+    elif summary is not None:
+        repairs.append('summary: dropped invalid value')
+        resume['summary'] = {}
+
+    if 'skills' in resume or skills:
+        resume['skills'] = _unique(skills)
+    if 'education' in resume:
+        resume['education'] = _normalize_education(resume['education'], repairs)
+    if 'experience' in resume:
+        resume['experience'] = _normalize_experience(resume['experience'], repairs)
+    if 'additional_information' in resume and not isinstance(resume['additional_information'], dict):
+        repairs.append('additional_information: dropped invalid value')
+        resume['additional_information'] = {}
+    if 'title' in resume and not isinstance(resume['title'], str):
+        resume['title'] = '' if resume['title'] is None else str(resume['title'])
+    return resume, repairs
+
+
+def extract_resume(content):
+    """
+    Extracts and repairs the structured resume contained in a provider response.
+
+    Returns:
+        tuple: (dict resume or None, list of repair descriptions)
+    """
+    data = parse_llm_json(content)
+    if data is None:
+        return None, []
+    return normalize_resume(data)
@@ -0,0 +1,180 @@
+"""
+Incremental resume regeneration from diary deltas.
+
+Instead of sending the whole diary to the AI provider every time it changes, only the
+DiaryEntry rows added since the latest ResumeVersion are structured by the provider and the
+resulting partial resume is merged section by section into the previous version. A delta made
+only of skills found in the local vocabulary (api/skills.py) is merged without any provider call.
+
+Functions:
+    merge_resume(base, delta): Merges a partial structured resume into an existing one.
+    regenerate_resume(user, provider, process): Creates a new ResumeVersion from the pending diary delta.
+"""
+from django.db import IntegrityError, transaction
+
+from .metrics import PROVIDER_REQUESTS
+from .models import DiaryEntry, ResumeVersion
+from .providers import PROVIDERS
+from .skills import extract_skills, is_known_skills_only
+
+# Attempts at creating the next version when concurrent regenerations race for its number
+VERSION_CREATE_ATTEMPTS = 3
+
+
+def _norm(value):
+    return " ".join(str(value).split()).casefold()
+
+
+def _merge_unique(base, extra):
+    """Returns base followed by the items of extra not already present (case-insensitive)."""
+    merged = list(base)
+    seen = {_norm(item) for item in merged}
+    for item in extra:
+        if _norm(item) not in seen:
+            seen.add(_norm(item))
+            merged.append(item)
+    return merged
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return list(value) if isinstance(value, list) else [value]
+
+
+def _merge_experience(base, delta):
+    """
+    Merges experience entries matched by (company, role). Highlights of a matched entry are
+    unioned and non-empty scalar fields of the delta win; unmatched entries are new jobs and are
+    placed first, since diary deltas describe the most recent history.
+    """
+    merged = [dict(item) for item in base]
+    index = {(_norm(item.get('company', '')), _norm(item.get('role', ''))): item for item in merged}
+    new_items = []
+    for item in delta:
+        if not isinstance(item, dict):
+            continue
+        match = index.get((_norm(item.get('company', '')), _norm(item.get('role', ''))))
+        if match is None:
+            new_items.append(dict(item))
+            continue
+        for field, value in item.items():
+            if field in ('company', 'role'):
+                continue
+            if field == 'highlights':
+                match['highlights'] = _merge_unique(_as_list(match.get('highlights')), _as_list(value))
+            elif value:
+                match[field] = value
+    return new_items + merged
+
+
+def _merge_education(base, delta):
+    merged = dict(base)
+    for institution, degrees in delta.items():
+        if institution not in merged:
+            merged[institution] = degrees
+            continue
+        combined = _merge_unique(_as_list(merged[institution]), _as_list(degrees))
+        merged[institution] = combined[0] if len(combined) == 1 else combined
+    return merged
+
+
+def _merge_additional_information(base, delta):
+    merged = dict(base)
+    for field, value in delta.items():
+        if isinstance(value, list) or isinstance(merged.get(field), list):
+            merged[field] = _merge_unique(_as_list(merged.get(field)), _as_list(value))
+        elif value:
+            merged[field] = value
+    return merged
+
+
+def merge_resume(base, delta):
+    """
+    Merges a partial structured resume (generated from new diary entries only) into an existing one.
+
+    Args:
+        base (dict): The structured resume of the previous version.
+        delta (dict): The structured resume generated from the new diary entries.
+    Returns:
+        dict: A new structured resume; neither argument is modified.
+    """
+    merged = dict(base)
+    if delta.get('title') and not base.get('title'):
+        merged['title'] = delta['title']
+    if isinstance(delta.get('summary'), dict) and not (base.get('summary') or {}).get('professional_summary'):
+        merged['summary'] = delta['summary']
+    if isinstance(delta.get('experience'), list):
+        merged['experience'] = _merge_experience(base.get('experience') or [], delta['experience'])
+    if isinstance(delta.get('skills'), list):
+        merged['skills'] = _merge_unique(base.get('skills') or [], delta['skills'])
+    if isinstance(delta.get('education'), dict):
+        merged['education'] = _merge_education(base.get('education') or {}, delta['education'])
+    if isinstance(delta.get('additional_information'), dict):
+        merged['additional_information'] = _merge_additional_information(
+            base.get('additional_information') or {}, delta['additional_information']
+        )
+    return merged
+
+
+def regenerate_resume(user, provider, process):
+    """
+    Creates a new ResumeVersion for user covering every diary entry written so far.
+
+    Only the entries added after the latest version are sent to the provider, so the cost of a
+    regeneration follows the size of the change rather than the size of the whole diary. Concurrent
+    regenerations of the same user do not fail on the version number: the loser returns the winner's
+    version if it covers the same entries, or builds the next version on top of it.
+
+    Args:
+        user (str): The diary owner.
+        provider (str): The requested provider.
+        process (callable): Function (text) -> (dict | None, provider) that structures unstructured
+            text and tells which provider answered; that provider is recorded on the version.
+    Returns:
+        tuple: (ResumeVersion or None, bool created). The latest version is returned unchanged when
+            there are no new entries; None is returned when the provider call failed or the user
+            has no entries at all. A version merged without calling the provider records 'local'
+            as its provider.
+    """
+    latest = ResumeVersion.objects.filter(user=user).order_by('-number').first()
+    last_entry_id = latest.last_entry_id if latest else 0
+    entries = list(DiaryEntry.objects.filter(user=user, id__gt=last_entry_id).order_by('id'))
+    if not entries:
+        return latest, False
+
+    delta_text = "\n".join(entry.as_prompt_line() for entry in entries)
+    if latest and all(is_known_skills_only(entry.content) for entry in entries):
+        # Nothing but known skills: the provider would only return them in 'skills'
+        structured = {'skills': extract_skills(delta_text)}
+        PROVIDER_REQUESTS.inc(
+            provider=provider, model=PROVIDERS.get(provider, {}).get('model', ''), outcome='skipped_local'
+        )
+        provider = 'local'
+    else:
+        structured, provider = process(delta_text)
+    if structured is None:
+        return None, False
+
+    for attempt in range(VERSION_CREATE_ATTEMPTS):
+        try:
+            # A savepoint, so a lost race does not break a transaction the caller may have open
+            with transaction.atomic():
+                version = ResumeVersion.objects.create(
+                    user=user,
+                    number=(latest.number + 1) if latest else 1,
+                    data=merge_resume(latest.data, structured) if latest else structured,
+                    provider=provider,
+                    last_entry_id=entries[-1].id,
+                    delta_entries=len(entries),
+                )
+            return version, True
+        except IntegrityError:
+            if attempt + 1 == VERSION_CREATE_ATTEMPTS:
+                raise
+            # A concurrent regeneration created this version number first. If it covered these
+            # entries too it is the answer; otherwise merge this delta on top of it (merging is
+            # idempotent, so entries both deltas share are not duplicated)
+            latest = ResumeVersion.objects.filter(user=user).order_by('-number').first()
+            if latest.last_entry_id >= entries[-1].id:
+                return latest, False
@@ -0,0 +1,204 @@
+"""
+Asynchronous execution of resume generation jobs.
+
+Jobs are persisted as ResumeJob rows (the queue) and executed by a bounded thread or process pool
+living in the web process, so a slow provider never holds a web worker for the whole round trip.
+When settings.RESUME_JOB_EXECUTOR is 'none' (e.g. under Zappa, where a Lambda invocation stops
+running threads once the response is sent) jobs stay queued and are drained by
+`manage.py run_resume_jobs`.
+
+Classes:
+    JobQueue: Bounded executor that rejects new jobs once max_pending jobs are in flight.
+
+Functions:
+    run_job(job_id): Claims a queued job, executes it before its deadline and stores the outcome.
+    recover_stale_jobs(jobs): Requeues or expires jobs left running by a worker that stopped.
+    get_job_queue(): Returns the process-wide JobQueue configured in settings.
+"""
+import os
+import time
+import logging
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import ResumeJob
+from .storage import read_diary_text
+
+logger = logging.getLogger(__name__)
+
+
+def _execute(job, deadline):
+    # Imported here because the views module itself submits jobs to this module
+    from .incremental import regenerate_resume
+    from .views import ResumeAPIView
+
+    processor = ResumeAPIView()
+    if job.source == 'diary':
+        version, _ = regenerate_resume(
+            job.user, job.provider, lambda text: processor.structure(text, job.provider, deadline=deadline)
+        )
+        if version is None:
+            raise RuntimeError("Failed to process diary entries.")
+        return version.data
+
+    text = read_diary_text(job.user)
+    if text is None:
+        raise RuntimeError("Input text not found.")
+    result = processor.process_text(text, job.provider, deadline=deadline)
+    if result is None:
+        raise RuntimeError("Failed to process resume text.")
+    return result
+
+
+def run_job(job_id):
+    """
+    Claims and executes a queued job.
+
+    A job is claimed with a conditional UPDATE so that it runs only once even when several
+    workers poll the same table. Jobs whose deadline passed while queued are marked expired
+    without calling the provider; otherwise the remaining time bounds the whole generation: each
+    provider call (fallbacks and chunks included) gets only what is left of it, retries stop when
+    the next one would not fit, and no call starts after it.
+
+    Args:
+        job_id: Primary key of the ResumeJob.
+    Returns:
+        str: The final status of the job, or None if another worker already claimed it.
+    """
+    close_old_connections()
+    try:
+        now = timezone.now()
+        claimed = ResumeJob.objects.filter(id=job_id, status=ResumeJob.STATUS_QUEUED).update(
+            status=ResumeJob.STATUS_RUNNING, started_at=now
+        )
+        if not claimed:
+            return None
+        job = ResumeJob.objects.get(id=job_id)
+
+        remaining = (job.deadline - now).total_seconds()
+        if remaining <= 0:
+            job.status = ResumeJob.STATUS_EXPIRED
+            job.error = "Deadline exceeded before the job started."
+        else:
+            try:
+                job.result = _execute(job, deadline=time.monotonic() + remaining)
+                job.status = ResumeJob.STATUS_SUCCEEDED
+            except Exception as e:
+                logger.exception("Error in resume job %s: %s", job_id, e, extra={'job_id': str(job_id)})
+                job.status = ResumeJob.STATUS_FAILED
+                job.error = str(e)
+            if job.status == ResumeJob.STATUS_SUCCEEDED and timezone.now() > job.deadline:
+                # The provider result is still in the result cache, so a retry is cheap
+                job.status = ResumeJob.STATUS_EXPIRED
+                job.result = None
+                job.error = "Deadline exceeded while running."
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'result', 'error', 'finished_at'])
+        return job.status
+    finally:
+        close_old_connections()
+
+
+def recover_stale_jobs(jobs=None):
+    """
+    Releases jobs left 'running' by a worker that stopped (crash, restart, killed Lambda).
+
+    A job still running settings.RESUME_JOB_LEASE seconds after it started is considered abandoned:
+    it is expired if its deadline has passed, and queued again otherwise. The conditional UPDATEs
+    leave alone any job that finished in the meantime.
+
+    Args:
+        jobs (QuerySet): Optional subset of ResumeJob to check (default: all of them).
+    Returns:
+        tuple: (number of requeued jobs, number of expired jobs)
+    """
+    now = timezone.now()
+    stale = (jobs if jobs is not None else ResumeJob.objects.all()).filter(
+        status=ResumeJob.STATUS_RUNNING,
+        started_at__lt=now - timedelta(seconds=settings.RESUME_JOB_LEASE),
+    )
+    expired = stale.filter(deadline__lte=now).update(
+        status=ResumeJob.STATUS_EXPIRED,
+        error="The worker running the job stopped before it finished.",
+        finished_at=now,
+    )
+    requeued = stale.filter(deadline__gt=now).update(status=ResumeJob.STATUS_QUEUED, started_at=None)
+    if requeued or expired:
+        logger.warning("Recovered abandoned resume jobs: %d requeued, %d expired", requeued, expired)
+    return requeued, expired
+
+
+def _init_process_worker():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dagbok.settings')
+    import django
+
+    django.setup()
+
+
+class JobQueue:
+    """
+    Runs jobs on a thread or process pool, keeping at most max_pending jobs in flight.
+
+    submit() never blocks: once the pool is saturated it returns False so the caller can answer
+    with 503 instead of piling up unbounded work behind a slow provider.
+    """
+
+    def __init__(self, kind, workers, max_pending):
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        if kind == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='resume-job')
+        elif kind == 'process':
+            # Only imported when configured: multiprocessing is not needed by the web request path
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_process_worker,
+            )
+        elif kind == 'none':
+            self._executor = None
+        else:
+            raise ValueError(f"Unknown RESUME_JOB_EXECUTOR: {kind}")
+
+    def submit(self, job_id):
+        """
+        Schedules job_id for execution.
+
+        Returns:
+            bool: False if the queue is full. With the 'none' executor the job is left in the
+                database for `manage.py run_resume_jobs` and True is returned.
+        """
+        if self._executor is None:
+            return True
+        if not self._slots.acquire(blocking=False):
+            return False
+        future = self._executor.submit(run_job, job_id)
+        future.add_done_callback(lambda _: self._slots.release())
+        return True
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Returns the JobQueue of this process, creating it on first use."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                settings.RESUME_JOB_EXECUTOR,
+                settings.RESUME_JOB_WORKERS,
+                settings.RESUME_JOB_MAX_PENDING,
+            )
+        return _job_queue
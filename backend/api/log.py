@@ -0,0 +1,50 @@
+"""
+Structured logging helpers for the api application.
+
+Classes:
+    JsonFormatter: Formats log records as one JSON object per line, including `extra` fields.
+
+Functions:
+    log_sampled(logger, level, message, payload, **fields): Logs a large payload only for a sample of calls.
+"""
+import json
+import random
+import logging
+
+from django.conf import settings
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def log_sampled(logger, level, message, payload, **fields):
+    """
+    Logs payload (e.g. a raw provider response) for a fraction settings.API_LOG_SAMPLE_RATE of the
+    calls, truncated to settings.API_LOG_PAYLOAD_CHARS characters, instead of dumping every payload.
+    """
+    if not logger.isEnabledFor(level) or random.random() >= settings.API_LOG_SAMPLE_RATE:
+        return
+    text = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+    limit = settings.API_LOG_PAYLOAD_CHARS
+    logger.log(level, message, extra={
+        **fields,
+        'payload': text[:limit],
+        'payload_chars': len(text),
+        'truncated': len(text) > limit,
+    })
@@ -0,0 +1,295 @@
+"""
+Management command that (re)generates the resumes of many users, e.g. after a prompt or model change.
+
+Diaries are streamed from the S3 prefix (RESUME_S3_PREFIX/<user>/diary.txt) or from a local directory
+with the same layout, structured through ResumeAPIView.structure (provider layer and result cache)
+with bounded concurrency and a global rate limit, and written back in batches as <user>/resume.json
+next to each diary (optionally also as ResumeVersion rows). Every flushed batch is appended to a
+checkpoint file, so an interrupted run resumes where it left off; the results collected before the
+interruption are flushed on the way out.
+
+Usage:
+    $ python manage.py bulk_process_resumes --api deepseek --concurrency 8 --rate 120
+    $ python manage.py bulk_process_resumes --local-dir ./diaries --checkpoint run1.ckpt --save-versions
+"""
+import os
+import json
+import math
+import time
+import threading
+from pathlib import Path
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from api.incremental import VERSION_CREATE_ATTEMPTS
+from api.metrics import PROMPT_TOKENS
+from api.models import ResumeVersion
+from api.providers import PROVIDERS
+from api.storage import ObjectMeta, get_s3_client, write_resume_json
+
+DIARY_NAME = 'diary.txt'
+RESUME_NAME = 'resume.json'
+
+
+Result = namedtuple('Result', ['user', 'resume', 'provider', 'diary'])
+
+
+class RateLimiter:
+    """Token bucket shared by all workers, allowing `per_minute` acquisitions per minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def percentile(sorted_values, fraction):
+    """Returns the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = "Generates resumes for every diary under an S3 prefix or a local directory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--api', default='deepseek', choices=sorted(PROVIDERS))
+        parser.add_argument('--s3-prefix', default=None, help="Defaults to settings.RESUME_S3_PREFIX.")
+        parser.add_argument('--local-dir', default=None, help="Read <dir>/<user>/diary.txt instead of S3.")
+        parser.add_argument('--concurrency', type=int, default=4, help="Diaries processed at the same time.")
+        parser.add_argument('--rate', type=float, default=0, help="Maximum diaries started per minute (0: unlimited).")
+        parser.add_argument('--batch-size', type=int, default=50, help="Results written back per batch.")
+        parser.add_argument('--checkpoint', default='bulk_process_resumes.ckpt', help="Checkpoint file path.")
+        parser.add_argument('--reset', action='store_true', help="Ignore and overwrite an existing checkpoint.")
+        parser.add_argument('--save-versions', action='store_true', help="Also store results as ResumeVersion rows.")
+        parser.add_argument('--limit', type=int, default=0, help="Stop after this many diaries (0: all).")
+
+    def handle(self, *args, **options):
+        from api.views import ResumeAPIView
+
+        self.options = options
+        self.processor = ResumeAPIView()
+        self.limiter = RateLimiter(options['rate'])
+        self.local_dir = Path(options['local_dir']) if options['local_dir'] else None
+        self.prefix = options['s3_prefix'] if options['s3_prefix'] is not None else settings.RESUME_S3_PREFIX
+        if self.local_dir is not None and not self.local_dir.is_dir():
+            raise CommandError(f"{self.local_dir} is not a directory")
+
+        checkpoint = Path(options['checkpoint'])
+        if options['reset'] and checkpoint.exists():
+            checkpoint.unlink()
+        done = set(checkpoint.read_text().split()) if checkpoint.exists() else set()
+        self.checkpoint_file = open(checkpoint, 'a')
+
+        self.batch = []
+        self.latencies = []
+        # Only calls that reached a provider report usage; result cache hits cost nothing
+        tokens_before = self.provider_tokens()
+        self.succeeded = self.failed = self.skipped = 0
+        started = time.monotonic()
+
+        try:
+            with ThreadPoolExecutor(max_workers=options['concurrency'], thread_name_prefix='bulk-resume') as executor:
+                pending = set()
+                submitted = 0
+                for user in self.iter_users():
+                    if user in done:
+                        self.skipped += 1
+                        continue
+                    if options['limit'] and submitted >= options['limit']:
+                        break
+                    # Keep the number of queued diaries bounded so listing never runs far ahead of processing
+                    while len(pending) >= options['concurrency'] * 2:
+                        finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        self.collect(finished)
+                    pending.add(executor.submit(self.process_one, user))
+                    submitted += 1
+                while pending:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    self.collect(finished)
+        finally:
+            # Also on Ctrl-C or a listing error: what was collected is written and checkpointed
+            try:
+                self.flush()
+            finally:
+                self.checkpoint_file.close()
+        self.report(time.monotonic() - started, self.provider_tokens() - tokens_before)
+
+    @staticmethod
+    def provider_tokens():
+        """Prompt and completion tokens reported by the providers so far in this process."""
+        return PROMPT_TOKENS.total(kind='prompt') + PROMPT_TOKENS.total(kind='completion')
+
+    def iter_users(self):
+        """Yields the users whose diary exists, streaming the S3 listing page by page."""
+        if self.local_dir is not None:
+            for path in sorted(self.local_dir.glob(f'*/{DIARY_NAME}')):
+                yield path.parent.name
+            return
+        paginator = get_s3_client().get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Prefix=self.prefix):
+            for obj in page.get('Contents', []):
+                key = obj['Key']
+                if key.endswith(f'/{DIARY_NAME}'):
+                    yield key[len(self.prefix):-len(f'/{DIARY_NAME}')]
+
+    def read_text(self, user):
+        """Returns (diary text, ObjectMeta of the diary or None when it was read from a local directory)."""
+        if self.local_dir is not None:
+            return (self.local_dir / user / DIARY_NAME).read_text(encoding='utf-8'), None
+        obj = get_s3_client().get_object(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=f"{self.prefix}{user}/{DIARY_NAME}"
+        )
+        diary = ObjectMeta(obj['ETag'], obj['LastModified'], obj['ContentLength'], obj.get('Metadata', {}))
+        return obj['Body'].read().decode('utf-8'), diary
+
+    def process_one(self, user):
+        """
+        Structures the diary of one user.
+
+        Returns:
+            tuple: (user, Result or None, seconds)
+        """
+        self.limiter.acquire()
+        started = time.monotonic()
+        try:
+            text, diary = self.read_text(user)
+            resume, provider = self.processor.structure(text, self.options['api'])
+        except Exception as e:
+            self.stderr.write(f"{user}: {e}")
+            return user, None, time.monotonic() - started
+        result = Result(user, resume, provider, diary) if resume is not None else None
+        return user, result, time.monotonic() - started
+
+    def collect(self, futures):
+        for future in futures:
+            user, result, seconds = future.result()
+            self.latencies.append(seconds)
+            if result is None:
+                self.failed += 1
+                continue
+            self.batch.append(result)
+            if len(self.batch) >= self.options['batch_size']:
+                self.flush()
+
+    def flush(self):
+        """Writes the pending results back, then records them in the checkpoint."""
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        with ThreadPoolExecutor(max_workers=min(16, len(batch))) as writers:
+            list(writers.map(self.write_result, batch))
+        if self.options['save_versions']:
+            self.save_versions(batch)
+        self.checkpoint_file.write(''.join(f"{result.user}\n" for result in batch))
+        self.checkpoint_file.flush()
+        os.fsync(self.checkpoint_file.fileno())
+        self.succeeded += len(batch)
+        self.stdout.write(f"Wrote {len(batch)} resumes ({self.succeeded} so far)")
+
+    def write_result(self, result):
+        if self.local_dir is not None:
+            path = self.local_dir / result.user / RESUME_NAME
+            path.write_text(json.dumps(result.resume, ensure_ascii=False), encoding='utf-8')
+        elif self.prefix == settings.RESUME_S3_PREFIX:
+            # Recording the diary ETag and the provider lets ResumeAPIView serve it as fresh
+            write_resume_json(result.user, result.resume, result.diary, result.provider, self.options['api'])
+        else:
+            get_s3_client().put_object(
+                Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+                Key=f"{self.prefix}{result.user}/{RESUME_NAME}",
+                Body=json.dumps(result.resume, ensure_ascii=False).encode('utf-8'),
+                ContentType='application/json',
+            )
+
+    @staticmethod
+    def latest_versions(users):
+        """Returns {user: (number, last_entry_id)} of the latest ResumeVersion of each user that has one."""
+        latest = {}
+        rows = (
+            ResumeVersion.objects.filter(user__in=users)
+            .order_by('user', '-number')
+            .values_list('user', 'number', 'last_entry_id')
+        )
+        for user, number, last_entry_id in rows:
+            latest.setdefault(user, (number, last_entry_id))
+        return latest
+
+    def save_versions(self, batch):
+        """
+        Stores the batch as new ResumeVersion rows, in one INSERT unless a concurrent regeneration
+        (api/incremental.regenerate_resume) took one of the version numbers first.
+
+        The diary text is not made of tracked DiaryEntry rows, so each version carries over the
+        last_entry_id of the version it follows: incremental regenerations keep sending only the
+        entries written since, instead of starting over from the first one.
+        """
+        latest = self.latest_versions([result.user for result in batch])
+        try:
+            with transaction.atomic():
+                ResumeVersion.objects.bulk_create([
+                    self.next_version(result, latest.get(result.user)) for result in batch
+                ])
+        except IntegrityError:
+            for result in batch:
+                self.save_version(result)
+
+    @staticmethod
+    def next_version(result, latest):
+        number, last_entry_id = latest or (0, 0)
+        return ResumeVersion(
+            user=result.user,
+            number=number + 1,
+            data=result.resume,
+            provider=result.provider,
+            last_entry_id=last_entry_id,
+        )
+
+    def save_version(self, result):
+        """Creates the version of one result, on the next free number."""
+        for attempt in range(VERSION_CREATE_ATTEMPTS):
+            try:
+                # A savepoint per attempt, like regenerate_resume
+                with transaction.atomic():
+                    self.next_version(result, self.latest_versions([result.user]).get(result.user)).save()
+                return
+            except IntegrityError:
+                if attempt + 1 == VERSION_CREATE_ATTEMPTS:
+                    self.stderr.write(f"{result.user}: no free resume version number, version not saved")
+
+    def report(self, elapsed, tokens):
+        latencies = sorted(self.latencies)
+        minutes = max(elapsed, 1e-9) / 60
+        processed = self.succeeded + self.failed
+        self.stdout.write(
+            f"\nProcessed {processed} diaries in {elapsed:.1f}s "
+            f"({self.succeeded} written, {self.failed} failed, {self.skipped} skipped from checkpoint)"
+        )
+        self.stdout.write(
+            f"Throughput: {processed / minutes:.1f} docs/min, {tokens / minutes:.0f} provider tokens/min "
+            f"({tokens} tokens reported by the providers, result cache hits excluded)"
+        )
+        if latencies:
+            self.stdout.write(
+                "Latency per diary: "
+                + ", ".join(
+                    f"p{int(q * 100)}={percentile(latencies, q):.2f}s" for q in (0.5, 0.9, 0.95, 0.99)
+                )
+                + f", max={latencies[-1]:.2f}s"
+            )
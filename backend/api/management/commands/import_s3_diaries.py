@@ -0,0 +1,109 @@
+"""
+Management command that imports the diaries stored in S3 into the database, once, when moving a
+deployment from the S3-only layout to DiaryEntry/ResumeVersion rows.
+
+Every RESUME_S3_PREFIX/<user>/diary.txt is split into entries on the same boundaries the chunker uses
+(api/chunking.py); a leading date becomes the entry_date, entries without one take the date of the
+previous entry (or the object's LastModified date). An existing <user>/resume.json is imported as the
+user's first ResumeVersion, covering all the imported entries, so incremental regeneration continues
+from it. Users that already have entries are skipped, so the command can be re-run after a failure.
+
+Usage:
+    $ python manage.py import_s3_diaries --dry-run
+    $ python manage.py import_s3_diaries --batch-size 2000
+"""
+import json
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.chunking import parse_entry_date, split_entries
+from api.models import DiaryEntry, ResumeVersion
+from api.storage import get_s3_client, is_missing_key_error
+
+DIARY_NAME = 'diary.txt'
+RESUME_NAME = 'resume.json'
+
+
+class Command(BaseCommand):
+    help = "Imports the S3 diaries (and their resume.json) into DiaryEntry and ResumeVersion rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--s3-prefix', default=None, help="Defaults to settings.RESUME_S3_PREFIX.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows per INSERT.")
+        parser.add_argument('--limit', type=int, default=0, help="Stop after this many users (0: all).")
+        parser.add_argument('--dry-run', action='store_true', help="Parse and count without writing.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.prefix = options['s3_prefix'] if options['s3_prefix'] is not None else settings.RESUME_S3_PREFIX
+        imported = skipped = entries = versions = 0
+        for user, last_modified in self.iter_diaries():
+            if options['limit'] and imported >= options['limit']:
+                break
+            if DiaryEntry.objects.filter(user=user).exists():
+                skipped += 1
+                continue
+            count, version = self.import_user(user, last_modified.date())
+            imported += 1
+            entries += count
+            versions += version
+        action = "Would import" if options['dry_run'] else "Imported"
+        self.stdout.write(
+            f"{action} {entries} entries and {versions} resume versions for {imported} users "
+            f"({skipped} users already had entries)"
+        )
+
+    def iter_diaries(self):
+        """Yields (user, LastModified) of every diary under the prefix, streaming the listing."""
+        paginator = get_s3_client().get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Prefix=self.prefix):
+            for obj in page.get('Contents', []):
+                key = obj['Key']
+                if key.endswith(f'/{DIARY_NAME}'):
+                    yield key[len(self.prefix):-len(f'/{DIARY_NAME}')], obj['LastModified']
+
+    def read_object(self, user, name):
+        from botocore.exceptions import ClientError
+
+        try:
+            obj = get_s3_client().get_object(
+                Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=f"{self.prefix}{user}/{name}"
+            )
+        except ClientError as e:
+            if is_missing_key_error(e):
+                return None
+            raise
+        return obj['Body'].read().decode('utf-8')
+
+    def build_entries(self, user, text, default_date):
+        rows = []
+        entry_date = default_date
+        for entry in split_entries(text):
+            content = entry.strip()
+            if not content:
+                continue
+            entry_date = parse_entry_date(entry) or entry_date
+            rows.append(DiaryEntry(user=user, content=content, entry_date=entry_date))
+        return rows
+
+    def import_user(self, user, default_date):
+        """Imports the diary (and resume) of one user. Returns (entries imported, versions imported)."""
+        rows = self.build_entries(user, self.read_object(user, DIARY_NAME) or '', default_date or date.today())
+        resume = self.read_object(user, RESUME_NAME)
+        if self.options['dry_run']:
+            return len(rows), int(resume is not None)
+        with transaction.atomic():
+            DiaryEntry.objects.bulk_create(rows, batch_size=self.options['batch_size'])
+            # Ids are not returned by bulk_create on every backend: read the last one back
+            last_entry_id = (
+                DiaryEntry.objects.filter(user=user).order_by('-id').values_list('id', flat=True).first() or 0
+            )
+            if resume is not None and not ResumeVersion.objects.filter(user=user).exists():
+                ResumeVersion.objects.create(
+                    user=user, number=1, data=json.loads(resume), provider='import', last_entry_id=last_entry_id
+                )
+                return len(rows), 1
+        return len(rows), 0
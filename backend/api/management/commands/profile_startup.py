@@ -0,0 +1,106 @@
+"""
+Management command that measures the cold-start cost of the WSGI application.
+
+Runs a fresh interpreter with `python -X importtime` that imports dagbok.wsgi and serves one
+request through the WSGI callable, then reports the most expensive imports and the time to the
+first response. Run it on every release to track cold-start latency (e.g. under Zappa/Lambda).
+
+Usage:
+    $ python manage.py profile_startup
+    $ python manage.py profile_startup --limit 40 --path /resume/cache/stats/ --json
+"""
+import os
+import re
+import sys
+import json
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Executed in a fresh interpreter: import the WSGI app, then serve one request through it
+PROBE = r'''
+import io, json, sys, time
+started = time.perf_counter()
+from dagbok.wsgi import application
+imported = time.perf_counter()
+status = []
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': sys.argv[2],
+    'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+    'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+    'wsgi.errors': sys.stderr, 'wsgi.multithread': False, 'wsgi.multiprocess': False,
+    'wsgi.run_once': False,
+}
+body = b''.join(application(environ, lambda s, h, exc_info=None: status.append(s)))
+responded = time.perf_counter()
+print('PROBE ' + json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_response_ms': (responded - started) * 1000,
+    'status': status[0] if status else None,
+    'bytes': len(body),
+}))
+'''
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+class Command(BaseCommand):
+    help = "Reports per-module import cost and time-to-first-response of dagbok.wsgi."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=25, help="Number of modules to list.")
+        parser.add_argument('--path', default='/resume/cache/stats/', help="Path of the first request.")
+        parser.add_argument('--query', default='', help="Query string of the first request.")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'dagbok.settings'))
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROBE, options['path'], options['query']],
+            cwd=str(settings.BASE_DIR),
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        probe_line = next((line for line in completed.stdout.splitlines() if line.startswith('PROBE ')), None)
+        if completed.returncode != 0 or probe_line is None:
+            raise CommandError(f"Startup probe failed:\n{completed.stderr[-4000:]}")
+        probe = json.loads(probe_line[len('PROBE '):])
+
+        modules = []
+        for line in completed.stderr.splitlines():
+            match = IMPORTTIME_RE.match(line)
+            if match:
+                modules.append({
+                    'module': match.group(4),
+                    'self_ms': int(match.group(1)) / 1000,
+                    'cumulative_ms': int(match.group(2)) / 1000,
+                    # Nesting level in the import tree (two spaces per level)
+                    'depth': len(match.group(3)) // 2,
+                })
+        top_level = [m for m in modules if m['depth'] == 0]
+        report = {
+            'import_ms': round(probe['import_ms'], 1),
+            'first_response_ms': round(probe['first_response_ms'], 1),
+            'first_response_status': probe['status'],
+            'modules_imported': len(modules),
+            'slowest_top_level': sorted(top_level, key=lambda m: m['cumulative_ms'], reverse=True)[:options['limit']],
+            'slowest_self': sorted(modules, key=lambda m: m['self_ms'], reverse=True)[:options['limit']],
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(f"import dagbok.wsgi:      {report['import_ms']:9.1f} ms ({report['modules_imported']} modules)")
+        self.stdout.write(
+            f"time to first response: {report['first_response_ms']:9.1f} ms "
+            f"({options['path']} -> {report['first_response_status']})"
+        )
+        self.stdout.write("\nSlowest top-level imports (cumulative ms):")
+        for module in report['slowest_top_level']:
+            self.stdout.write(f"  {module['cumulative_ms']:9.1f}  {module['module']}")
+        self.stdout.write("\nSlowest modules (self ms):")
+        for module in report['slowest_self']:
+            self.stdout.write(f"  {module['self_ms']:9.1f}  {module['module']}")
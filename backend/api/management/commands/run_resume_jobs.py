@@ -0,0 +1,47 @@
+"""
+Management command that drains queued ResumeJob rows.
+
+Used when settings.RESUME_JOB_EXECUTOR is 'none' (e.g. on Zappa/Lambda) or to pick up jobs
+left queued by a web process that restarted. Jobs left 'running' by a worker that stopped are
+requeued (or expired) once their lease, settings.RESUME_JOB_LEASE, has run out (see
+api/jobs.recover_stale_jobs).
+
+Usage:
+    $ python manage.py run_resume_jobs            # poll forever
+    $ python manage.py run_resume_jobs --once     # drain the queue and exit
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.jobs import recover_stale_jobs, run_job
+from api.models import ResumeJob
+
+
+class Command(BaseCommand):
+    help = "Executes queued resume generation jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty.")
+        parser.add_argument('--workers', type=int, default=settings.RESUME_JOB_WORKERS)
+        parser.add_argument('--poll-interval', type=float, default=2.0)
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                recover_stale_jobs()
+                job_ids = list(
+                    ResumeJob.objects.filter(status=ResumeJob.STATUS_QUEUED)
+                    .order_by('created_at')
+                    .values_list('id', flat=True)[:options['workers'] * 4]
+                )
+                if job_ids:
+                    for job_id, job_status in zip(job_ids, executor.map(run_job, job_ids)):
+                        if job_status is not None:
+                            self.stdout.write(f"{job_id}: {job_status}")
+                    continue
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
@@ -0,0 +1,208 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format.
+
+Resume generation is timed stage by stage (S3 fetch, prompt build, provider call, JSON extraction,
+serialization) into histograms labelled by provider and model, so a slow resume can be attributed to
+a stage without reading the logs. Metrics are kept per process; with several gunicorn workers every
+worker exposes its own values.
+
+Classes:
+    Counter: Monotonic counter with labels.
+    Histogram: Cumulative-bucket histogram with labels.
+    Registry: Holds the metrics and renders them.
+
+Functions:
+    timed(stage, provider, model): Context manager observing a stage duration in RESUME_STAGE_SECONDS.
+    render(): Returns every metric of the default registry in Prometheus text format.
+
+Attributes:
+    RESUME_STAGE_SECONDS (Histogram): Duration of each resume generation stage.
+    PROVIDER_REQUESTS (Counter): Provider calls by outcome.
+    RESUME_SINGLEFLIGHT (Counter): Result cache misses by single-flight outcome, plus in-flight followers.
+    RESUME_PROMPT_TOKENS (Counter): Estimated diary tokens before and after near-duplicate collapsing.
+    RESUME_PDF_EXPORTS (Counter): PDF exports by outcome (render cache hits, renders, rejections).
+    PROMPT_TOKENS (Counter): Prompt, cached prompt and completion tokens reported by the providers, per template.
+    PROMPT_COST (Counter): Estimated provider cost in USD, per template.
+    PROMPT_CALL_SECONDS (Histogram): Provider call latency, per template.
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+# Provider calls take seconds, the local stages microseconds: cover both ends
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def total(self, **labels):
+        """Returns the sum of the series whose labels include the given ones (all series by default)."""
+        wanted = [(self.labelnames.index(name), str(value)) for name, value in labels.items()]
+        with self._lock:
+            return sum(
+                value for key, value in self._values.items() if all(key[i] == value_ for i, value_ in wanted)
+            )
+
+    def collect(self):
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][index] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def count(self, **labels):
+        """Returns the number of observations of the series whose labels include the given ones."""
+        wanted = [(self.labelnames.index(name), str(value)) for name, value in labels.items()]
+        with self._lock:
+            return sum(
+                series['count'] for key, series in self._series.items()
+                if all(key[i] == value for i, value in wanted)
+            )
+
+    def collect(self):
+        with self._lock:
+            series = {key: {'counts': list(s['counts']), 'sum': s['sum'], 'count': s['count']}
+                      for key, s in self._series.items()}
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, data in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, data['counts']):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {data['count']}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {data['sum']}")
+            lines.append(f"{self.name}_count{labels} {data['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """Registers a callable returning extra exposition lines (e.g. gauges computed at scrape time)."""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+RESUME_STAGE_SECONDS = REGISTRY.register(Histogram(
+    'dagbok_resume_stage_seconds',
+    'Duration of each resume generation stage.',
+    ('stage', 'provider', 'model'),
+))
+PROVIDER_REQUESTS = REGISTRY.register(Counter(
+    'dagbok_provider_requests_total',
+    'Provider chat-completion calls by outcome.',
+    ('provider', 'model', 'outcome'),
+))
+RESUME_SINGLEFLIGHT = REGISTRY.register(Counter(
+    'dagbok_resume_singleflight_total',
+    'Result cache misses by single-flight outcome (leader, lease_timeout: provider calls; duplicate: requests '
+    'that found their key in flight, served as coalesced, lease_wait or lease_timeout).',
+    ('outcome',),
+))
+
+RESUME_PROMPT_TOKENS = REGISTRY.register(Counter(
+    'dagbok_resume_prompt_tokens_total',
+    'Estimated diary tokens of generations before and after near-duplicate collapsing (stage raw, deduplicated).',
+    ('stage',),
+))
+RESUME_PDF_EXPORTS = REGISTRY.register(Counter(
+    'dagbok_resume_pdf_exports_total',
+    'PDF exports by outcome (cache_hit, rendered, coalesced, rejected, failed).',
+    ('outcome',),
+))
+
+PROMPT_TOKENS = REGISTRY.register(Counter(
+    'dagbok_prompt_tokens_total',
+    'Tokens billed by the providers per prompt template version (kind prompt, cached, completion).',
+    ('template', 'provider', 'model', 'kind'),
+))
+PROMPT_COST = REGISTRY.register(Counter(
+    'dagbok_prompt_cost_usd_total',
+    'Estimated provider cost in USD per prompt template version (list prices of api/prompts.py).',
+    ('template', 'provider', 'model'),
+))
+PROMPT_CALL_SECONDS = REGISTRY.register(Histogram(
+    'dagbok_prompt_call_seconds',
+    'Duration of the successful provider calls per prompt template version.',
+    ('template', 'provider', 'model'),
+))
+
+
+@contextmanager
+def timed(stage, provider='', model=''):
+    """Observes the duration of the wrapped block in RESUME_STAGE_SECONDS, even if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        RESUME_STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage, provider=provider, model=model)
+
+
+def render():
+    """Returns the metrics of the default registry in Prometheus text format."""
+    return REGISTRY.render()
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:27
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiaryEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user', models.CharField(db_index=True, max_length=128)),
+                ('entry_type', models.CharField(choices=[('note', 'Note'), ('experience', 'Work experience'), ('course', 'Course'), ('certificate', 'Certificate'), ('lecture', 'Lecture'), ('skill', 'Skill'), ('milestone', 'Career milestone')], default='note', max_length=32)),
+                ('content', models.TextField()),
+                ('entry_date', models.DateField(default=django.utils.timezone.localdate)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumeVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user', models.CharField(max_length=128)),
+                ('number', models.PositiveIntegerField()),
+                ('data', models.JSONField()),
+                ('provider', models.CharField(max_length=32)),
+                ('last_entry_id', models.BigIntegerField(default=0)),
+                ('delta_entries', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-number'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'number'), name='unique_resume_version_per_user')],
+            },
+        ),
+    ]
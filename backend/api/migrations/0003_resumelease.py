@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_resumejob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumeLease',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('owner', models.CharField(max_length=128)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+    ]
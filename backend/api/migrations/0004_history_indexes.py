@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_resumelease'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='diaryentry',
+            name='user',
+            field=models.CharField(max_length=128),
+        ),
+        migrations.AddIndex(
+            model_name='diaryentry',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='api_diary_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resumeversion',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='api_resume_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE api_diaryentry_fts USING fts5("
+    "user, content, content='api_diaryentry', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER api_diaryentry_fts_insert AFTER INSERT ON api_diaryentry BEGIN "
+    "INSERT INTO api_diaryentry_fts(rowid, user, content) VALUES (new.id, new.user, new.content); END",
+    "CREATE TRIGGER api_diaryentry_fts_delete AFTER DELETE ON api_diaryentry BEGIN "
+    "INSERT INTO api_diaryentry_fts(api_diaryentry_fts, rowid, user, content) "
+    "VALUES ('delete', old.id, old.user, old.content); END",
+    "CREATE TRIGGER api_diaryentry_fts_update AFTER UPDATE OF user, content ON api_diaryentry BEGIN "
+    "INSERT INTO api_diaryentry_fts(api_diaryentry_fts, rowid, user, content) "
+    "VALUES ('delete', old.id, old.user, old.content); "
+    "INSERT INTO api_diaryentry_fts(rowid, user, content) VALUES (new.id, new.user, new.content); END",
+    # Index the entries written before this migration
+    "INSERT INTO api_diaryentry_fts(api_diaryentry_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS api_diaryentry_fts_update",
+    "DROP TRIGGER IF EXISTS api_diaryentry_fts_delete",
+    "DROP TRIGGER IF EXISTS api_diaryentry_fts_insert",
+    "DROP TABLE IF EXISTS api_diaryentry_fts",
+]
+POSTGRESQL_FORWARD = [
+    "CREATE INDEX api_diary_content_fts_idx ON api_diaryentry USING GIN (to_tsvector('simple', content))",
+]
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX IF EXISTS api_diary_content_fts_idx",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+    """Full-text index of diary entries (see api/search.py); other backends get none."""
+
+    dependencies = [
+        ('api', '0004_history_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run_for_vendor({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+    ]
@@ -1,3 +1,115 @@
+"""
+Persistent models for the professional diary and the resumes generated from it.
+
+Classes:
+    DiaryEntry: A single dated diary entry written by a user.
+    ResumeVersion: A structured resume generated for a user, recording which diary entries it covers.
+    ResumeJob: A queued resume generation, executed outside the request by api.jobs.
+    ResumeLease: A time-limited claim on generating one result cache key (cross-process single-flight).
+"""
+import uuid
+
 from django.db import models
+from django.utils import timezone
+
+
+class DiaryEntry(models.Model):
+    ENTRY_TYPES = [
+        ('note', 'Note'),
+        ('experience', 'Work experience'),
+        ('course', 'Course'),
+        ('certificate', 'Certificate'),
+        ('lecture', 'Lecture'),
+        ('skill', 'Skill'),
+        ('milestone', 'Career milestone'),
+    ]
+
+    user = models.CharField(max_length=128)
+    entry_type = models.CharField(max_length=32, choices=ENTRY_TYPES, default='note')
+    content = models.TextField()
+    entry_date = models.DateField(default=timezone.localdate)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Serves the keyset-paginated history (api/pagination.py) and every per-user lookup
+            models.Index(fields=['user', 'created_at', 'id'], name='api_diary_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.entry_date} ({self.entry_type})"
+
+    def as_prompt_line(self):
+        """Returns the entry formatted as one line of unstructured resume text."""
+        return f"[{self.entry_date.isoformat()}] ({self.entry_type}) {self.content}"
+
+
+class ResumeVersion(models.Model):
+    user = models.CharField(max_length=128)
+    number = models.PositiveIntegerField()
+    data = models.JSONField()
+    provider = models.CharField(max_length=32)
+    # Highest DiaryEntry id covered by this version; entries above it form the next delta
+    last_entry_id = models.BigIntegerField(default=0)
+    # Number of diary entries sent to the provider to produce this version
+    delta_entries = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-number']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'number'], name='unique_resume_version_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id'], name='api_resume_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} v{self.number}"
+
+
+class ResumeJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_EXPIRED = 'expired'
+    STATUSES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_EXPIRED, 'Expired'),
+    ]
+    SOURCES = [
+        ('s3', 'Diary text stored in S3'),
+        ('diary', 'Incremental regeneration from diary entries'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.CharField(max_length=128)
+    provider = models.CharField(max_length=32)
+    source = models.CharField(max_length=16, choices=SOURCES, default='s3')
+    status = models.CharField(max_length=16, choices=STATUSES, default=STATUS_QUEUED, db_index=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    deadline = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.user} {self.source} job {self.id} ({self.status})"
+
+
+class ResumeLease(models.Model):
+    key = models.CharField(max_length=64, primary_key=True)
+    owner = models.CharField(max_length=128)
+    expires_at = models.DateTimeField()
 
-# Create your models here.
+    def __str__(self):
+        return f"{self.key} leased by {self.owner} until {self.expires_at}"
@@ -0,0 +1,38 @@
+"""
+Bounded thread pool for the blocking calls of the async views.
+
+boto3, the disk/S3 result cache backends and the Django ORM are synchronous. The async views run
+them on this pool (settings.RESUME_ASYNC_OFFLOAD_WORKERS threads) instead of asgiref's default
+executor, so the number of threads a process spends on S3 and database round trips stays fixed
+however many generations are waiting on a provider.
+
+Functions:
+    get_offload_executor(): Returns the process-wide offload executor, creating it on first call.
+    run_blocking(fn, *args, **kwargs): Awaits fn(*args, **kwargs) run on the offload executor.
+"""
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_offload_executor():
+    """Returns the executor of settings.RESUME_ASYNC_OFFLOAD_WORKERS threads."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RESUME_ASYNC_OFFLOAD_WORKERS, thread_name_prefix='async-offload'
+            )
+        return _executor
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Runs the blocking call fn(*args, **kwargs) on the offload executor and returns its result."""
+    call = functools.partial(fn, *args, **kwargs)
+    return await sync_to_async(call, thread_sensitive=False, executor=get_offload_executor())()
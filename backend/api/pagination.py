@@ -0,0 +1,79 @@
+"""
+Keyset (seek) pagination for the per-user history endpoints.
+
+Pages are ordered newest first by (created_at, id) and the cursor carries the position of the last
+row sent, so every page is one range scan of the (user, created_at, id) indexes of DiaryEntry and
+ResumeVersion: the cost of page 100 is the cost of page 1, unlike OFFSET pagination, and rows added
+while a client pages through the history are neither skipped nor repeated. The id breaks ties
+between rows created in the same instant (e.g. imported in one batch).
+
+Classes:
+    KeysetPagination: Paginates a queryset by (created_at, id) with an opaque cursor.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(BasePagination):
+    """
+    Newest-first pagination on (created_at, id).
+
+    Query parameters:
+        limit: Page size (default page_size, at most max_page_size).
+        cursor: The next_cursor of the previous page.
+    """
+    page_size = 50
+    max_page_size = 200
+
+    @staticmethod
+    def encode_cursor(created_at, pk):
+        """Returns the opaque cursor pointing after the row (created_at, pk)."""
+        return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{pk}".encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Returns the (created_at, pk) position of a cursor. Raises ValidationError if it is malformed."""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            created_at, pk = raw.split('|')
+            return datetime.fromisoformat(created_at), int(pk)
+        except ValueError:
+            raise ValidationError({"cursor": "Invalid cursor."})
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.page_size))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        return max(1, min(limit, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Returns the rows of the requested page.
+
+        Args:
+            queryset (QuerySet): Rows of one user; any ordering is replaced.
+            request: The incoming request (limit and cursor query parameters).
+        Returns:
+            list: At most limit rows, newest first.
+        """
+        limit = self.get_limit(request)
+        cursor = request.query_params.get('cursor')
+        queryset = queryset.order_by('-created_at', '-id')
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+        # One extra row tells whether there is a next page without a COUNT query
+        rows = list(queryset[:limit + 1])
+        self.has_next = len(rows) > limit
+        rows = rows[:limit]
+        self.next_cursor = self.encode_cursor(rows[-1].created_at, rows[-1].pk) if self.has_next else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({"results": data, "next_cursor": self.next_cursor})
@@ -0,0 +1,359 @@
+"""
+Server-side PDF export of structured resumes.
+
+The dashboard used to build PDFs in the browser (html2pdf), which is slow on low-end devices and
+repeats the same work on every download. Here a resume is rendered with reportlab on a bounded
+thread or process pool and the bytes are stored under a key derived from (resume version, template,
+locale), on disk or in S3 (settings.RESUME_PDF_CACHE_BACKEND). Rendering is deterministic (reportlab
+runs in invariant mode, without timestamps or random document ids), so the key also identifies the
+bytes: repeated downloads of a version are static files answered with a strong ETag, 304s and byte
+ranges (see api/conditional.py), and concurrent exports of the same key render once.
+
+Classes:
+    PdfExportBusy: Raised when the render pool already holds its maximum number of renders.
+    PdfRenderer: Bounded pool running render_pdf, rejecting work once max_pending renders are in flight.
+
+Functions:
+    render_pdf(resume, template, locale): Renders a structured resume to PDF bytes.
+    pdf_cache_key(version, template, locale): The render cache key of a resume version.
+    build_pdf_cache(): Creates the render cache backend configured in settings.
+    get_pdf_cache(): Returns the process-wide render cache backend, building it on first use.
+    get_pdf_renderer(): Returns the process-wide PdfRenderer configured in settings.
+    export_pdf(version, resume, template, locale): Returns the PDF of a resume version, cached or rendered.
+
+Attributes:
+    TEMPLATES (dict): Layout of each template (fonts, sizes, accent color, margins).
+    LOCALES (dict): Section labels and page size of each locale.
+"""
+import io
+import logging
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+
+from .cache import DiskBackend, MemoryLRUBackend, NullBackend, S3Backend
+from .metrics import RESUME_PDF_EXPORTS, timed
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the layout of render_pdf changes so cached PDFs are not reused
+PDF_RENDER_VERSION = "1"
+
+TEMPLATES = {
+    'classic': {
+        'font': 'Times-Roman', 'bold': 'Times-Bold', 'italic': 'Times-Italic',
+        'size': 10.5, 'title_size': 20, 'accent': '#1f3a5f', 'margin': 20,
+    },
+    'modern': {
+        'font': 'Helvetica', 'bold': 'Helvetica-Bold', 'italic': 'Helvetica-Oblique',
+        'size': 10, 'title_size': 18, 'accent': '#0f766e', 'margin': 18,
+    },
+    'compact': {
+        'font': 'Helvetica', 'bold': 'Helvetica-Bold', 'italic': 'Helvetica-Oblique',
+        'size': 8.5, 'title_size': 14, 'accent': '#333333', 'margin': 12,
+    },
+}
+
+LOCALES = {
+    'en': {
+        'page_size': 'letter',
+        'summary': 'Summary',
+        'experience': 'Experience',
+        'education': 'Education',
+        'skills': 'Skills',
+        'additional_information': 'Additional information',
+        'languages': 'Languages',
+        'citizenship': 'Citizenship',
+        'availability': 'Availability',
+        'interests': 'Interests',
+    },
+    'pt-BR': {
+        'page_size': 'A4',
+        'summary': 'Resumo',
+        'experience': 'Experiência',
+        'education': 'Formação',
+        'skills': 'Habilidades',
+        'additional_information': 'Informações adicionais',
+        'languages': 'Idiomas',
+        'citizenship': 'Cidadania',
+        'availability': 'Disponibilidade',
+        'interests': 'Interesses',
+    },
+}
+
+
+class PdfExportBusy(Exception):
+    """The render pool is saturated; the caller should answer with 503."""
+
+
+def _text(value):
+    """Returns value as escaped paragraph markup; lists are joined with commas."""
+    if isinstance(value, (list, tuple)):
+        value = ', '.join(str(item) for item in value)
+    return escape(str(value)).replace('\n', '<br/>')
+
+
+def _label(labels, key):
+    return labels.get(key) or str(key).replace('_', ' ').capitalize()
+
+
+def _styles(template):
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle
+
+    spec = TEMPLATES[template]
+    size = spec['size']
+    accent = colors.HexColor(spec['accent'])
+    body = ParagraphStyle('body', fontName=spec['font'], fontSize=size, leading=size * 1.3)
+    return {
+        'title': ParagraphStyle(
+            'title', fontName=spec['bold'], fontSize=spec['title_size'], leading=spec['title_size'] * 1.2,
+            textColor=accent, spaceAfter=size,
+        ),
+        'heading': ParagraphStyle(
+            'heading', fontName=spec['bold'], fontSize=size * 1.3, leading=size * 1.6, textColor=accent,
+            spaceBefore=size, spaceAfter=size * 0.4,
+        ),
+        'role': ParagraphStyle('role', parent=body, fontName=spec['bold'], spaceBefore=size * 0.5),
+        'meta': ParagraphStyle('meta', parent=body, fontName=spec['italic'], textColor=colors.HexColor('#555555')),
+        'body': body,
+        'bullet': ParagraphStyle('bullet', parent=body, leftIndent=size * 1.2, bulletIndent=size * 0.3),
+    }
+
+
+def _story(resume, styles, labels):
+    """Returns the flowables of a structured resume, skipping missing or empty sections."""
+    from reportlab.platypus import Paragraph
+
+    story = []
+    if resume.get('title'):
+        story.append(Paragraph(_text(resume['title']), styles['title']))
+
+    summary = resume.get('summary')
+    if isinstance(summary, dict):
+        summary = summary.get('professional_summary')
+    if summary:
+        story.append(Paragraph(_text(labels['summary']), styles['heading']))
+        story.append(Paragraph(_text(summary), styles['body']))
+
+    experience = [job for job in resume.get('experience') or [] if isinstance(job, dict)]
+    if experience:
+        story.append(Paragraph(_text(labels['experience']), styles['heading']))
+        for job in experience:
+            role = ' - '.join(str(job[field]) for field in ('role', 'company') if job.get(field))
+            story.append(Paragraph(_text(role), styles['role']))
+            if job.get('timeline'):
+                story.append(Paragraph(_text(job['timeline']), styles['meta']))
+            if job.get('description'):
+                story.append(Paragraph(_text(job['description']), styles['body']))
+            for highlight in job.get('highlights') or []:
+                story.append(Paragraph(_text(highlight), styles['bullet'], bulletText='•'))
+
+    education = resume.get('education')
+    if education:
+        story.append(Paragraph(_text(labels['education']), styles['heading']))
+        if isinstance(education, dict):
+            for institution, degrees in education.items():
+                degrees = degrees if isinstance(degrees, list) else [degrees]
+                story.append(Paragraph(_text(institution), styles['role']))
+                for degree in degrees:
+                    story.append(Paragraph(_text(degree), styles['body']))
+        else:
+            story.append(Paragraph(_text(education), styles['body']))
+
+    if resume.get('skills'):
+        story.append(Paragraph(_text(labels['skills']), styles['heading']))
+        story.append(Paragraph(_text(resume['skills']), styles['body']))
+
+    additional = resume.get('additional_information')
+    if isinstance(additional, dict) and any(additional.values()):
+        story.append(Paragraph(_text(labels['additional_information']), styles['heading']))
+        for key, value in additional.items():
+            if value:
+                story.append(Paragraph(
+                    f"<b>{_text(_label(labels, key))}:</b> {_text(value)}", styles['body']
+                ))
+    return story
+
+
+def render_pdf(resume, template='classic', locale='en'):
+    """
+    Renders a structured resume (as returned by ResumeAPIView) to PDF.
+
+    The output only depends on the arguments: the same resume, template and locale always give the
+    same bytes.
+
+    Args:
+        resume (dict): The structured resume.
+        template (str): A key of TEMPLATES.
+        locale (str): A key of LOCALES.
+    Returns:
+        bytes: The PDF document.
+    """
+    # Imported here so processes that never export a PDF do not load reportlab
+    from reportlab.lib import pagesizes
+    from reportlab.lib.units import mm
+    from reportlab.platypus import SimpleDocTemplate
+
+    labels = LOCALES[locale]
+    margin = TEMPLATES[template]['margin'] * mm
+    title = resume.get('title') if isinstance(resume.get('title'), str) else ''
+    buffer = io.BytesIO()
+    document = SimpleDocTemplate(
+        buffer,
+        pagesize=pagesizes.A4 if labels['page_size'] == 'A4' else pagesizes.LETTER,
+        leftMargin=margin, rightMargin=margin, topMargin=margin, bottomMargin=margin,
+        title=title, creator='dagbok', invariant=1,
+    )
+    document.build(_story(resume, _styles(template), labels))
+    return buffer.getvalue()
+
+
+def pdf_cache_key(version, template, locale):
+    """Returns the render cache key (SHA-256 hex digest) of a resume version token, template and locale."""
+    material = f"{version}|{template}|{locale}|{PDF_RENDER_VERSION}"
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class PdfRenderer:
+    """
+    Runs render_pdf on a thread or process pool, keeping at most max_pending renders in flight.
+
+    Rendering is CPU-bound pure Python, so the 'process' pool is the one that uses several cores;
+    'thread' suits platforms without multiprocessing support (e.g. AWS Lambda).
+    """
+
+    def __init__(self, kind, workers, max_pending):
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        if kind == 'thread':
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='resume-pdf')
+        elif kind == 'process':
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            from .jobs import _init_process_worker
+
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_process_worker,
+            )
+        else:
+            raise ValueError(f"Unknown RESUME_PDF_EXECUTOR: {kind}")
+
+    def render(self, resume, template, locale, timeout=None):
+        """
+        Renders a resume on the pool and waits for the result.
+
+        Raises:
+            PdfExportBusy: If max_pending renders are already in flight.
+            concurrent.futures.TimeoutError: If the render did not finish within timeout seconds.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise PdfExportBusy()
+        try:
+            future = self._executor.submit(render_pdf, resume, template, locale)
+        except BaseException:
+            # Shut down or broken pool: the render never started and would never release its slot
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(timeout=timeout)
+
+
+def build_pdf_cache():
+    """Returns the render cache backend selected by settings.RESUME_PDF_CACHE_BACKEND."""
+    backend_name = settings.RESUME_PDF_CACHE_BACKEND
+    if backend_name == 'disk':
+        return DiskBackend(settings.RESUME_PDF_CACHE_DIR, suffix='.pdf')
+    if backend_name == 's3':
+        return S3Backend(
+            settings.AWS_STORAGE_BUCKET_NAME, settings.RESUME_PDF_CACHE_S3_PREFIX,
+            suffix='.pdf', content_type='application/pdf',
+        )
+    if backend_name == 'memory':
+        return MemoryLRUBackend(settings.RESUME_PDF_CACHE_MAX_BYTES)
+    if backend_name == 'none':
+        return NullBackend()
+    raise ValueError(f"Unknown RESUME_PDF_CACHE_BACKEND: {backend_name}")
+
+
+_pdf_cache = None
+_pdf_renderer = None
+_pdf_lock = threading.Lock()
+
+
+def get_pdf_cache():
+    """Returns the render cache backend of this process, building it on first use."""
+    global _pdf_cache
+    with _pdf_lock:
+        if _pdf_cache is None:
+            _pdf_cache = build_pdf_cache()
+        return _pdf_cache
+
+
+def get_pdf_renderer():
+    """Returns the PdfRenderer of this process, creating it on first use."""
+    global _pdf_renderer
+    with _pdf_lock:
+        if _pdf_renderer is None:
+            _pdf_renderer = PdfRenderer(
+                settings.RESUME_PDF_EXECUTOR, settings.RESUME_PDF_WORKERS, settings.RESUME_PDF_MAX_PENDING
+            )
+        return _pdf_renderer
+
+
+_flight = SingleFlight()
+
+
+def _render(key, resume, template, locale):
+    try:
+        with timed('pdf_render'):
+            body = get_pdf_renderer().render(resume, template, locale, timeout=settings.RESUME_PDF_TIMEOUT)
+    except Exception as e:
+        RESUME_PDF_EXPORTS.inc(outcome='rejected' if isinstance(e, PdfExportBusy) else 'failed')
+        raise
+    RESUME_PDF_EXPORTS.inc(outcome='rendered')
+    try:
+        get_pdf_cache().set(key, body)
+    except Exception as e:
+        logger.warning("Failed to store PDF %s: %s", key, e)
+    return body
+
+
+def export_pdf(version, resume, template, locale):
+    """
+    Returns the PDF of a resume version, from the render cache or rendered on the pool.
+
+    Args:
+        version (str): Version token of the resume (an S3 ETag of resume.json or 'rv<id>').
+        resume (dict): The structured resume of that version.
+        template (str): A key of TEMPLATES.
+        locale (str): A key of LOCALES.
+    Returns:
+        bytes: The PDF document.
+    Raises:
+        PdfExportBusy: If the PDF is not cached and the render pool is saturated.
+        concurrent.futures.TimeoutError: If rendering took longer than settings.RESUME_PDF_TIMEOUT.
+    """
+    key = pdf_cache_key(version, template, locale)
+    try:
+        body = get_pdf_cache().get(key)
+    except Exception as e:
+        logger.warning("Failed to read PDF %s: %s", key, e)
+        body = None
+    if body is not None:
+        RESUME_PDF_EXPORTS.inc(outcome='cache_hit')
+        return body
+    # Concurrent exports of the same key (e.g. a download retried by the browser) share one render
+    body, shared = _flight.do(key, lambda: _render(key, resume, template, locale))
+    if shared:
+        RESUME_PDF_EXPORTS.inc(outcome='coalesced')
+    return body
@@ -0,0 +1,187 @@
+"""
+Versioned prompt templates shared by every provider, and per-call token accounting.
+
+A template is compiled once at import: its instructions form a system message whose bytes never
+change between calls, and only the variable parts of a call (the diary text, the candidate skills
+matched in it, a job description) go into the user message that follows. DeepSeek (context caching)
+and OpenAI (prompt caching) both reuse the longest prefix they have already seen, so repeated calls
+only pay the cached rate for the instructions; OpenAI only caches prompts of 1024 tokens or more, so
+there the saving is limited to long diaries.
+
+Every provider call is accounted per template version from the usage block of the response: prompt,
+cached prompt and completion tokens (PROMPT_TOKENS), the estimated cost at the prices of PRICES
+(PROMPT_COST, overridable through settings.RESUME_PROVIDER_PRICES) and the latency
+(PROMPT_CALL_SECONDS). A template change therefore shows up as a new 'template' label on /metrics
+next to the previous version.
+
+Classes:
+    PromptTemplate: A named, versioned template with a static system prefix.
+    Usage: Token counts of one provider call.
+
+Functions:
+    detected_skills_note(skills): The user message line listing the skills matched by keyword.
+    parse_usage(result): Extracts the Usage of a chat-completion response.
+    call_cost(model, usage): Estimated cost in USD of a call.
+    record_usage(template, provider, model, result, elapsed): Accounts the tokens, cost and latency of a call.
+
+Attributes:
+    RESUME_TEMPLATE (PromptTemplate): Structures a diary into the resume JSON.
+    TAILOR_RESUME_TEMPLATE (PromptTemplate): Writes a resume tailored to a job description.
+    COVER_LETTER_TEMPLATE (PromptTemplate): Writes a cover letter for a job description.
+    PROVIDER_NOTES (dict): Provider-specific lines prepended to the user message.
+    PRICES (dict): (input, cached input, output) USD per million tokens of each model.
+"""
+import json
+import hashlib
+import logging
+from collections import namedtuple
+
+from django.conf import settings
+
+from .chunking import estimate_tokens
+from .metrics import PROMPT_CALL_SECONDS, PROMPT_COST, PROMPT_TOKENS
+
+logger = logging.getLogger(__name__)
+
+Usage = namedtuple('Usage', ['prompt', 'cached', 'completion'])
+
+# List prices in USD per million tokens: (input, cached input, output)
+PRICES = {
+    'deepseek-chat': (0.28, 0.028, 0.42),
+    'gpt-3.5-turbo': (0.50, 0.50, 1.50),
+}
+
+
+class PromptTemplate:
+    """
+    A prompt template: a static system message followed by a user message built from a format string.
+
+    Args:
+        name (str): Template name, used in metric labels and cache keys.
+        version (str): Bump whenever the wording changes, so cached results are not reused and the
+            metrics of the new wording are told apart.
+        system (str): The instructions; sent unchanged on every call.
+        user (str): str.format pattern of the user message.
+    """
+
+    def __init__(self, name, version, system, user):
+        self.name = name
+        self.version = version
+        self.id = f"{name}-v{version}"
+        self.system = system
+        self.user = user
+        # The digest keeps results of an edited template apart even if the version was not bumped
+        digest = hashlib.sha256(f"{system}\0{user}".encode('utf-8')).hexdigest()[:8]
+        self.cache_version = f"{self.id}-{digest}"
+        self.prefix_tokens = estimate_tokens(system)
+
+    def messages(self, **values):
+        """Returns the chat messages of a call: the static system message, then the rendered user message."""
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user.format(**values)},
+        ]
+
+
+RESUME_TEMPLATE = PromptTemplate('resume', '4', (
+    "You are a helpful assistant that interprets unstructured resume text and structures it into a JSON format. "
+    "Extract and categorize the following sections:\n"
+    "- 'title': The person's name and professional title (e.g., 'Adriano Alves - Software Engineer').\n"
+    "- 'summary': An object with 'professional_summary' (a brief overview of the person's career). Do NOT include a 'key_skills' field here, as skills should only be in the 'skills' section.\n"
+    "- 'education': An object where each key is an institution name, with the value being either a single string (e.g., 'Bachelor of Computer Science (2014-2018)') or a list of strings if multiple degrees are mentioned.\n"
+    "- 'experience': A list of objects, each describing a professional experience with the following fields: 'company' (company name), 'role', 'timeline', 'description', and 'highlights' (a list of achievements). Extract this from job history or narrative text.\n"
+    "- 'skills': A list of technical and soft skills mentioned anywhere in the text (e.g., ['JavaScript', 'Leadership']). When the message lists candidate skills matched by keyword, include only the skills that are NOT in that list. This should be the only section containing skills.\n"
+    "- 'rejected_skills': Only when the message lists candidate skills: a list of the candidates that are not skills of the person in this text (e.g., a word used in its ordinary meaning, like 'react quickly'). Omit it when every candidate is a real skill.\n"
+    "- 'additional_information': An object with fields like 'languages', 'citizenship', 'availability', and 'interests' if present.\n"
+    "Ensure that 'experience' and 'skills' are always populated if relevant information exists in the text. If the text mentions jobs or roles, include them in the 'experience' section with full details. If skills are mentioned (e.g., 'experienced in JavaScript', 'leadership skills'), list them in the 'skills' section. "
+    "Return a valid JSON object with these sections."
+), "{notes}{detected_skills}Unstructured resume text:\n\n{text}")
+
+TAILOR_RESUME_TEMPLATE = PromptTemplate('tailor_resume', '2', (
+    "You are a helpful assistant that tailors resumes to job descriptions. "
+    "Return a JSON resume tailored to the job in the message, using only the candidate facts listed there, with "
+    "'title', 'summary' (an object with 'professional_summary'), 'experience' (a list of objects with "
+    "'company', 'role', 'timeline', 'description' and 'highlights') and 'skills' (most relevant first). "
+    "Do not invent experience."
+), "{candidate}\nJob description:\n{job_description}")
+
+COVER_LETTER_TEMPLATE = PromptTemplate('cover_letter', '2', (
+    "You are a helpful assistant that writes cover letters. "
+    "Write a concise cover letter (at most 4 paragraphs, plain text) for the job in the message, "
+    "using only the candidate facts listed there. Do not invent experience."
+), "{candidate}\nJob description:\n{job_description}")
+
+# Kept out of the system message so every provider shares the same instructions
+PROVIDER_NOTES = {
+    'deepseek': "Write the JSON in English.\n",
+}
+
+
+def detected_skills_note(skills):
+    """
+    Returns the user message line listing the skills matched locally by keyword, or '' if there are none.
+
+    They are only candidates: the provider rejects the ones that are not skills of the person (see
+    api/skills.py enrich_resume) instead of writing out the others again.
+    """
+    if not skills:
+        return ""
+    return f"Candidate skills matched by keyword: {json.dumps(list(skills), ensure_ascii=False)}\n\n"
+
+
+def parse_usage(result):
+    """
+    Returns the Usage reported in a chat-completion response, or None if it has no usage block.
+
+    Cached prompt tokens are read from 'prompt_cache_hit_tokens' (DeepSeek) or
+    'prompt_tokens_details.cached_tokens' (OpenAI); both are included in the prompt tokens.
+    """
+    usage = result.get('usage') if isinstance(result, dict) else None
+    if not isinstance(usage, dict):
+        return None
+    cached = usage.get('prompt_cache_hit_tokens')
+    if cached is None:
+        cached = (usage.get('prompt_tokens_details') or {}).get('cached_tokens')
+    return Usage(int(usage.get('prompt_tokens') or 0), int(cached or 0), int(usage.get('completion_tokens') or 0))
+
+
+def call_cost(model, usage):
+    """Returns the estimated cost in USD of a call of model, or None if the model has no known price."""
+    prices = {**PRICES, **settings.RESUME_PROVIDER_PRICES}.get(model)
+    if prices is None:
+        return None
+    price_input, price_cached, price_output = prices
+    return (
+        (usage.prompt - usage.cached) * price_input + usage.cached * price_cached + usage.completion * price_output
+    ) / 1_000_000
+
+
+def record_usage(template, provider, model, result, elapsed):
+    """
+    Accounts a successful provider call under the version of the template it was built from.
+
+    Args:
+        template (PromptTemplate): The template of the prompt.
+        provider (str): Key of PROVIDERS that answered.
+        model (str): Its model.
+        result (dict): The decoded response.
+        elapsed (float): Call latency in seconds.
+    Returns:
+        Usage: The token counts of the call, or None if the response reported none.
+    """
+    labels = {'template': template.id, 'provider': provider, 'model': model}
+    PROMPT_CALL_SECONDS.observe(elapsed, **labels)
+    usage = parse_usage(result)
+    if usage is None:
+        return None
+    PROMPT_TOKENS.inc(usage.prompt, kind='prompt', **labels)
+    PROMPT_TOKENS.inc(usage.cached, kind='cached', **labels)
+    PROMPT_TOKENS.inc(usage.completion, kind='completion', **labels)
+    cost = call_cost(model, usage)
+    if cost is not None:
+        PROMPT_COST.inc(cost, **labels)
+    logger.debug(
+        "Provider usage: %d prompt (%d cached), %d completion tokens", usage.prompt, usage.cached, usage.completion,
+        extra={**labels, 'elapsed': round(elapsed, 3), 'cost_usd': cost},
+    )
+    return usage
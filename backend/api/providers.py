@@ -0,0 +1,529 @@
+"""
+Unified client for the chat-completions APIs used to structure resumes (DeepSeek and ChatGPT).
+
+Every provider shares one keep-alive requests.Session per process, retries transient failures with
+jittered exponential backoff (honouring 429 Retry-After), and is guarded by a circuit breaker so a
+provider that keeps failing is skipped instead of being waited on. first_valid() runs the same work
+against a second provider, either as a fallback when the first one fails or as a hedge once the
+first one is slower than a latency threshold, and returns the first valid result.
+
+The async views (ASGI) use the same providers through achat() and afirst_valid(): requests go through
+an httpx.AsyncClient per event loop whose connection pool (settings.RESUME_ASYNC_PROVIDER_CONNECTIONS)
+bounds the concurrent calls, with the same retries, circuit breaker and metrics, so one process can
+wait on hundreds of provider calls without holding a thread for each.
+
+Classes:
+    ProviderError: Raised when a provider call fails after all retries.
+    CircuitOpenError: Raised without calling the provider while its circuit breaker is open.
+    CircuitBreaker: Consecutive-failure circuit breaker with a half-open trial call.
+    Provider: Pooled, retrying client for one chat-completions endpoint.
+
+Functions:
+    get_provider(name): Returns the process-wide Provider for a name of PROVIDERS.
+    first_valid(calls, hedge_after): Runs calls in order (hedged/fallback) and returns the first non-None result.
+    afirst_valid(calls, hedge_after): Same as first_valid for coroutine functions.
+"""
+import os
+import time
+import json
+import random
+import asyncio
+import logging
+import weakref
+import threading
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from .metrics import PROVIDER_REQUESTS, timed
+
+logger = logging.getLogger(__name__)
+
+
+# Model, API key environment variable and endpoint of each supported provider. The endpoint can be
+# overridden through the url_env environment variable (e.g. to point at bench/stub_provider.py)
+PROVIDERS = {
+    "deepseek": {
+        "model": "deepseek-chat",
+        "api_key_env": "DEEPSEEK_API_KEY",
+        "url": "https://api.deepseek.com/v1/chat/completions",
+        "url_env": "DEEPSEEK_API_URL",
+    },
+    "chatgpt": {
+        "model": "gpt-3.5-turbo",
+        "api_key_env": "OPENAI_API_KEY",
+        "url": "https://api.openai.com/v1/chat/completions",
+        "url_env": "OPENAI_API_URL",
+    },
+}
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class ProviderError(Exception):
+    def __init__(self, message, status_code=None, body=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class CircuitOpenError(ProviderError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. While open every call is rejected until
+    `reset_timeout` seconds have passed; then a single trial call is let through (half-open) and
+    its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow(self):
+        """Returns True if a call may be attempted now."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.trial_in_progress:
+                return False
+            self.trial_in_progress = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_progress = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Lets another trial call through after one that ended without an outcome (e.g. a bug)."""
+        with self._lock:
+            self.trial_in_progress = False
+
+
+def _retry_after_seconds(response):
+    """Parses the Retry-After header (delta-seconds or HTTP date) of a response, if any."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Provider:
+    """Pooled, retrying client for one OpenAI-compatible chat-completions endpoint."""
+
+    def __init__(self, name, url, model, api_key_env, url_env=None):
+        self.name = name
+        self.url = (url_env and os.getenv(url_env)) or url
+        self.model = model
+        self.api_key_env = api_key_env
+        self.breaker = CircuitBreaker(settings.RESUME_CIRCUIT_FAILURES, settings.RESUME_CIRCUIT_RESET)
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    @property
+    def session(self):
+        """Keep-alive session shared by every call to this provider, created on first use."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.RESUME_PROVIDER_POOL_SIZE)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def async_client(self):
+        """
+        Returns the httpx.AsyncClient of the running event loop, created on first use (a client is
+        bound to the loop it was created on). httpx is imported here so WSGI processes never load it.
+        """
+        loop = asyncio.get_running_loop()
+        with self._session_lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                import httpx
+
+                limits = httpx.Limits(
+                    max_connections=settings.RESUME_ASYNC_PROVIDER_CONNECTIONS,
+                    max_keepalive_connections=settings.RESUME_PROVIDER_POOL_SIZE,
+                )
+                client = self._async_clients[loop] = httpx.AsyncClient(limits=limits)
+            return client
+
+    def _headers(self, api_key):
+        return {
+            "Authorization": f"Bearer {api_key or os.getenv(self.api_key_env)}",
+            "Content-Type": "application/json"
+        }
+
+    def _payload(self, messages, temperature, stream=False):
+        payload = {"model": self.model, "messages": messages, "temperature": temperature}
+        if stream:
+            # The usage block only comes in a final chunk of its own when asked for
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    def _post(self, payload, api_key, timeout, stream=False):
+        """
+        Sends payload, retrying retryable failures until settings.RESUME_PROVIDER_MAX_RETRIES is
+        reached or the next backoff would not fit in the timeout.
+
+        Returns:
+            requests.Response: A successful (2xx) response.
+        Raises:
+            CircuitOpenError: If the circuit breaker rejects the call.
+            ProviderError: If the call failed.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name}: circuit breaker is open")
+
+        try:
+            return self._send(payload, api_key, timeout, stream)
+        except ProviderError:
+            raise
+        except BaseException:
+            # Anything else skipped record_success/record_failure: a half-open circuit must not
+            # stay stuck with its trial in progress
+            self.breaker.release_trial()
+            raise
+
+    def _send(self, payload, api_key, timeout, stream):
+        timeout = timeout or settings.RESUME_PROVIDER_TIMEOUT
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = self.session.post(
+                    self.url,
+                    headers=self._headers(api_key),
+                    json=payload,
+                    stream=stream,
+                    timeout=max(0.001, deadline - time.monotonic()),
+                )
+                if response.status_code < 400:
+                    self.breaker.record_success()
+                    return response
+                try:
+                    error = ProviderError(
+                        f"{self.name}: HTTP {response.status_code}",
+                        status_code=response.status_code,
+                        body=response.text,
+                    )
+                finally:
+                    # Give a streamed connection back to the pool before retrying
+                    response.close()
+                retryable = response.status_code in RETRYABLE_STATUS
+            except (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                error = ProviderError(f"{self.name}: connection failed: {e}")
+                retryable = True
+            except requests.exceptions.Timeout as e:
+                error = ProviderError(f"{self.name}: the request timed out: {e}")
+                retryable = False
+            except requests.exceptions.RequestException as e:
+                error = ProviderError(f"{self.name}: request failed: {e}")
+                retryable = False
+
+            time.sleep(self._retry_delay(error, retryable, response, attempt, deadline))
+            attempt += 1
+
+    async def _apost(self, payload, api_key, timeout):
+        """
+        Async version of _post (without streaming), sent through async_client().
+
+        Waiting for a free connection of the pool counts against the timeout.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name}: circuit breaker is open")
+
+        try:
+            return await self._asend(payload, api_key, timeout)
+        except ProviderError:
+            raise
+        except BaseException:
+            self.breaker.release_trial()
+            raise
+
+    async def _asend(self, payload, api_key, timeout):
+        import httpx
+
+        timeout = timeout or settings.RESUME_PROVIDER_TIMEOUT
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            response = None
+            try:
+                response = await self.async_client().post(
+                    self.url,
+                    headers=self._headers(api_key),
+                    json=payload,
+                    timeout=max(0.001, deadline - time.monotonic()),
+                )
+                if response.status_code < 400:
+                    self.breaker.record_success()
+                    return response
+                error = ProviderError(
+                    f"{self.name}: HTTP {response.status_code}",
+                    status_code=response.status_code,
+                    body=response.text,
+                )
+                retryable = response.status_code in RETRYABLE_STATUS
+            except httpx.TimeoutException as e:
+                error = ProviderError(f"{self.name}: the request timed out: {e}")
+                retryable = False
+            except (httpx.NetworkError, httpx.RemoteProtocolError) as e:
+                error = ProviderError(f"{self.name}: connection failed: {e}")
+                retryable = True
+            except httpx.HTTPError as e:
+                error = ProviderError(f"{self.name}: request failed: {e}")
+                retryable = False
+
+            await asyncio.sleep(self._retry_delay(error, retryable, response, attempt, deadline))
+            attempt += 1
+
+    def _retry_delay(self, error, retryable, response, attempt, deadline):
+        """
+        Returns the delay before retrying a failed attempt (attempt counts from 0).
+
+        Raises:
+            ProviderError: error itself, when it is not retryable, the retries are exhausted or the
+                delay would not fit before the deadline. The circuit breaker records the outcome.
+        """
+        backoff = min(settings.RESUME_PROVIDER_BACKOFF_MAX, settings.RESUME_PROVIDER_BACKOFF_BASE * 2 ** attempt)
+        delay = random.uniform(0, backoff)
+        retry_after = _retry_after_seconds(response)
+        if retry_after is not None:
+            delay = retry_after
+        if (not retryable or attempt + 1 > settings.RESUME_PROVIDER_MAX_RETRIES
+                or time.monotonic() + delay >= deadline):
+            # Client errors (e.g. a bad API key) say nothing about the provider's health
+            if retryable or error.status_code is None:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise error
+        logger.warning(
+            "%s; retrying in %.2fs (attempt %d/%d)", error, delay, attempt + 1, settings.RESUME_PROVIDER_MAX_RETRIES,
+            extra={'provider': self.name, 'status_code': error.status_code},
+        )
+        return delay
+
+    def chat(self, messages, temperature, api_key=None, timeout=None):
+        """
+        Sends a chat completion request.
+
+        Returns:
+            dict: The decoded response body.
+        Raises:
+            ProviderError: If the call failed or the body is not JSON.
+        """
+        outcome = 'error'
+        try:
+            with timed('provider_call', self.name, self.model):
+                response = self._post(self._payload(messages, temperature), api_key, timeout)
+                try:
+                    result = response.json()
+                except ValueError as e:
+                    raise ProviderError(f"{self.name}: response is not valid JSON: {e}", body=response.text)
+            outcome = 'success'
+            return result
+        except CircuitOpenError:
+            outcome = 'circuit_open'
+            raise
+        finally:
+            PROVIDER_REQUESTS.inc(provider=self.name, model=self.model, outcome=outcome)
+
+    async def achat(self, messages, temperature, api_key=None, timeout=None):
+        """Async version of chat()."""
+        outcome = 'error'
+        try:
+            with timed('provider_call', self.name, self.model):
+                response = await self._apost(self._payload(messages, temperature), api_key, timeout)
+                try:
+                    result = response.json()
+                except ValueError as e:
+                    raise ProviderError(f"{self.name}: response is not valid JSON: {e}", body=response.text)
+            outcome = 'success'
+            return result
+        except CircuitOpenError:
+            outcome = 'circuit_open'
+            raise
+        finally:
+            PROVIDER_REQUESTS.inc(provider=self.name, model=self.model, outcome=outcome)
+
+    def stream_chat(self, messages, temperature, api_key=None, timeout=None, on_usage=None):
+        """
+        Sends a streaming chat completion request and yields the content deltas as they arrive.
+
+        The call is timed and counted like chat(), from the request to the end of the stream (outcome
+        'cancelled' if the consumer closes the stream before its end).
+
+        Args:
+            on_usage (callable): Called with the chunk carrying the usage block of the call, which
+                the provider sends last.
+        """
+        outcome = 'error'
+        try:
+            with timed('provider_call', self.name, self.model):
+                response = self._post(self._payload(messages, temperature, stream=True), api_key, timeout, stream=True)
+                with response:
+                    for line in response.iter_lines(decode_unicode=True):
+                        if not line or not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        if chunk.get("usage") and on_usage is not None:
+                            on_usage(chunk)
+                        choices = chunk.get("choices") or [{}]
+                        content = choices[0].get("delta", {}).get("content")
+                        if content:
+                            yield content
+            outcome = 'success'
+        except CircuitOpenError:
+            outcome = 'circuit_open'
+            raise
+        except GeneratorExit:
+            outcome = 'cancelled'
+            raise
+        finally:
+            PROVIDER_REQUESTS.inc(provider=self.name, model=self.model, outcome=outcome)
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(name):
+    """Returns the Provider of this process for a key of PROVIDERS."""
+    with _providers_lock:
+        if name not in _providers:
+            _providers[name] = Provider(name, **PROVIDERS[name])
+        return _providers[name]
+
+
+_hedge_executor = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor():
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(
+                max_workers=settings.RESUME_HEDGE_WORKERS, thread_name_prefix='provider-hedge'
+            )
+        return _hedge_executor
+
+
+def first_valid(calls, hedge_after=None):
+    """
+    Runs calls (functions returning a result or None on failure) and returns the first non-None result.
+
+    The first call starts immediately. The next one starts as soon as the running calls all failed
+    (fallback) or, when hedge_after is set, once hedge_after seconds passed without a valid result
+    (hedging). A losing call cannot be cancelled mid-request; it finishes in the background.
+
+    Args:
+        calls (list): Callables in order of preference.
+        hedge_after (float): Seconds to wait before starting the next call, or None to only fall back.
+    Returns:
+        tuple: (result, index of the call that produced it), or (None, None) if every call failed.
+    """
+    if len(calls) == 1:
+        result = calls[0]()
+        return (result, 0) if result is not None else (None, None)
+
+    executor = _get_hedge_executor()
+    pending = {}
+    next_call = 0
+    while True:
+        if next_call < len(calls) and (not pending or hedge_after is not None):
+            pending[executor.submit(calls[next_call])] = next_call
+            next_call += 1
+        if not pending:
+            return None, None
+        wait_for = hedge_after if next_call < len(calls) else None
+        done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.exception("Provider call %d raised: %s", index, e)
+                result = None
+            if result is not None:
+                return result, index
+
+
+async def afirst_valid(calls, hedge_after=None):
+    """
+    Async version of first_valid: calls are coroutine functions returning a result or None.
+
+    Unlike threads, the losing calls are cancelled as soon as a valid result arrives.
+
+    Returns:
+        tuple: (result, index of the call that produced it), or (None, None) if every call failed.
+    """
+    pending = {}
+    next_call = 0
+    try:
+        while True:
+            if next_call < len(calls) and (not pending or hedge_after is not None):
+                pending[asyncio.ensure_future(calls[next_call]())] = next_call
+                next_call += 1
+            if not pending:
+                return None, None
+            wait_for = hedge_after if next_call < len(calls) else None
+            done, _ = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = pending.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    logger.exception("Provider call %d raised: %s", index, e)
+                    result = None
+                if result is not None:
+                    return result, index
+    finally:
+        for task in pending:
+            task.cancel()
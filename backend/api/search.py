@@ -0,0 +1,132 @@
+"""
+Full-text search over diary entries.
+
+Entries are indexed by the database itself, on write, so the index never lags behind the diary and
+searching never reads the raw diary text:
+
+    - SQLite: an FTS5 table (api_diaryentry_fts) over the user and content columns of
+      api_diaryentry, kept in sync by triggers and ranked with bm25;
+    - PostgreSQL: a GIN index on to_tsvector('simple', content), ranked with ts_rank.
+
+Both are created by migration 0005_diary_search. The 'simple' configuration and FTS5's unicode61
+tokenizer do not stem, since diaries mix languages, but fold case (and, for FTS5, diacritics). Other
+database backends fall back to a case-insensitive substring scan.
+
+Query syntax: whitespace-separated terms, all of which must match; a term ending with '*' matches
+every word starting with it ('kube*' finds 'Kubernetes').
+
+Classes:
+    SearchHit: A matching entry and its rank (higher is better).
+
+Functions:
+    parse_query(query): Splits a search query into (term, is_prefix) pairs.
+    search_entries(user, query, entry_type, since, until, limit): Returns the best matching entries of a user.
+"""
+import re
+from collections import namedtuple
+
+from django.db import connection
+
+from .models import DiaryEntry
+
+SearchHit = namedtuple('SearchHit', ['entry', 'rank'])
+
+FTS_TABLE = 'api_diaryentry_fts'
+TERM_RE = re.compile(r'(\w+)(\*)?')
+
+
+def parse_query(query):
+    """Returns the terms of query as (term, is_prefix) pairs, lower-cased; punctuation is ignored."""
+    return [(term.lower(), bool(star)) for term, star in TERM_RE.findall(query)]
+
+
+def _fts5_phrase(text):
+    return '"%s"' % text.replace('"', '""')
+
+
+def _filters(entry_type, since, until, params):
+    clauses = []
+    if entry_type:
+        clauses.append('AND e.entry_type = %s')
+        params.append(entry_type)
+    if since:
+        clauses.append('AND e.entry_date >= %s')
+        params.append(since)
+    if until:
+        clauses.append('AND e.entry_date <= %s')
+        params.append(until)
+    return ' '.join(clauses)
+
+
+def _search_sqlite(user, terms, entry_type, since, until, limit):
+    # Matching the user column too lets FTS5 intersect posting lists instead of ranking every
+    # user's matches; the join still compares the user exactly
+    match = 'user:%s AND content:(%s)' % (
+        _fts5_phrase(user),
+        ' AND '.join(_fts5_phrase(term) + ('*' if prefix else '') for term, prefix in terms),
+    )
+    params = [match, user]
+    where = _filters(entry_type, since, until, params)
+    params.append(limit)
+    sql = (
+        f"SELECT e.id, -bm25({FTS_TABLE}, 0.0, 1.0) AS rank FROM {FTS_TABLE} "
+        f"JOIN api_diaryentry e ON e.id = {FTS_TABLE}.rowid "
+        f"WHERE {FTS_TABLE} MATCH %s AND e.\"user\" = %s {where} ORDER BY rank DESC, e.id DESC LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _search_postgresql(user, terms, entry_type, since, until, limit):
+    # Terms are \w+ only, so quoting them as lexemes is enough to keep tsquery syntax out
+    tsquery = ' & '.join("'%s'%s" % (term, ':*' if prefix else '') for term, prefix in terms)
+    params = [tsquery, user]
+    where = _filters(entry_type, since, until, params)
+    params.append(limit)
+    # The expression must stay identical to the one of the GIN index (migration 0005) to use it
+    sql = (
+        "SELECT e.id, ts_rank(to_tsvector('simple', e.content), q) AS rank "
+        "FROM api_diaryentry e, to_tsquery('simple', %s) q "
+        "WHERE to_tsvector('simple', e.content) @@ q AND e.\"user\" = %s "
+        f"{where} ORDER BY rank DESC, e.id DESC LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _search_scan(user, terms, entry_type, since, until, limit):
+    entries = DiaryEntry.objects.filter(user=user)
+    for term, _ in terms:
+        entries = entries.filter(content__icontains=term)
+    if entry_type:
+        entries = entries.filter(entry_type=entry_type)
+    if since:
+        entries = entries.filter(entry_date__gte=since)
+    if until:
+        entries = entries.filter(entry_date__lte=until)
+    return [(pk, 0.0) for pk in entries.order_by('-id').values_list('id', flat=True)[:limit]]
+
+
+def search_entries(user, query, entry_type=None, since=None, until=None, limit=20):
+    """
+    Returns the diary entries of user matching every term of query, best ranked first.
+
+    Args:
+        user (str): The diary owner.
+        query (str): Search terms (see parse_query).
+        entry_type (str): Optional, only entries of this type.
+        since (date): Optional, only entries dated on or after it.
+        until (date): Optional, only entries dated on or before it.
+        limit (int): Maximum number of hits.
+    Returns:
+        list: SearchHit objects; empty if query holds no term.
+    """
+    terms = parse_query(query)
+    if not terms:
+        return []
+    search = {'sqlite': _search_sqlite, 'postgresql': _search_postgresql}.get(connection.vendor, _search_scan)
+    rows = search(user, terms, entry_type, since, until, limit)
+    entries = DiaryEntry.objects.in_bulk([pk for pk, _ in rows])
+    return [SearchHit(entries[pk], float(rank)) for pk, rank in rows if pk in entries]
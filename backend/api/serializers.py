@@ -0,0 +1,77 @@
+"""
+Django Rest Framework serializers for the diary and resume models.
+
+Classes:
+    DiaryEntrySerializer: Validates and renders DiaryEntry objects.
+    DiarySearchQuerySerializer: Validates the query parameters of the diary search.
+    ResumeVersionSerializer: Renders ResumeVersion objects.
+    ResumeVersionSummarySerializer: Renders ResumeVersion objects without their resume data (history listings).
+    ResumeJobSerializer: Renders ResumeJob objects.
+    TailorRequestSerializer: Validates a request to tailor a resume or cover letter to a job description.
+    ResumePdfQuerySerializer: Validates the query parameters of the PDF export.
+"""
+from rest_framework import serializers
+
+from .models import DiaryEntry, ResumeJob, ResumeVersion
+from .pdf import LOCALES, TEMPLATES
+from .providers import PROVIDERS
+
+
+class DiaryEntrySerializer(serializers.ModelSerializer):
+    user = serializers.RegexField(r'^[A-Za-z0-9_.@-]{1,128}$')
+
+    class Meta:
+        model = DiaryEntry
+        fields = ['id', 'user', 'entry_type', 'content', 'entry_date', 'created_at']
+        read_only_fields = ['id', 'created_at']
+
+
+class DiarySearchQuerySerializer(serializers.Serializer):
+    user = serializers.RegexField(r'^[A-Za-z0-9_.@-]{1,128}$')
+    q = serializers.CharField(max_length=256)
+    entry_type = serializers.ChoiceField(choices=DiaryEntry.ENTRY_TYPES, required=False)
+    since = serializers.DateField(required=False)
+    until = serializers.DateField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class ResumeVersionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ResumeVersion
+        fields = ['id', 'user', 'number', 'provider', 'last_entry_id', 'delta_entries', 'created_at', 'data']
+        read_only_fields = fields
+
+
+class ResumeVersionSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ResumeVersion
+        fields = ['id', 'user', 'number', 'provider', 'last_entry_id', 'delta_entries', 'created_at']
+        read_only_fields = fields
+
+
+class ResumeJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ResumeJob
+        fields = [
+            'id', 'user', 'provider', 'source', 'status', 'error',
+            'deadline', 'created_at', 'started_at', 'finished_at', 'result',
+        ]
+        read_only_fields = fields
+
+
+class TailorRequestSerializer(serializers.Serializer):
+    DOCUMENTS = [('none', 'Ranking only'), ('resume', 'Resume'), ('cover_letter', 'Cover letter')]
+
+    user = serializers.RegexField(r'^[A-Za-z0-9_.@-]{1,128}$')
+    job_description = serializers.CharField(max_length=20000)
+    document = serializers.ChoiceField(choices=DOCUMENTS, default='none')
+    api = serializers.ChoiceField(choices=sorted(PROVIDERS), default='deepseek')
+    top_k = serializers.IntegerField(min_value=1, max_value=50, required=False)
+
+
+class ResumePdfQuerySerializer(serializers.Serializer):
+    user = serializers.RegexField(r'^[A-Za-z0-9_.@-]{1,128}$')
+    api = serializers.ChoiceField(choices=sorted(PROVIDERS), default='deepseek')
+    template = serializers.ChoiceField(choices=list(TEMPLATES), default='classic')
+    locale = serializers.ChoiceField(choices=list(LOCALES), default='en')
+    version = serializers.IntegerField(min_value=1, required=False)
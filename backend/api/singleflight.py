@@ -0,0 +1,282 @@
+"""
+Request coalescing (single-flight) for resume generations.
+
+Several tabs of the same dashboard, or a retrying frontend, ask for the same resume at once. Without
+coordination each request misses the result cache and pays for its own provider call. Here the
+first request for a result cache key becomes the leader and every concurrent request for that key
+waits for the leader's result:
+
+    - within a process, through a table of in-flight calls guarded by a lock;
+    - across processes and nodes (settings.RESUME_SINGLEFLIGHT_LEASE), through a ResumeLease row:
+      the holder generates, the others poll the shared result cache until the result appears or
+      the lease is released or expires.
+
+Every request that finds its key already in flight is counted as 'duplicate' in RESUME_SINGLEFLIGHT,
+then by how it was served: 'coalesced' (the call of its own process), 'lease_wait' (the result of the
+process holding the lease) or 'lease_timeout' (it stopped waiting for a lease holder slower than the
+lease and paid for a second provider call).
+
+The async views use acoalesce(), where waiting callers share an asyncio future of their event loop
+instead of blocking a thread, and the lease is handled on the offload executor (api/offload.py).
+
+Classes:
+    SingleFlight: In-process table of in-flight calls.
+    AsyncSingleFlight: Table of in-flight coroutine calls per event loop.
+
+Functions:
+    acquire_lease(key, owner, ttl): Claims the database lease of a key.
+    release_lease(key, owner): Releases a lease held by owner.
+    coalesce(key, generate, cache): Runs generate once per key across concurrent callers.
+    acoalesce(key, generate, cache): Async version of coalesce for a coroutine function.
+"""
+import os
+import time
+import asyncio
+import weakref
+import uuid
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .metrics import RESUME_SINGLEFLIGHT
+from .models import ResumeLease
+from .offload import run_blocking
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers of the same key share its outcome."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Returns the result of fn(), run by the first caller of key only.
+
+        Returns:
+            tuple: (result, True if the result was produced by another caller's call)
+        Raises:
+            Exception: Whatever the shared call raised.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:12]}"[:128]
+
+
+def acquire_lease(key, owner, ttl):
+    """
+    Claims the lease of key for ttl seconds.
+
+    Returns:
+        bool: True if owner now holds the lease (new, or taken over after it expired).
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            ResumeLease.objects.create(key=key, owner=owner, expires_at=now + timedelta(seconds=ttl))
+        return True
+    except IntegrityError:
+        # Held by someone else: only an expired lease (its holder died or hung) may be taken over
+        return bool(
+            ResumeLease.objects.filter(key=key, expires_at__lt=now).update(
+                owner=owner, expires_at=now + timedelta(seconds=ttl)
+            )
+        )
+
+
+def release_lease(key, owner):
+    """Releases the lease of key if owner still holds it."""
+    ResumeLease.objects.filter(key=key, owner=owner).delete()
+
+
+def _generate_with_lease(key, generate, cache):
+    """Generates under the database lease of key, or waits for the process that holds it."""
+    owner = _owner()
+    ttl = settings.RESUME_SINGLEFLIGHT_LEASE_TTL
+    deadline = time.monotonic() + ttl
+    acquired = acquire_lease(key, owner, ttl)
+    if not acquired:
+        RESUME_SINGLEFLIGHT.inc(outcome='duplicate')
+    while not acquired:
+        time.sleep(settings.RESUME_SINGLEFLIGHT_POLL)
+        cached = cache.get(key)
+        if cached is not None:
+            RESUME_SINGLEFLIGHT.inc(outcome='lease_wait')
+            return cached
+        if time.monotonic() >= deadline:
+            # The holder is taking longer than its lease: stop waiting and pay for a second call
+            RESUME_SINGLEFLIGHT.inc(outcome='lease_timeout')
+            return generate()
+        # Succeeds once the holder released the lease without a cached result (it failed) or let it expire
+        acquired = acquire_lease(key, owner, ttl)
+    try:
+        # The previous holder may have stored the result between our cache miss and the claim
+        cached = cache.get(key)
+        if cached is not None:
+            RESUME_SINGLEFLIGHT.inc(outcome='lease_wait')
+            return cached
+        RESUME_SINGLEFLIGHT.inc(outcome='leader')
+        return generate()
+    finally:
+        release_lease(key, owner)
+
+
+_single_flight = SingleFlight()
+
+
+def coalesce(key, generate, cache):
+    """
+    Returns generate() for a result cache key that just missed, sharing one call between all the
+    concurrent callers of the key.
+
+    Args:
+        key (str): Key returned by make_cache_key.
+        generate (callable): Produces (and stores in cache) the result, or returns None on failure.
+        cache (ResultCache): The result cache, polled while another process generates the key.
+    Returns:
+        The result of the shared call.
+    """
+    def run():
+        if settings.RESUME_SINGLEFLIGHT_LEASE:
+            return _generate_with_lease(key, generate, cache)
+        RESUME_SINGLEFLIGHT.inc(outcome='leader')
+        return generate()
+
+    result, shared = _single_flight.do(key, run)
+    if shared:
+        RESUME_SINGLEFLIGHT.inc(outcome='duplicate')
+        RESUME_SINGLEFLIGHT.inc(outcome='coalesced')
+    return result
+
+
+class AsyncSingleFlight:
+    """Runs at most one coroutine call per key at a time on each event loop."""
+
+    def __init__(self):
+        self._tables = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    async def do(self, key, fn):
+        """
+        Returns the result of await fn(), run by the first caller of key only.
+
+        Returns:
+            tuple: (result, True if the result was produced by another caller's call)
+        Raises:
+            Exception: Whatever the shared call raised.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            calls = self._tables.setdefault(loop, {})
+        while True:
+            future = calls.get(key)
+            if future is None:
+                break
+            # Shielded: a waiter whose request is cancelled must not cancel the shared call
+            result, error = await asyncio.shield(future)
+            if isinstance(error, asyncio.CancelledError):
+                # The leader's request went away before finishing: take over
+                continue
+            if error is not None:
+                raise error
+            return result, True
+
+        future = calls[key] = loop.create_future()
+        try:
+            result = await fn()
+        except BaseException as e:
+            future.set_result((None, e))
+            raise
+        finally:
+            del calls[key]
+        future.set_result((result, None))
+        return result, False
+
+
+async def _agenerate_with_lease(key, generate, cache):
+    """Async version of _generate_with_lease; database and cache calls run on the offload executor."""
+    owner = _owner()
+    ttl = settings.RESUME_SINGLEFLIGHT_LEASE_TTL
+    deadline = time.monotonic() + ttl
+    acquired = await run_blocking(acquire_lease, key, owner, ttl)
+    if not acquired:
+        RESUME_SINGLEFLIGHT.inc(outcome='duplicate')
+    while not acquired:
+        await asyncio.sleep(settings.RESUME_SINGLEFLIGHT_POLL)
+        cached = await run_blocking(cache.get, key)
+        if cached is not None:
+            RESUME_SINGLEFLIGHT.inc(outcome='lease_wait')
+            return cached
+        if time.monotonic() >= deadline:
+            RESUME_SINGLEFLIGHT.inc(outcome='lease_timeout')
+            return await generate()
+        acquired = await run_blocking(acquire_lease, key, owner, ttl)
+    try:
+        cached = await run_blocking(cache.get, key)
+        if cached is not None:
+            RESUME_SINGLEFLIGHT.inc(outcome='lease_wait')
+            return cached
+        RESUME_SINGLEFLIGHT.inc(outcome='leader')
+        return await generate()
+    finally:
+        await run_blocking(release_lease, key, owner)
+
+
+_async_single_flight = AsyncSingleFlight()
+
+
+async def acoalesce(key, generate, cache):
+    """
+    Async version of coalesce().
+
+    Args:
+        key (str): Key returned by make_cache_key.
+        generate (callable): Coroutine function producing (and storing in cache) the result, or None.
+        cache (ResultCache): The result cache, polled while another process generates the key.
+    Returns:
+        The result of the shared call.
+    """
+    async def run():
+        if settings.RESUME_SINGLEFLIGHT_LEASE:
+            return await _agenerate_with_lease(key, generate, cache)
+        RESUME_SINGLEFLIGHT.inc(outcome='leader')
+        return await generate()
+
+    result, shared = await _async_single_flight.do(key, run)
+    if shared:
+        RESUME_SINGLEFLIGHT.inc(outcome='duplicate')
+        RESUME_SINGLEFLIGHT.inc(outcome='coalesced')
+    return result
@@ -0,0 +1,352 @@
+"""
+Deterministic local extraction of skills and experience timelines from diary text.
+
+Listing the skills "mentioned anywhere in the text" is dictionary matching, so it is done here with
+an Aho-Corasick automaton over a curated vocabulary (one pass over the text, whatever the number of
+patterns) instead of by the provider. Date ranges and the company names next to them are found with
+regular-expression heuristics. Keyword matches are only candidates: the prompt lists them so the
+provider does not have to write them out again, the provider names the ones that are not skills of
+the person (a word used in its ordinary meaning), and only the others are merged into its resume. A
+provider call is also unnecessary when a diary delta adds nothing but known skills.
+
+Classes:
+    AhoCorasick: Multi-pattern matcher returning leftmost-longest, whole-word matches.
+    Extraction: Skills and experience hints found in a text.
+
+Functions:
+    extract_skills(text): Canonical names of the vocabulary skills mentioned in text.
+    extract_experience_hints(text): {'company', 'timeline'} pairs found by the date-range heuristics.
+    pre_extract(text): Both of the above, memoized per text digest.
+    is_known_skills_only(text): Tells whether text mentions nothing but vocabulary skills.
+    enrich_resume(resume, extraction): Merges the local extraction into a structured resume.
+
+Attributes:
+    SKILL_VOCABULARY (dict): Canonical skill name -> aliases. Only the aliases are matched, so
+        ambiguous names ('Go', 'Spring') are listed under safer spellings. Lower-case aliases match
+        case-insensitively; aliases written with capitals are names that are also ordinary words
+        ('React', 'Rust') and only match with that exact case.
+    REJECTED_SKILLS_KEY (str): Resume key under which the provider lists the candidates it rejects.
+"""
+import re
+import hashlib
+import functools
+import threading
+from collections import OrderedDict, deque, namedtuple
+
+SKILL_VOCABULARY = {
+    # Languages
+    "Python": ["python", "python3"],
+    "JavaScript": ["javascript", "js", "ecmascript"],
+    "TypeScript": ["typescript"],
+    "Java": ["Java"],
+    "Kotlin": ["kotlin"],
+    "Scala": ["scala"],
+    "Go": ["golang", "go lang"],
+    "Rust": ["Rust", "rustlang"],
+    "C++": ["c++", "cpp"],
+    "C#": ["c#", "csharp"],
+    "PHP": ["php"],
+    "Ruby": ["Ruby"],
+    "Swift": ["Swift", "swiftui"],
+    "Dart": ["Dart"],
+    "Elixir": ["elixir"],
+    "Haskell": ["haskell"],
+    "Bash": ["bash", "shell script", "shell scripting"],
+    "SQL": ["sql"],
+    "HTML": ["html", "html5"],
+    "CSS": ["css", "css3"],
+    # Frameworks and libraries
+    "Django": ["django"],
+    "Django REST Framework": ["django rest framework", "drf"],
+    "Flask": ["flask"],
+    "FastAPI": ["fastapi"],
+    "Celery": ["celery"],
+    "Pandas": ["pandas"],
+    "NumPy": ["numpy"],
+    "scikit-learn": ["scikit-learn", "sklearn"],
+    "TensorFlow": ["tensorflow"],
+    "PyTorch": ["pytorch"],
+    "React": ["React", "react.js", "reactjs"],
+    "React Native": ["react native"],
+    "Next.js": ["next.js", "nextjs"],
+    "Vue.js": ["vue", "vue.js", "vuejs"],
+    "Angular": ["angular", "angularjs"],
+    "Node.js": ["node.js", "nodejs"],
+    "Express": ["express.js", "expressjs"],
+    "Spring": ["spring boot", "spring framework"],
+    ".NET": [".net", "dotnet", "asp.net"],
+    "Ruby on Rails": ["ruby on rails", "Rails"],
+    "Laravel": ["laravel"],
+    "Tailwind CSS": ["tailwind", "tailwind css", "tailwindcss"],
+    "GraphQL": ["graphql"],
+    "REST APIs": ["rest api", "rest apis", "restful", "api rest"],
+    "gRPC": ["grpc"],
+    # Data stores and messaging
+    "PostgreSQL": ["postgresql", "postgres"],
+    "MySQL": ["mysql"],
+    "SQLite": ["sqlite"],
+    "MongoDB": ["mongodb", "mongo"],
+    "Redis": ["redis"],
+    "Elasticsearch": ["elasticsearch", "elastic search"],
+    "DynamoDB": ["dynamodb"],
+    "Kafka": ["kafka"],
+    "RabbitMQ": ["rabbitmq"],
+    "Spark": ["Spark", "pyspark", "apache spark"],
+    "Airflow": ["airflow"],
+    # Cloud and operations
+    "AWS": ["aws", "amazon web services"],
+    "AWS Lambda": ["aws lambda"],
+    "S3": ["s3", "amazon s3"],
+    "Azure": ["azure"],
+    "Google Cloud": ["gcp", "google cloud"],
+    "Docker": ["docker"],
+    "Kubernetes": ["kubernetes", "k8s"],
+    "Terraform": ["terraform"],
+    "Ansible": ["ansible"],
+    "Nginx": ["nginx"],
+    "Linux": ["linux"],
+    "Git": ["git"],
+    "GitHub Actions": ["github actions"],
+    "CI/CD": ["ci/cd", "continuous integration", "continuous delivery", "integração contínua"],
+    "Zappa": ["zappa"],
+    "Prometheus": ["prometheus"],
+    "Grafana": ["grafana"],
+    # Practices
+    "Microservices": ["microservices", "microserviços", "microsserviços"],
+    "Test-Driven Development": ["tdd", "test-driven development"],
+    "Unit Testing": ["unit testing", "unit tests", "testes unitários"],
+    "Machine Learning": ["machine learning", "aprendizado de máquina"],
+    "Data Analysis": ["data analysis", "análise de dados"],
+    "Agile": ["agile", "metodologias ágeis"],
+    "Scrum": ["scrum"],
+    "Kanban": ["kanban"],
+    "OAuth": ["oauth", "oauth2"],
+    # Soft skills
+    "Leadership": ["leadership", "liderança", "team lead"],
+    "Communication": ["communication skills", "habilidades de comunicação"],
+    "Teamwork": ["teamwork", "trabalho em equipe"],
+    "Mentoring": ["mentoring", "mentorship", "mentoria"],
+    "Problem Solving": ["problem solving", "resolução de problemas"],
+    "Project Management": ["project management", "gestão de projetos", "gerenciamento de projetos"],
+    "Public Speaking": ["public speaking", "palestrante", "dei palestras", "ministrei palestras"],
+}
+
+REJECTED_SKILLS_KEY = 'rejected_skills'
+
+Extraction = namedtuple('Extraction', ['skills', 'experience_hints'])
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton mapping patterns to values.
+
+    Matching is case-insensitive, except for the patterns listed as case-sensitive, and only reports
+    whole-word matches (not preceded or followed by a letter or digit); among overlapping matches the
+    leftmost-longest wins, so 'React Native' is not also reported as 'React'.
+    """
+
+    def __init__(self, patterns, case_sensitive=()):
+        """
+        Args:
+            patterns (dict): Pattern -> value reported when the pattern matches.
+            case_sensitive (iterable): Patterns of `patterns` that only match with their exact case.
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        case_sensitive = set(case_sensitive)
+        for pattern, value in patterns.items():
+            self._add(pattern.lower(), (value, pattern if pattern in case_sensitive else None))
+        self._build_failure_links()
+
+    def _add(self, pattern, value):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(pattern), value))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text):
+        """Yields (start, end, value) for every whole-word, non-overlapping match, in text order."""
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # A few characters lower-case to several (e.g. 'İ'); keep offsets aligned with text
+            lowered = ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+        candidates = []
+        state = 0
+        for i, char in enumerate(lowered):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, (value, exact) in self._output[state]:
+                start, end = i - length + 1, i + 1
+                if exact is not None and text[start:end] != exact:
+                    continue
+                if (start == 0 or not lowered[start - 1].isalnum()) and (end == len(lowered) or not lowered[end].isalnum()):
+                    candidates.append((start, -end, value))
+        last_end = 0
+        for start, neg_end, value in sorted(candidates):
+            if start >= last_end:
+                last_end = -neg_end
+                yield start, last_end, value
+
+
+@functools.lru_cache(maxsize=1)
+def _skill_matcher():
+    patterns = {}
+    for skill, aliases in SKILL_VOCABULARY.items():
+        for alias in aliases:
+            patterns[alias] = skill
+    return AhoCorasick(patterns, case_sensitive=[alias for alias in patterns if alias != alias.lower()])
+
+
+def extract_skills(text):
+    """Returns the canonical names of the vocabulary skills mentioned in text, in order of first mention."""
+    skills = []
+    for _, _, skill in _skill_matcher().iter_matches(text):
+        if skill not in skills:
+            skills.append(skill)
+    return skills
+
+
+_MONTH = (
+    r"(?:jan|feb|fev|mar|apr|abr|may|mai|jun|jul|aug|ago|sep|set|oct|out|nov|dec|dez)[a-zç]*\.?"
+)
+_DATE = rf"(?:{_MONTH}\s+(?:de\s+)?\d{{4}}|\d{{1,2}}/\d{{4}}|\d{{4}})"
+_OPEN_END = r"(?:present|presente|current|now|today|atual|atualmente|hoje|o momento)"
+DATE_RANGE_RE = re.compile(
+    rf"\b(?P<start>{_DATE})\s*(?:-|–|—|to|até|a)\s*(?P<end>{_DATE}|{_OPEN_END})\b", re.IGNORECASE
+)
+# "at Acme Corp", "joined Acme", "na Acme", "pela Acme", "@Acme"
+COMPANY_RE = re.compile(
+    r"(?:\b(?:at|joined|for|na|no|pela|pelo|empresa)\s+|@\s?)"
+    r"(?P<company>[A-Z0-9][\w&.'-]*(?:\s+(?:[A-Z0-9][\w&.'-]*|&|de|do|da))*)"
+)
+
+
+def extract_experience_hints(text):
+    """
+    Returns {'company', 'timeline'} pairs for the diary lines that mention both a date range and a
+    company ("2019 - 2021 at Acme Corp", "Trabalhei na Acme de mar 2019 a atual").
+    """
+    hints = []
+    for line in text.splitlines():
+        date_range = DATE_RANGE_RE.search(line)
+        if date_range is None:
+            continue
+        company = COMPANY_RE.search(line)
+        if company is None:
+            continue
+        name = re.sub(r"(?:\s+(?:de|do|da|&))+$", "", company.group('company')).rstrip(".,;")
+        timeline = f"{date_range.group('start')} - {date_range.group('end')}"
+        if name and {'company': name, 'timeline': timeline} not in hints:
+            hints.append({'company': name, 'timeline': timeline})
+    return hints
+
+
+# Extractions of the last texts seen, keyed by a digest so whole diaries are not kept alive as keys
+PRE_EXTRACT_ENTRIES = 64
+_pre_extracted = OrderedDict()
+_pre_extracted_lock = threading.Lock()
+
+
+def pre_extract(text):
+    """Returns the Extraction of text (memoized: the prompt and the merge step both need it)."""
+    key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+    with _pre_extracted_lock:
+        extraction = _pre_extracted.get(key)
+        if extraction is not None:
+            _pre_extracted.move_to_end(key)
+            return extraction
+    extraction = Extraction(tuple(extract_skills(text)), tuple(extract_experience_hints(text)))
+    with _pre_extracted_lock:
+        _pre_extracted[key] = extraction
+        while len(_pre_extracted) > PRE_EXTRACT_ENTRIES:
+            _pre_extracted.popitem(last=False)
+    return extraction
+
+
+# Words that may surround skill mentions in a skills-only diary entry ("Learned Docker and Terraform")
+_FILLER_WORDS = {
+    'a', 'an', 'and', 'the', 'with', 'in', 'of', 'on', 'to', 'using', 'use', 'used', 'basic', 'basics',
+    'advanced', 'intro', 'introduction', 'learned', 'learning', 'studied', 'studying', 'practiced',
+    'started', 'skill', 'skills', 'new', 'also', 'some', 'more', 'e', 'com', 'de', 'do', 'da', 'em', 'o',
+    'os', 'as', 'um', 'uma', 'aprendi', 'estudei', 'estudando', 'pratiquei', 'comecei', 'usando',
+    'básico', 'avançado', 'habilidade', 'habilidades', 'nova', 'novo', 'mais', 'também',
+}
+_WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+
+def is_known_skills_only(text):
+    """
+    Returns True if text mentions at least one vocabulary skill and nothing else but filler words,
+    dates and punctuation, i.e. structuring it would only add skills to the resume.
+    """
+    matches = list(_skill_matcher().iter_matches(text))
+    if not matches:
+        return False
+    rest = []
+    position = 0
+    for start, end, _ in matches:
+        rest.append(text[position:start])
+        position = end
+    rest.append(text[position:])
+    return all(word.lower() in _FILLER_WORDS for word in _WORD_RE.findall(' '.join(rest)))
+
+
+def _norm(value):
+    return " ".join(str(value).split()).casefold()
+
+
+def enrich_resume(resume, extraction):
+    """
+    Merges a local Extraction into a structured resume.
+
+    Skills found locally but missing from the resume are appended, except the ones the provider
+    rejected (listed under REJECTED_SKILLS_KEY, which is removed), and experience items without a
+    timeline get the one found next to their company name. Experience items are never created from
+    the heuristics alone.
+
+    Returns:
+        dict: A new resume; the argument is not modified.
+    """
+    resume = dict(resume)
+    rejected = resume.pop(REJECTED_SKILLS_KEY, None)
+    skills = list(resume.get('skills') or [])
+    known = {_norm(skill) for skill in skills}
+    if isinstance(rejected, list):
+        known.update(_norm(skill) for skill in rejected)
+    for skill in extraction.skills:
+        if _norm(skill) not in known:
+            known.add(_norm(skill))
+            skills.append(skill)
+    if skills or 'skills' in resume:
+        resume['skills'] = skills
+
+    timelines = {_norm(hint['company']): hint['timeline'] for hint in extraction.experience_hints}
+    if timelines and isinstance(resume.get('experience'), list):
+        experience = []
+        for item in resume['experience']:
+            if isinstance(item, dict) and not item.get('timeline') and _norm(item.get('company', '')) in timelines:
+                item = {**item, 'timeline': timelines[_norm(item.get('company', ''))]}
+            experience.append(item)
+        resume['experience'] = experience
+    return resume
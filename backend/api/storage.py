@@ -0,0 +1,297 @@
+"""
+Access to the S3 bucket holding the users' diary texts.
+
+The boto3 client is created on first use rather than at import time: importing boto3 and building
+a client costs hundreds of milliseconds, which every Zappa/Lambda cold start would otherwise pay
+before serving requests that never touch S3.
+
+Whether a user's resume.json is still up to date with the diary is decided from object metadata
+only (HEAD requests): the resume is written with the ETag of the diary it was generated from, so it
+is fresh as long as the diary ETag did not change. Decisions are memoized per process for
+settings.RESUME_FRESHNESS_TTL seconds together with the resume itself, so the common "already fresh"
+request costs no S3 round trip at all, and the diary is only downloaded when it must be reprocessed.
+The resume also records the provider it was requested with, next to the one that answered it: a
+resume produced by a fallback provider stays fresh for the requests of the provider that failed.
+
+Classes:
+    ObjectMeta: ETag, LastModified, size and user metadata of an S3 object.
+    Freshness: Outcome of a freshness check (diary and resume metadata, fresh flag, resume data).
+    ObjectChangedError: An object was replaced between its HEAD and a read conditional on its ETag.
+
+Functions:
+    get_s3_client(): Returns the process-wide S3 client, creating it on first call.
+    head_object(key): Returns the ObjectMeta of an object, or None if it does not exist.
+    read_object_text(key, meta): Downloads a text object, in concurrent ranges when it is large.
+    diary_key(user): Returns the S3 key of a user's diary text.
+    read_diary_text(user): Returns a user's diary text, or None if it does not exist.
+    resume_key(user): Returns the S3 key of a user's generated resume JSON.
+    check_freshness(user, provider): Tells whether the stored resume is up to date with the diary.
+    write_resume_json(user, resume, diary, provider, requested): Stores a user's generated resume next to the diary.
+"""
+import json
+import time
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+ObjectMeta = namedtuple('ObjectMeta', ['etag', 'last_modified', 'size', 'metadata'])
+Freshness = namedtuple('Freshness', ['diary', 'resume', 'fresh', 'data'])
+
+# User metadata written on resume.json (sent as x-amz-meta-* headers)
+DIARY_ETAG_META = 'diary-etag'
+PROVIDER_META = 'provider'
+REQUESTED_PROVIDER_META = 'requested-provider'
+
+# Conditional reads made against a checked ETag
+CONDITIONAL_READ_ATTEMPTS = 2
+
+
+class ObjectChangedError(Exception):
+    """An S3 object was replaced after it was checked: a read conditional on its ETag got 412."""
+
+
+def get_s3_client():
+    """Returns the S3 client configured with settings.AWS_S3_REGION_NAME and AWS_S3_ENDPOINT_URL."""
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            if _s3_client is None:
+                import boto3
+                from botocore.config import Config
+
+                # Custom endpoints (S3-compatible servers, local stand-ins) rarely support virtual-hosted buckets
+                config = Config(s3={'addressing_style': 'path'}) if settings.AWS_S3_ENDPOINT_URL else None
+                _s3_client = boto3.client(
+                    's3',
+                    region_name=settings.AWS_S3_REGION_NAME,
+                    endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+                    config=config,
+                )
+    return _s3_client
+
+
+def is_missing_key_error(error):
+    """Returns True if a botocore ClientError means the requested object does not exist."""
+    return error.response.get('Error', {}).get('Code') in ('NoSuchKey', '404')
+
+
+def is_precondition_failed_error(error):
+    """Returns True if a botocore ClientError is the 412 of an IfMatch that no longer matches."""
+    return error.response.get('Error', {}).get('Code') in ('PreconditionFailed', '412')
+
+
+def head_object(key):
+    """Returns the ObjectMeta of the object at key, or None if it does not exist (no body is transferred)."""
+    from botocore.exceptions import ClientError
+
+    try:
+        head = get_s3_client().head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)
+    except ClientError as e:
+        if is_missing_key_error(e):
+            return None
+        raise
+    return ObjectMeta(head['ETag'], head['LastModified'], head['ContentLength'], head.get('Metadata', {}))
+
+
+def _read_range(key, etag, first, last):
+    obj = get_s3_client().get_object(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key, Range=f"bytes={first}-{last}", IfMatch=etag
+    )
+    return obj['Body'].read()
+
+
+def read_object_text(key, meta):
+    """
+    Downloads the object at key, described by the ObjectMeta of a previous HEAD.
+
+    Objects larger than settings.RESUME_S3_RANGE_SIZE are fetched as concurrent byte ranges. Every
+    read is conditional on meta.etag, so a diary replaced in the meantime raises ObjectChangedError
+    instead of yielding a mix of two versions.
+    """
+    from botocore.exceptions import ClientError
+
+    part = settings.RESUME_S3_RANGE_SIZE
+    try:
+        if meta.size <= part:
+            obj = get_s3_client().get_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key, IfMatch=meta.etag)
+            return obj['Body'].read().decode('utf-8')
+        ranges = [(first, min(first + part, meta.size) - 1) for first in range(0, meta.size, part)]
+        with ThreadPoolExecutor(max_workers=min(8, len(ranges)), thread_name_prefix='s3-range') as executor:
+            parts = executor.map(lambda r: _read_range(key, meta.etag, *r), ranges)
+            return b''.join(parts).decode('utf-8')
+    except ClientError as e:
+        if is_precondition_failed_error(e):
+            raise ObjectChangedError(f"{key} changed while it was being read") from e
+        raise
+
+
+def diary_key(user):
+    """Returns the S3 key of the unstructured diary text for the given user."""
+    return f"{settings.RESUME_S3_PREFIX}{user}/diary.txt"
+
+
+def read_diary_text(user):
+    """Returns the unstructured diary text of the user stored in S3, or None if it does not exist."""
+    from botocore.exceptions import ClientError
+
+    try:
+        obj = get_s3_client().get_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=diary_key(user))
+    except ClientError as e:
+        if is_missing_key_error(e):
+            return None
+        raise
+    return obj['Body'].read().decode('utf-8')
+
+
+def resume_key(user):
+    """Returns the S3 key of the structured resume generated for the given user."""
+    return f"{settings.RESUME_S3_PREFIX}{user}/resume.json"
+
+
+class _FreshnessMemo:
+    """
+    Bounded LRU of {(user, provider): (checked_at, Freshness)}.
+
+    Entries older than the TTL are not trusted as a decision, but the resume data they hold is
+    reused when the next HEAD shows the resume object did not change.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, freshness):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), freshness)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_freshness_memo = None
+_freshness_memo_lock = threading.Lock()
+
+
+def _get_freshness_memo():
+    global _freshness_memo
+    with _freshness_memo_lock:
+        if _freshness_memo is None:
+            _freshness_memo = _FreshnessMemo(settings.RESUME_FRESHNESS_MAX_ENTRIES)
+        return _freshness_memo
+
+
+def _is_fresh(diary, resume, provider):
+    if resume is None:
+        return False
+    # Resumes written before the requested provider was recorded only know the one that answered
+    requested = resume.metadata.get(REQUESTED_PROVIDER_META, resume.metadata.get(PROVIDER_META, provider))
+    if requested != provider:
+        return False
+    diary_etag = resume.metadata.get(DIARY_ETAG_META)
+    if diary_etag is not None:
+        return diary_etag == diary.etag
+    # Resumes written before the diary ETag was recorded: fall back to the modification times
+    return resume.last_modified >= diary.last_modified
+
+
+def check_freshness(user, provider):
+    """
+    Tells whether the user's stored resume.json is up to date with the diary.
+
+    Answers from the memo while the last decision is younger than settings.RESUME_FRESHNESS_TTL.
+    Otherwise the diary and the resume are checked with HEAD requests, and resume.json is only
+    downloaded when it is fresh and differs from the memoized copy. A resume replaced between its
+    HEAD and its download is checked again.
+
+    Args:
+        user (str): The diary owner.
+        provider (str): Key of PROVIDERS the resume must have been requested with.
+    Returns:
+        Freshness: diary is None when the user has no diary; data holds the resume when fresh.
+    Raises:
+        ObjectChangedError: If the resume kept changing under the check.
+    """
+    from botocore.exceptions import ClientError
+
+    memo = _get_freshness_memo()
+    memo_key = (user, provider)
+    entry = memo.get(memo_key)
+    if entry is not None and time.monotonic() - entry[0] < settings.RESUME_FRESHNESS_TTL:
+        return entry[1]
+
+    for attempt in range(CONDITIONAL_READ_ATTEMPTS):
+        diary = head_object(diary_key(user))
+        if diary is None:
+            # Not memoized: a diary uploaded right after must be picked up at once
+            return Freshness(None, None, False, None)
+        resume = head_object(resume_key(user))
+        if not _is_fresh(diary, resume, provider):
+            return Freshness(diary, resume, False, None)
+
+        previous = entry[1] if entry is not None else None
+        if previous is not None and previous.data is not None and previous.resume.etag == resume.etag:
+            data = previous.data
+            break
+        try:
+            obj = get_s3_client().get_object(
+                Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=resume_key(user), IfMatch=resume.etag
+            )
+        except ClientError as e:
+            if not is_precondition_failed_error(e):
+                raise
+            if attempt + 1 == CONDITIONAL_READ_ATTEMPTS:
+                raise ObjectChangedError(f"{resume_key(user)} changed while it was being read") from e
+            continue
+        data = json.loads(obj['Body'].read())
+        break
+    freshness = Freshness(diary, resume, True, data)
+    memo.set(memo_key, freshness)
+    return freshness
+
+
+def write_resume_json(user, resume, diary=None, provider=None, requested=None):
+    """
+    Stores the structured resume of the user next to the diary text.
+
+    Args:
+        user (str): The diary owner.
+        resume (dict): The structured resume.
+        diary (ObjectMeta): Metadata of the diary the resume was generated from. When given, its
+            ETag is recorded on the object and the freshness memo is updated.
+        provider (str): Key of PROVIDERS that generated the resume.
+        requested (str): Key of PROVIDERS the resume was requested with, when a fallback provider
+            answered instead (default: provider).
+    Returns:
+        str: The ETag of the stored object.
+    """
+    requested = requested or provider
+    metadata = {}
+    if diary is not None:
+        metadata[DIARY_ETAG_META] = diary.etag
+    if provider is not None:
+        metadata[PROVIDER_META] = provider
+        metadata[REQUESTED_PROVIDER_META] = requested
+    response = get_s3_client().put_object(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+        Key=resume_key(user),
+        Body=json.dumps(resume, ensure_ascii=False).encode('utf-8'),
+        ContentType='application/json',
+        Metadata=metadata,
+    )
+    if diary is not None and provider is not None:
+        stored = ObjectMeta(response['ETag'], None, None, metadata)
+        _get_freshness_memo().set((user, requested), Freshness(diary, stored, True, resume))
+    return response['ETag']
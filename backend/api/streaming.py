@@ -0,0 +1,175 @@
+"""
+Incremental parsing of a streamed provider response into resume sections, sent as server-sent events.
+
+The provider streams the structured resume token by token. SectionStreamParser scans the text as it
+arrives (each character exactly once) and reports every top-level section of the JSON object as soon
+as its value is complete, so the dashboard can render the title and summary while the experience
+list is still being generated. Items of top-level arrays of objects (e.g. 'experience') are reported
+one by one.
+
+Classes:
+    SectionStreamParser: Incremental scanner yielding completed top-level sections.
+
+Functions:
+    iter_sections(resume): Yields the sections of an already complete resume in streaming order.
+    sse_event(event, data): Formats one server-sent event.
+"""
+import json
+
+from .extraction import remove_trailing_commas
+
+
+def _loads(text):
+    """json.loads that tolerates trailing commas, a common defect of streamed provider output."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(remove_trailing_commas(text))
+
+
+class SectionStreamParser:
+    """
+    Feeds on arbitrary chunks of text containing one JSON object (optionally wrapped in a Markdown
+    code fence or surrounded by prose) and returns the completed sections after each chunk.
+
+    Each section is a dict {'section': key, 'index': i or None, 'value': parsed value}.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.start = None          # Index of the opening brace of the top-level object
+        self.end = None            # Index just after its closing brace
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.expect_key = False
+        self.key_start = None
+        self.key = None
+        self.value_start = None
+        self.array_key = None      # Key of the top-level array being scanned, if any
+        self.item_start = None
+        self.item_index = 0
+        self.items_streamed = False
+
+    def feed(self, chunk):
+        """
+        Consumes a chunk of streamed text.
+
+        Args:
+            chunk (str): The next piece of the provider response.
+        Returns:
+            list: The sections completed by this chunk.
+        """
+        self.buffer += chunk
+        sections = []
+        buf = self.buffer
+        i = self.pos
+        n = len(buf)
+        while i < n and self.end is None:
+            char = buf[i]
+            if self.start is None:
+                if char == '{':
+                    self.start = i
+                    self.depth = 1
+                    self.expect_key = True
+                i += 1
+                continue
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.key_start is not None:
+                        self.key = json.loads(buf[self.key_start:i + 1])
+                        self.key_start = None
+                i += 1
+                continue
+
+            if char == '"':
+                self.in_string = True
+                if self.depth == 1 and self.expect_key:
+                    self.key_start = i
+                    self.expect_key = False
+                elif self.depth == 2 and self.array_key is not None and self.item_start is None:
+                    self.item_start = i
+            elif char in '{[':
+                if self.depth == 1 and char == '[' and self.value_start is not None:
+                    self.array_key = self.key
+                    self.item_index = 0
+                    self.items_streamed = False
+                elif self.depth == 2 and self.array_key is not None and self.item_start is None:
+                    self.item_start = i
+                self.depth += 1
+            elif char in '}]':
+                self.depth -= 1
+                if self.depth == 2 and self.array_key is not None and self.item_start is not None \
+                        and buf[self.item_start] == '{':
+                    # An object inside a top-level array just closed
+                    sections.append({
+                        'section': self.array_key,
+                        'index': self.item_index,
+                        'value': _loads(buf[self.item_start:i + 1]),
+                    })
+                    self.items_streamed = True
+                elif self.depth == 1 and self.array_key is not None:
+                    self._close_array_item()
+                    self.array_key = None
+                elif self.depth == 0:
+                    self._close_value(buf, i, sections)
+                    self.end = i + 1
+            elif char == ':' and self.depth == 1:
+                self.value_start = i + 1
+            elif char == ',':
+                if self.depth == 1:
+                    self._close_value(buf, i, sections)
+                    self.expect_key = True
+                elif self.depth == 2 and self.array_key is not None:
+                    self._close_array_item()
+            elif self.depth == 2 and self.array_key is not None and self.item_start is None and not char.isspace():
+                self.item_start = i
+            i += 1
+        self.pos = i
+        return sections
+
+    def _close_array_item(self):
+        if self.item_start is not None:
+            self.item_index += 1
+            self.item_start = None
+
+    def _close_value(self, buf, i, sections):
+        if self.value_start is None:
+            return
+        raw = buf[self.value_start:i].strip()
+        self.value_start = None
+        if not raw:
+            return
+        if self.items_streamed:
+            # The items of this array were already reported one by one
+            self.items_streamed = False
+            return
+        sections.append({'section': self.key, 'index': None, 'value': _loads(raw)})
+
+    def result(self):
+        """Returns the complete parsed object, or None if the closing brace was not received."""
+        if self.end is None:
+            return None
+        return _loads(self.buffer[self.start:self.end])
+
+
+def iter_sections(resume):
+    """Yields the sections of a complete resume in the same shape as SectionStreamParser."""
+    for key, value in resume.items():
+        if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+            for index, item in enumerate(value):
+                yield {'section': key, 'index': index, 'value': item}
+        else:
+            yield {'section': key, 'index': None, 'value': value}
+
+
+def sse_event(event, data):
+    """Formats a server-sent event whose data is JSON encoded."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
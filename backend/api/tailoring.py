@@ -0,0 +1,251 @@
+"""
+Tailoring of resumes and cover letters to a job description.
+
+The user's stored resume (latest ResumeVersion, or resume.json in S3) is split into scorable items:
+every experience highlight and description, and every skill. The items are tokenized once per resume
+version into a BM25 inverted index (term -> [(item, term frequency)]) kept in a bounded per-process
+LRU, so ranking them against a job description only touches the postings of the description's terms
+and costs no provider call. Only the best items go into a compact tailoring prompt (a versioned
+template of api/prompts.py whose instructions are a static prefix): N tailored
+documents cost N small calls instead of N calls carrying the whole diary, and the results go through
+the content-addressed result cache like any other generation.
+
+Classes:
+    BM25Index: Inverted index of a list of texts, scored with Okapi BM25.
+    RankedItem: A resume item and its relevance score.
+
+Functions:
+    tokenize(text): Lower-cased terms of text, without stopwords.
+    resume_items(resume): The scorable items of a structured resume.
+    load_profile(user): The version token and data of the user's stored resume.
+    get_index(user, token, resume): The cached BM25Index of a resume version.
+    rank_items(user, token, resume, job_description, top_k): The items most relevant to a job description.
+    build_tailoring_prompt(document, resume, experience, skills, job_description): The compact tailoring call.
+"""
+import re
+import math
+import json
+import threading
+from collections import Counter, OrderedDict, namedtuple
+
+from django.conf import settings
+
+from .models import ResumeVersion
+from .prompts import COVER_LETTER_TEMPLATE, TAILOR_RESUME_TEMPLATE
+from .skills import extract_skills
+from .storage import get_s3_client, head_object, is_missing_key_error, resume_key
+
+RankedItem = namedtuple('RankedItem', ['kind', 'text', 'experience', 'score'])
+
+# Prompt template of each tailored document type (versioned in api/prompts.py)
+TAILOR_TEMPLATES = {'resume': TAILOR_RESUME_TEMPLATE, 'cover_letter': COVER_LETTER_TEMPLATE}
+# Job descriptions are cut to this many characters in the prompt
+JOB_DESCRIPTION_CHARS = 4000
+
+TERM_RE = re.compile(r"\w[\w+#]*")
+STOPWORDS = frozenset("""
+    a an and are as at be by for from has have in is it its of on or our that the their this to was
+    we were will with you your about into over under who what when where which while also more
+    o os as um uma uns umas e de do da dos das em no na nos nas por para com sem que se ao aos
+    """.split())
+
+
+def tokenize(text):
+    """Returns the lower-cased terms of text, without stopwords and one-character terms."""
+    return [
+        term for term in TERM_RE.findall(text.lower()) if len(term) > 1 and term not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of texts.
+
+    Args:
+        texts (list): The documents; scores refer to their positions.
+        k1 (float): Term frequency saturation.
+        b (float): Document length normalization.
+    """
+
+    def __init__(self, texts, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(texts)
+        self.lengths = []
+        self.postings = {}
+        for position, text in enumerate(texts):
+            terms = tokenize(text)
+            self.lengths.append(len(terms))
+            for term, frequency in Counter(terms).items():
+                self.postings.setdefault(term, []).append((position, frequency))
+        self.average_length = (sum(self.lengths) / self.size) if self.size else 0.0
+        # Precomputed per term and per document, so scoring is additions over the query's postings
+        self.idf = {
+            term: math.log(1 + (self.size - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+        self.norms = [
+            k1 * (1 - b + b * length / self.average_length) if self.average_length else k1
+            for length in self.lengths
+        ]
+
+    def scores(self, query):
+        """Returns {position: score} of the documents sharing at least one term with query."""
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for position, frequency in self.postings[term]:
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (self.k1 + 1) / (
+                    frequency + self.norms[position]
+                )
+        return scores
+
+
+def _as_list(value):
+    # A section the provider wrote as a single string is one item, not one item per character
+    if not value:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def resume_items(resume):
+    """
+    Returns the scorable items of a structured resume as (kind, text, experience index) tuples.
+
+    Highlights and descriptions are scored together with the role of their experience, so a
+    highlight of a 'Data Engineer' role matches a data engineering job even if it does not say so.
+    """
+    items = []
+    # Items point into the experience list by position: anything else has no scorable items
+    experiences = resume.get('experience') if isinstance(resume.get('experience'), list) else []
+    for index, experience in enumerate(experiences):
+        if not isinstance(experience, dict):
+            continue
+        if experience.get('description'):
+            items.append(('description', str(experience['description']), index))
+        for highlight in _as_list(experience.get('highlights')):
+            items.append(('highlight', str(highlight), index))
+    for skill in _as_list(resume.get('skills')):
+        items.append(('skill', str(skill), None))
+    return items
+
+
+def _item_text(resume, item):
+    kind, text, index = item
+    if index is None:
+        return text
+    return f"{resume['experience'][index].get('role', '')} {text}"
+
+
+def load_profile(user):
+    """
+    Returns the stored resume of user as (version token, data): the latest ResumeVersion, or the
+    resume.json written next to the diary. Returns (None, None) if there is neither.
+
+    Raises:
+        botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError: If S3 could not be read.
+        ValueError: If the stored resume is not a JSON object.
+    """
+    from botocore.exceptions import ClientError
+
+    latest = ResumeVersion.objects.filter(user=user).order_by('-number').values_list('id', 'data').first()
+    if latest is not None:
+        token, data = f"rv{latest[0]}", latest[1]
+    else:
+        meta = head_object(resume_key(user))
+        if meta is None:
+            return None, None
+        try:
+            obj = get_s3_client().get_object(
+                Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=resume_key(user), IfMatch=meta.etag
+            )
+        except ClientError as e:
+            # Deleted between the HEAD and the GET
+            if is_missing_key_error(e):
+                return None, None
+            raise
+        token, data = meta.etag, json.loads(obj['Body'].read())
+    if not isinstance(data, dict):
+        raise ValueError(f"the stored resume is a JSON {type(data).__name__}, not an object")
+    return token, data
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(user, token, resume):
+    """
+    Returns (items, BM25Index) of a resume version, built on first use and kept in a per-process
+    LRU of settings.RESUME_TAILOR_INDEX_ENTRIES versions.
+    """
+    key = (user, token)
+    with _indexes_lock:
+        cached = _indexes.get(key)
+        if cached is not None:
+            _indexes.move_to_end(key)
+            return cached
+    items = resume_items(resume)
+    cached = (items, BM25Index([_item_text(resume, item) for item in items]))
+    with _indexes_lock:
+        _indexes[key] = cached
+        while len(_indexes) > settings.RESUME_TAILOR_INDEX_ENTRIES:
+            _indexes.popitem(last=False)
+    return cached
+
+
+def rank_items(user, token, resume, job_description, top_k):
+    """
+    Ranks the items of a resume version against a job description.
+
+    Vocabulary skills named in the description (api/skills.py, so 'k8s' finds 'Kubernetes') are
+    added to the query, and skills found there are always kept.
+
+    Args:
+        user (str): The resume owner.
+        token (str): Version token returned by load_profile.
+        resume (dict): The structured resume.
+        job_description (str): The job description.
+        top_k (int): Maximum number of experience items and of skills returned.
+    Returns:
+        tuple: (experience items, skills), each a list of RankedItem, best first.
+    """
+    items, index = get_index(user, token, resume)
+    wanted = extract_skills(job_description)
+    scores = index.scores(f"{job_description} {' '.join(wanted)}")
+    wanted = {skill.lower() for skill in wanted}
+    ranked = sorted(
+        (RankedItem(*items[position], round(score, 4)) for position, score in scores.items()),
+        key=lambda item: -item.score,
+    )
+    experience = [item for item in ranked if item.kind != 'skill'][:top_k]
+    skills = [item for item in ranked if item.kind == 'skill' and item.text.lower() in wanted]
+    skills += [item for item in ranked if item.kind == 'skill' and item.text.lower() not in wanted]
+    return experience, skills[:top_k]
+
+
+def build_tailoring_prompt(document, resume, experience, skills, job_description):
+    """
+    Returns (template, messages) of the call writing a tailored document ('resume' or 'cover_letter')
+    from the ranked items only. The instructions are the static prefix of the template; only the
+    candidate facts and the job description vary between calls.
+    """
+    lines = []
+    for item in experience:
+        job = resume['experience'][item.experience]
+        lines.append(f"- {job.get('role', '')} at {job.get('company', '')} ({job.get('timeline', '')}): {item.text}")
+    summary = resume.get('summary')
+    if isinstance(summary, dict):
+        summary = summary.get('professional_summary', '')
+    candidate = (
+        f"Candidate: {resume.get('title', '')}\n"
+        f"Summary: {summary or ''}\n"
+        f"Relevant experience:\n" + '\n'.join(lines) + "\n"
+        f"Relevant skills: {', '.join(item.text for item in skills)}\n"
+    )
+    template = TAILOR_TEMPLATES[document]
+    return template, template.messages(
+        candidate=candidate, job_description=job_description[:JOB_DESCRIPTION_CHARS]
+    )
@@ -1,3 +1,1555 @@
-from django.test import TestCase
+import io
+import os
+import gzip
+import json
+import re
+import hashlib
+import time
+import asyncio
+import unittest
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import path
+from django.utils import timezone
+
+from . import skills, storage
+from .cache import DiskBackend, MemoryLRUBackend, ResultCache, make_cache_key
+from .checks import check_hedging
+from .chunking import chunk_text, estimate_tokens, reduce_partials, split_entries
+from .conditional import file_response, make_etag, parse_range, resume_response
+from .dedup import dedupe_entries, dedupe_text, hamming, simhash
+from .extraction import extract_resume, iter_json_objects, normalize_resume, parse_llm_json, remove_trailing_commas
+from .incremental import merge_resume, regenerate_resume
+from .jobs import recover_stale_jobs, run_job
+from .management.commands.bulk_process_resumes import Command as BulkProcessCommand
+from .metrics import (
+    PROMPT_CALL_SECONDS, PROMPT_COST, PROMPT_TOKENS, PROVIDER_REQUESTS, RESUME_SINGLEFLIGHT, RESUME_STAGE_SECONDS,
+)
+from .models import DiaryEntry, ResumeJob, ResumeLease, ResumeVersion
+from .pagination import KeysetPagination
+from .pdf import PdfExportBusy, PdfRenderer, render_pdf
+from .prompts import (
+    RESUME_TEMPLATE, PromptTemplate, Usage, call_cost, detected_skills_note, parse_usage, record_usage,
+)
+from .providers import (
+    CircuitBreaker, CircuitOpenError, Provider, ProviderError, afirst_valid, first_valid, get_provider,
+)
+from .search import parse_query, search_entries
+from .singleflight import acoalesce, coalesce
+from .storage import check_freshness, diary_key, head_object, resume_key, write_resume_json
+from .skills import REJECTED_SKILLS_KEY, enrich_resume, extract_skills, is_known_skills_only, pre_extract
+from .streaming import SectionStreamParser, iter_sections, sse_event
+from .tailoring import BM25Index, rank_items, resume_items, tokenize
+from .views import ResumeAPIView, _resume_events, resume_async
+
+
+class SkillMatcherTests(SimpleTestCase):
+    def test_matches_vocabulary_aliases(self):
+        self.assertEqual(
+            extract_skills("Built the UI in React and React Native, services in Java, Rust and golang"),
+            ['React', 'React Native', 'Java', 'Rust', 'Go'],
+        )
+
+    def test_case_insensitive_aliases(self):
+        self.assertEqual(extract_skills("deployed with DOCKER and kubernetes"), ['Docker', 'Kubernetes'])
+
+    def test_longest_match_wins(self):
+        self.assertEqual(extract_skills("Learned Ruby on Rails"), ['Ruby on Rails'])
+
+    def test_whole_words_only(self):
+        self.assertEqual(extract_skills("javascripting, pythonic, gitlab"), [])
+
+    def test_ordinary_english_words_are_not_skills(self):
+        self.assertEqual(extract_skills("Had to react quickly to a swift change in rust removal"), [])
+        self.assertEqual(extract_skills("Improved communication with the client"), [])
+        self.assertEqual(extract_skills("A spark of an idea; the rails of the stairs; a ruby ring"), [])
+        self.assertEqual(extract_skills("Wrote lambda functions in the script"), [])
+
+    def test_ordinary_portuguese_words_are_not_skills(self):
+        self.assertEqual(extract_skills("Assisti palestras sobre Kubernetes"), ['Kubernetes'])
+        self.assertEqual(extract_skills("Fui ágil na entrega"), [])
+
+    def test_context_spellings_still_match(self):
+        self.assertEqual(extract_skills("Ministrei palestras sobre Python"), ['Public Speaking', 'Python'])
+        self.assertEqual(extract_skills("Strong communication skills"), ['Communication'])
+
+    def test_known_skills_only(self):
+        self.assertTrue(is_known_skills_only("Learned Docker and Terraform"))
+        self.assertFalse(is_known_skills_only("Learned Docker at Acme"))
+        self.assertFalse(is_known_skills_only("Had to react quickly"))
+
+
+class EnrichResumeTests(SimpleTestCase):
+    def test_appends_candidates_the_provider_did_not_reject(self):
+        resume = {'skills': ['Leadership'], REJECTED_SKILLS_KEY: ['React']}
+        enriched = enrich_resume(resume, pre_extract("Used React and Docker"))
+        self.assertEqual(enriched, {'skills': ['Leadership', 'Docker']})
+        self.assertIn(REJECTED_SKILLS_KEY, resume)
+
+    def test_does_not_duplicate_skills(self):
+        enriched = enrich_resume({'skills': ['docker']}, pre_extract("Docker"))
+        self.assertEqual(enriched['skills'], ['docker'])
+
+    def test_fills_missing_timelines(self):
+        resume = {'experience': [{'company': 'Acme Corp', 'role': 'Engineer'}]}
+        enriched = enrich_resume(resume, pre_extract("2019 - 2021 at Acme Corp"))
+        self.assertEqual(enriched['experience'][0]['timeline'], '2019 - 2021')
+
+    def test_pre_extract_is_memoized_by_digest(self):
+        text = f"Used Docker on {time.time_ns()}"
+        self.assertIs(pre_extract(text), pre_extract(text))
+        self.assertNotIn(text, skills._pre_extracted)
+        self.assertTrue(all(isinstance(key, bytes) and len(key) == 16 for key in skills._pre_extracted))
+        for n in range(skills.PRE_EXTRACT_ENTRIES):
+            pre_extract(f"Used Rust {n}")
+        self.assertEqual(len(skills._pre_extracted), skills.PRE_EXTRACT_ENTRIES)
+
+    def test_prompt_lists_candidates(self):
+        self.assertEqual(detected_skills_note(()), "")
+        self.assertIn('["Docker"]', detected_skills_note(('Docker',)))
+
+
+class ExtractionTests(SimpleTestCase):
+    def test_code_fence_and_prose(self):
+        content = 'Here is the resume:\n```json\n{"title": "Ana - Engineer", "skills": ["Python"]}\n```\nDone.'
+        self.assertEqual(parse_llm_json(content), {'title': 'Ana - Engineer', 'skills': ['Python']})
+
+    def test_braces_inside_strings(self):
+        content = '{"title": "a } b { c", "summary": {"professional_summary": "x \\" }"}}'
+        self.assertEqual(list(iter_json_objects(content)), [content])
+        self.assertEqual(parse_llm_json(content)['title'], 'a } b { c')
+
+    def test_trailing_commas(self):
+        self.assertEqual(remove_trailing_commas('{"a": [1, 2,], "b": "x,]",}'), '{"a": [1, 2], "b": "x,]"}')
+        self.assertEqual(parse_llm_json('{"skills": ["Go",],}'), {'skills': ['Go']})
+
+    def test_skips_invalid_candidates(self):
+        self.assertEqual(parse_llm_json('{not json} then {"title": "T"}'), {'title': 'T'})
+
+    def test_no_object(self):
+        self.assertIsNone(parse_llm_json('No JSON here ['))
+        self.assertIsNone(parse_llm_json('{"title": "unterminated"'))
+        self.assertEqual(extract_resume('sorry'), (None, []))
+
+    def test_not_a_resume(self):
+        self.assertEqual(normalize_resume({'answer': 42}), (None, []))
+
+    def test_schema_repairs(self):
+        resume, repairs = normalize_resume({
+            'summary': 'Backend engineer',
+            'skills': 'Python, Django; python',
+            'education': [{'institution': 'USP', 'degree': 'BSc'}],
+            'experience': {'company': 'Acme', 'highlights': 'Shipped v2'},
+        })
+        self.assertEqual(resume['summary'], {'professional_summary': 'Backend engineer'})
+        self.assertEqual(resume['skills'], ['Python', 'Django'])
+        self.assertEqual(resume['education'], {'USP': 'BSc'})
+        self.assertEqual(resume['experience'], [{'company': 'Acme', 'highlights': ['Shipped v2']}])
+        self.assertIn('experience: object wrapped in a list', repairs)
+
+    def test_summary_skills_moved(self):
+        resume, repairs = normalize_resume(
+            {'summary': {'professional_summary': 'x', 'key_skills': ['SQL']}, 'skills': ['Go']}
+        )
+        self.assertEqual(resume, {'summary': {'professional_summary': 'x'}, 'skills': ['Go', 'SQL']})
+        self.assertEqual(repairs, ['summary.key_skills: moved to skills'])
+
+    def test_extract_resume(self):
+        resume, repairs = extract_resume('```\n{"title": "T", "experience": [{"company": "A", "role": null,}],}\n```')
+        self.assertEqual(resume['experience'], [{'company': 'A', 'role': '', 'highlights': []}])
+        self.assertEqual(repairs, [])
+
+
+STREAMED_RESUME = {
+    'title': 'Ana {Silva} - "Engineer"',
+    'summary': {'professional_summary': 'Builds APIs, [mostly] in Python \\ Go.'},
+    'experience': [
+        {'company': 'Acme', 'role': 'Dev', 'highlights': ['Cut latency by 50%', 'Led {3} people']},
+        {'company': 'Globex', 'role': 'Lead', 'highlights': []},
+    ],
+    'skills': ['Python', 'Go'],
+    'additional_information': {},
+}
+
+
+def feed_in_pieces(text, size):
+    parser = SectionStreamParser()
+    sections = []
+    for i in range(0, len(text), size):
+        sections.extend(parser.feed(text[i:i + size]))
+    return parser, sections
+
+
+class SectionStreamParserTests(SimpleTestCase):
+    def test_one_character_at_a_time(self):
+        text = json.dumps(STREAMED_RESUME, indent=2)
+        parser, sections = feed_in_pieces(text, 1)
+        self.assertEqual(sections, list(iter_sections(STREAMED_RESUME)))
+        self.assertEqual(parser.result(), STREAMED_RESUME)
+
+    def test_chunk_boundaries_do_not_matter(self):
+        text = json.dumps(STREAMED_RESUME)
+        expected = list(iter_sections(STREAMED_RESUME))
+        for size in (2, 3, 7, 64, len(text)):
+            self.assertEqual(feed_in_pieces(text, size)[1], expected, size)
+
+    def test_sections_are_reported_as_soon_as_they_close(self):
+        parser = SectionStreamParser()
+        self.assertEqual(parser.feed('{"title": "T", "experience": [{"company": "A"}'), [
+            {'section': 'title', 'index': None, 'value': 'T'},
+            {'section': 'experience', 'index': 0, 'value': {'company': 'A'}},
+        ])
+        self.assertEqual(parser.feed(', {"company"'), [])
+        self.assertEqual(parser.feed(': "B"}], "skills": ["Go"'), [
+            {'section': 'experience', 'index': 1, 'value': {'company': 'B'}},
+        ])
+        self.assertIsNone(parser.result())
+        self.assertEqual(parser.feed(']}'), [{'section': 'skills', 'index': None, 'value': ['Go']}])
+
+    def test_code_fence_prose_and_trailing_commas(self):
+        text = 'Sure!\n```json\n{"title": "T", "skills": ["Go",], "summary": {"professional_summary": "x",},}\n```'
+        parser, sections = feed_in_pieces(text, 1)
+        self.assertEqual([section['section'] for section in sections], ['title', 'skills', 'summary'])
+        self.assertEqual(parser.result(), {'title': 'T', 'skills': ['Go'], 'summary': {'professional_summary': 'x'}})
+
+    def test_truncated_stream(self):
+        parser, _ = feed_in_pieces('{"title": "T", "skills": ["Go"', 1)
+        self.assertIsNone(parser.result())
+
+    def test_sse_event(self):
+        self.assertEqual(sse_event('done', {'cached': True}), 'event: done\ndata: {"cached": true}\n\n')
+
+
+class ConditionalResponseTests(SimpleTestCase):
+    resume = {'title': 'T', 'skills': ['Python'] * 100}
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.etag = make_etag('"abc123"')
+
+    def test_make_etag(self):
+        self.assertEqual(self.etag, '"abc123"')
+        self.assertEqual(make_etag('rv42'), '"rv42"')
+
+    def test_resume_200_then_304(self):
+        response = resume_response(self.factory.get('/resume/'), self.etag, self.resume)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(json.loads(response.content), self.resume)
+        for header in (self.etag, 'W/"abc123"', '"other", "abc123-gzip"', '*'):
+            request = self.factory.get('/resume/', HTTP_IF_NONE_MATCH=header)
+            response = resume_response(request, self.etag, self.resume)
+            self.assertEqual(response.status_code, 304, header)
+            self.assertEqual(response.content, b'')
+
+    def test_stale_etag_gets_the_body(self):
+        request = self.factory.get('/resume/', HTTP_IF_NONE_MATCH='"old"')
+        self.assertEqual(resume_response(request, self.etag, self.resume).status_code, 200)
+
+    def test_gzip_variant_has_its_own_etag(self):
+        request = self.factory.get('/resume/', HTTP_ACCEPT_ENCODING='gzip')
+        response = resume_response(request, self.etag, self.resume)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], '"abc123-gzip"')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), self.resume)
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=50-500', 100), (50, 99))
+        self.assertEqual(parse_range('bytes=-500', 100), (0, 99))
+        self.assertIs(parse_range('bytes=100-', 100), False)
+        self.assertIs(parse_range('bytes=-0', 100), False)
+        for header in (None, '', 'bytes=-', 'bytes=9-1', 'bytes=0-1,5-6', 'items=0-1'):
+            self.assertIsNone(parse_range(header, 100), header)
+
+    def file(self, **headers):
+        return file_response(self.factory.get('/resume/pdf/', **headers), self.etag, b'0123456789',
+                             'application/pdf', 'resume.pdf')
+
+    def test_file_200(self):
+        response = self.file()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('resume.pdf', response['Content-Disposition'])
+
+    def test_file_304(self):
+        self.assertEqual(self.file(HTTP_IF_NONE_MATCH=self.etag).status_code, 304)
+
+    def test_file_206(self):
+        response = self.file(HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+    def test_file_416(self):
+        response = self.file(HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_if_range(self):
+        response = self.file(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE=self.etag)
+        self.assertEqual(response.status_code, 206)
+        # The client holds another version: the whole current file is sent
+        response = self.file(HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'0123456789')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.entries = [DiaryEntry.objects.create(user='ana', content=f"Entry {i}") for i in range(7)]
+        DiaryEntry.objects.create(user='bob', content="Not Ana's")
+        # Three rows created in the same instant: the id breaks the tie
+        now = timezone.now()
+        DiaryEntry.objects.filter(id__in=[entry.id for entry in self.entries[2:5]]).update(created_at=now)
+        DiaryEntry.objects.filter(id__in=[entry.id for entry in self.entries[5:]]).update(
+            created_at=now + timedelta(seconds=1)
+        )
+
+    def page(self, **params):
+        response = self.client.get('/diary/entries/', {'user': 'ana', **params})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        return [entry['id'] for entry in body['results']], body['next_cursor']
+
+    def test_walks_every_row_once_newest_first(self):
+        expected = list(
+            DiaryEntry.objects.filter(user='ana').order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        seen, cursor = [], None
+        while True:
+            ids, cursor = self.page(limit=2, **({'cursor': cursor} if cursor else {}))
+            seen += ids
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), 7)
+
+    def test_rows_added_while_paging_are_not_repeated(self):
+        first, cursor = self.page(limit=3)
+        DiaryEntry.objects.create(user='ana', content="Newer")
+        rest, _ = self.page(limit=10, cursor=cursor)
+        self.assertEqual(len(first) + len(rest), 7)
+        self.assertFalse(set(first) & set(rest))
+
+    def test_last_page_has_no_cursor(self):
+        ids, cursor = self.page(limit=7)
+        self.assertEqual(len(ids), 7)
+        self.assertIsNone(cursor)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/diary/entries/', {'user': 'ana', 'cursor': 'garbage'}).status_code, 400)
+        self.assertEqual(self.client.get('/diary/entries/', {'user': 'ana', 'limit': 'x'}).status_code, 400)
+
+    def test_cursor_round_trip(self):
+        created_at = timezone.now()
+        cursor = KeysetPagination.encode_cursor(created_at, 42)
+        self.assertEqual(KeysetPagination.decode_cursor(cursor), (created_at, 42))
+
+
+def diary(days, start=1):
+    return ''.join(
+        f"2024-03-{day:02d} Worked on feature {day} of the billing service.\n" for day in range(start, start + days)
+    )
+
+
+class ChunkingTests(SimpleTestCase):
+    def test_split_entries_round_trips(self):
+        text = "2024-01-01 First\ncontinued\n\nUndated paragraph\n2024-01-02 Second\n"
+        entries = split_entries(text)
+        self.assertEqual(entries, ["2024-01-01 First\ncontinued\n\n", "Undated paragraph\n", "2024-01-02 Second\n"])
+        self.assertEqual(''.join(entries), text)
+
+    def test_short_text_is_one_chunk(self):
+        self.assertEqual(chunk_text("2024-01-01 Short", 100), ["2024-01-01 Short"])
+
+    def test_chunks_cover_the_text_within_budget(self):
+        text = diary(20)
+        chunks = chunk_text(text, 40)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), text)
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk), 40 * 4)
+            self.assertTrue(chunk.startswith('2024-03-'))
+
+    def test_oversized_entry_is_split(self):
+        text = "2024-01-01 " + "word " * 200
+        chunks = chunk_text(text, 20)
+        self.assertEqual(''.join(chunks), text)
+        self.assertTrue(all(len(chunk) <= 80 for chunk in chunks))
+
+    def test_appending_keeps_earlier_chunks_byte_identical(self):
+        before = chunk_text(diary(20), 40)
+        after = chunk_text(diary(20) + diary(5, start=21), 40)
+        self.assertEqual(after[:len(before) - 1], before[:-1])
+        self.assertTrue(after[len(before) - 1].startswith(before[-1]))
+
+    def test_estimate_tokens(self):
+        self.assertEqual(estimate_tokens(''), 1)
+        self.assertEqual(estimate_tokens('x' * 400), 101)
+
+    def test_reduce_partials(self):
+        resume = reduce_partials([
+            {'title': 'Old', 'skills': ['Python'], 'summary': {'professional_summary': 'Junior'}},
+            {'title': 'New', 'skills': ['Python', 'Go'], 'summary': {}},
+        ])
+        self.assertEqual(resume['title'], 'New')
+        self.assertEqual(resume['skills'], ['Python', 'Go'])
+        self.assertEqual(resume['summary'], {'professional_summary': 'Junior'})
+
+
+class CacheKeyTests(SimpleTestCase):
+    def test_stable(self):
+        key = make_cache_key("diary", 'deepseek', 'deepseek-chat', 'resume-v4', 0.2)
+        self.assertEqual(key, make_cache_key("diary", 'deepseek', 'deepseek-chat', 'resume-v4', 0.2))
+        self.assertEqual(key, make_cache_key("diary", 'deepseek', 'deepseek-chat', 'resume-v4', '0.2'))
+        self.assertRegex(key, r'^[0-9a-f]{64}$')
+
+    def test_every_part_counts(self):
+        base = ("diary", 'deepseek', 'deepseek-chat', 'resume-v4', 0.2)
+        keys = {make_cache_key(*base)}
+        for index, value in enumerate(("diary ", 'chatgpt', 'gpt-3.5-turbo', 'resume-v5', 0.3)):
+            keys.add(make_cache_key(*base[:index], value, *base[index + 1:]))
+        self.assertEqual(len(keys), 6)
+
+    def test_parts_cannot_be_shifted(self):
+        self.assertNotEqual(make_cache_key("b", 'a', 'm', 'v', 0), make_cache_key("", 'a', 'm', 'vb', 0))
+
+
+class CacheBackendTests(SimpleTestCase):
+    def test_memory_lru_evicts_by_size_least_recently_used_first(self):
+        backend = MemoryLRUBackend(max_bytes=10)
+        backend.set('a', b'aaaa')
+        backend.set('b', b'bbbb')
+        self.assertEqual(backend.get('a'), b'aaaa')
+        # 'b' is now the least recently used entry, and 4 + 4 + 3 bytes do not fit in 10
+        backend.set('c', b'ccc')
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual((backend.get('a'), backend.get('c'), backend.current_bytes), (b'aaaa', b'ccc', 7))
+        # Replacing an entry accounts only its new size
+        backend.set('a', b'aa')
+        self.assertEqual(backend.current_bytes, 5)
+        backend.delete('c')
+        self.assertEqual(backend.current_bytes, 2)
+
+    def test_memory_lru_skips_entries_larger_than_the_cache(self):
+        backend = MemoryLRUBackend(max_bytes=4)
+        backend.set('a', b'aaaa')
+        backend.set('big', b'bbbbb')
+        self.assertIsNone(backend.get('big'))
+        self.assertEqual(backend.get('a'), b'aaaa')
+
+    def round_trip(self, backend):
+        cache = ResultCache(backend)
+        key = make_cache_key("diary", 'deepseek', 'deepseek-chat', 'resume-v4', 0.2)
+        self.assertIsNone(cache.get(key))
+        resume = {'title': 'Ana Öz - Engineer', 'skills': ['Billing', 'SQL']}
+        cache.set(key, resume, elapsed=1.5)
+        self.assertEqual(cache.get(key), resume)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['stores']), (1, 1, 1))
+        self.assertEqual(stats['provider_seconds_saved'], 1.5)
+        backend.delete(key)
+        self.assertIsNone(cache.get(key))
+        return stats
+
+    def test_memory_round_trip(self):
+        stats = self.round_trip(MemoryLRUBackend(max_bytes=1024))
+        self.assertEqual(stats['max_bytes'], 1024)
+
+    def test_disk_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            backend = DiskBackend(directory)
+            self.round_trip(backend)
+            backend.set('ab12', b'{}')
+            self.assertEqual(os.listdir(os.path.join(directory, 'ab')), ['ab12.json'])
+            # Deleting a missing entry is not an error
+            backend.delete('missing')
+
+    def test_unreadable_entry_counts_as_a_miss(self):
+        backend = MemoryLRUBackend(max_bytes=1024)
+        backend.set('key', b'not json')
+        cache = ResultCache(backend)
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual((cache.stats()['errors'], cache.stats()['misses']), (1, 1))
+
+
+REPEATED = "Worked on the billing service again, fixing the invoice export and reviewing pull requests."
+
+
+class DedupTests(SimpleTestCase):
+    def test_simhash_ignores_the_date(self):
+        self.assertEqual(simhash(f"2024-01-01 {REPEATED}\n"), simhash(f"2024-02-11 {REPEATED}\n"))
+        self.assertEqual(hamming(0b1011, 0b0001), 2)
+
+    def test_collapses_near_duplicates_into_the_first(self):
+        entries = [
+            f"2024-01-01 {REPEATED}\n",
+            "2024-01-02 Gave a talk about Kubernetes at the meetup.\n",
+            f"2024-01-03 {REPEATED}\n",
+            f"2024-01-09 {REPEATED.upper().replace(', ', '; ')}\n",
+        ]
+        self.assertEqual(dedupe_entries(entries, max_distance=3), [
+            f"2024-01-01 {REPEATED} (repeated 3 times, 2024-01-01 to 2024-01-09)\n",
+            "2024-01-02 Gave a talk about Kubernetes at the meetup.\n",
+        ])
+
+    def test_date_range_follows_the_calendar_whatever_the_format(self):
+        entries = [
+            f"[2024-01-10] {REPEATED}\n",
+            f"15/01/2024 {REPEATED}\n",
+            f"2024/02/01 {REPEATED}\n",
+            f"2024-13-45 {REPEATED}\n",
+        ]
+        # Sorted as strings, the range would run from '15/01/2024' to the invalid '2024-13-45'
+        self.assertEqual(dedupe_entries(entries, max_distance=3), [
+            f"[2024-01-10] {REPEATED} (repeated 4 times, 2024-01-10 to 2024-02-01)\n",
+        ])
+
+    def test_distinct_entries_are_kept(self):
+        text = diary(10)
+        self.assertEqual(dedupe_text(text), text)
+
+
+def structured_reply(self, messages, temperature, api_key=None, timeout=None):
+    return {'choices': [{'message': {'content': json.dumps({'skills': ['Billing']})}}]}
+
+
+@override_settings(RESUME_DEDUP=True, RESUME_CHUNK_TOKENS=60, RESUME_CHUNK_WORKERS=1, RESUME_PROVIDER_FALLBACK=False)
+class DedupChunkCacheTests(TestCase):
+    def test_new_duplicates_do_not_invalidate_earlier_chunks(self):
+        text = ''.join(
+            f"2024-05-{day:02d} {REPEATED}\n" if day % 2 else f"2024-05-{day:02d} Topic {day * 7} of the sprint.\n"
+            for day in range(1, 13)
+        )
+        with mock.patch.object(Provider, 'chat', autospec=True, side_effect=structured_reply) as chat:
+            self.assertIsNotNone(ResumeAPIView().process_text(text, 'deepseek'))
+            chunks = chat.call_count
+            self.assertGreater(chunks, 1)
+            ResumeAPIView().process_text(text + f"2024-05-20 {REPEATED}\n", 'deepseek')
+        # Only the last chunk, which received the new entry, went back to the provider
+        self.assertEqual(chat.call_count, chunks + 1)
+
+    def test_duplicates_are_collapsed_within_a_chunk(self):
+        text = ''.join(f"2024-06-{day:02d} {REPEATED}\n" for day in range(1, 3))
+        with mock.patch.object(Provider, 'chat', autospec=True, side_effect=structured_reply) as chat:
+            ResumeAPIView().process_text(text, 'deepseek')
+        prompt = chat.call_args.args[1][-1]['content']
+        self.assertIn("(repeated 2 times, 2024-06-01 to 2024-06-02)", prompt)
+        self.assertEqual(prompt.count(REPEATED), 1)
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "FTS5 index of SQLite")
+class DiarySearchTests(TestCase):
+    def setUp(self):
+        self.kubernetes = DiaryEntry.objects.create(
+            user='ana', content="Migrated the cluster to Kubernetes. Kubernetes upgrades are now automated.",
+            entry_type='experience', entry_date=date(2024, 3, 1),
+        )
+        self.talk = DiaryEntry.objects.create(
+            user='ana', content="Palestra sobre observabilidade e Kubernetes na conferência.",
+            entry_type='lecture', entry_date=date(2024, 5, 1),
+        )
+        self.other_user = DiaryEntry.objects.create(user='bob', content="Kubernetes everywhere")
+
+    def ids(self, query, **filters):
+        return [hit.entry.id for hit in search_entries('ana', query, **filters)]
+
+    def test_parse_query(self):
+        self.assertEqual(parse_query('Kube* "docker" -x'), [('kube', True), ('docker', False), ('x', False)])
+
+    def test_matches_only_the_user_entries_best_first(self):
+        self.assertEqual(self.ids('kubernetes'), [self.kubernetes.id, self.talk.id])
+
+    def test_every_term_is_required(self):
+        self.assertEqual(self.ids('kubernetes palestra'), [self.talk.id])
+        self.assertEqual(self.ids('kubernetes docker'), [])
+
+    def test_prefix_case_and_diacritics(self):
+        self.assertEqual(self.ids('KUBE*'), [self.kubernetes.id, self.talk.id])
+        self.assertEqual(self.ids('conferencia'), [self.talk.id])
+
+    def test_filters(self):
+        self.assertEqual(self.ids('kubernetes', entry_type='lecture'), [self.talk.id])
+        self.assertEqual(self.ids('kubernetes', since=date(2024, 4, 1)), [self.talk.id])
+        self.assertEqual(self.ids('kubernetes', until=date(2024, 4, 1)), [self.kubernetes.id])
+        self.assertEqual(self.ids('kubernetes', limit=1), [self.kubernetes.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.talk.content = "Palestra sobre Terraform"
+        self.talk.save()
+        self.assertEqual(self.ids('terraform'), [self.talk.id])
+        self.assertEqual(self.ids('kubernetes'), [self.kubernetes.id])
+        self.kubernetes.delete()
+        self.assertEqual(self.ids('kubernetes'), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.ids('"'), [])
+        self.assertEqual(self.ids('kubernetes OR NEAR( NOT'), [])
+        self.assertEqual(self.ids('user:bob'), [])
+
+    def test_endpoint(self):
+        response = self.client.get('/diary/search/', {'user': 'ana', 'q': 'palestra'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([result['id'] for result in results], [self.talk.id])
+        self.assertGreater(results[0]['rank'], 0)
+        self.assertEqual(self.client.get('/diary/search/', {'user': 'ana'}).status_code, 400)
+
+
+class StubResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.body = body if body is not None else {'choices': [{'message': {'content': '{}'}}]}
+        self.text = json.dumps(self.body)
+        self.closed = False
+
+    def json(self):
+        return self.body
+
+    def close(self):
+        self.closed = True
+
+
+class StubSession:
+    """Stands in for requests.Session: answers post() with the queued responses (or raises exceptions)."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def post(self, url, **kwargs):
+        self.calls.append(kwargs)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@override_settings(RESUME_PROVIDER_MAX_RETRIES=3, RESUME_PROVIDER_BACKOFF_BASE=0.5, RESUME_PROVIDER_BACKOFF_MAX=30)
+class ProviderRetryTests(SimpleTestCase):
+    def setUp(self):
+        self.provider = Provider('stub', 'http://provider.invalid/chat', 'stub-model', 'STUB_API_KEY')
+        self.provider.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        sleep = mock.patch('api.providers.time.sleep')
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+    def chat(self, *responses, timeout=60):
+        self.provider._session = StubSession(*responses)
+        return self.provider.chat([{'role': 'user', 'content': 'x'}], 0.2, api_key='key', timeout=timeout)
+
+    def test_retries_429_honouring_retry_after(self):
+        throttled = StubResponse(429, {'error': 'slow down'}, {'Retry-After': '2'})
+        self.assertIn('choices', self.chat(throttled, StubResponse(200)))
+        self.sleep.assert_called_once_with(2.0)
+        self.assertTrue(throttled.closed)
+        self.assertEqual(self.provider.breaker.failures, 0)
+
+    def test_retries_5xx_until_exhausted(self):
+        with self.assertRaises(ProviderError) as raised:
+            self.chat(*[StubResponse(503, {'error': 'down'}) for _ in range(4)])
+        self.assertEqual(raised.exception.status_code, 503)
+        self.assertEqual(len(self.provider.session.calls), 4)
+        self.assertEqual(self.sleep.call_count, 3)
+        self.assertEqual(self.provider.breaker.failures, 1)
+
+    def test_no_retry_past_the_deadline(self):
+        throttled = StubResponse(429, {'error': 'slow down'}, {'Retry-After': '30'})
+        with self.assertRaises(ProviderError):
+            self.chat(throttled, StubResponse(200), timeout=5)
+        self.assertEqual(len(self.provider.session.calls), 1)
+        self.sleep.assert_not_called()
+
+    def test_client_errors_are_not_retried_nor_held_against_the_provider(self):
+        with self.assertRaises(ProviderError):
+            self.chat(StubResponse(401, {'error': 'bad key'}), StubResponse(200))
+        self.assertEqual(len(self.provider.session.calls), 1)
+        self.assertEqual(self.provider.breaker.failures, 0)
+
+    def test_connection_errors_are_retried(self):
+        import requests
+
+        self.assertIn('choices', self.chat(requests.exceptions.ConnectionError("reset"), StubResponse(200)))
+        self.assertEqual(self.sleep.call_count, 1)
+
+    def test_breaker_opens_then_lets_one_trial_through(self):
+        for _ in range(2):
+            with self.assertRaises(ProviderError):
+                self.chat(*[StubResponse(500, {}) for _ in range(4)])
+        self.assertEqual(self.provider.breaker.state, 'open')
+        with self.assertRaises(CircuitOpenError):
+            self.chat(StubResponse(200))
+        self.assertEqual(self.provider.session.calls, [])
+
+        self.provider.breaker.reset_timeout = 0
+        self.assertEqual(self.provider.breaker.state, 'half-open')
+        self.assertIn('choices', self.chat(StubResponse(200)))
+        self.assertEqual(self.provider.breaker.state, 'closed')
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_half_open_allows_a_single_trial(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        # A failed trial re-opens the circuit for another reset_timeout
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+
+    def test_unexpected_errors_release_the_trial(self):
+        provider = Provider('stub', 'http://provider.invalid/chat', 'stub-model', 'STUB_API_KEY')
+        provider.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        provider.breaker.record_failure()
+        provider._session = StubSession(KeyError('bug'))
+        with self.assertRaises(KeyError):
+            provider.chat([], 0.2, api_key='key')
+        self.assertTrue(provider.breaker.allow())
+
+
+def delayed(result, seconds, started=None):
+    def call():
+        if started is not None:
+            started.append(result)
+        time.sleep(seconds)
+        return result
+    return call
+
+
+def adelayed(result, seconds, started=None):
+    async def call():
+        if started is not None:
+            started.append(result)
+        await asyncio.sleep(seconds)
+        return result
+    return call
+
+
+class HedgingTests(SimpleTestCase):
+    def test_hedge_wins(self):
+        self.assertEqual(first_valid([delayed('slow', 0.5), delayed('hedge', 0)], hedge_after=0.05), ('hedge', 1))
+
+    def test_hedge_loses(self):
+        self.assertEqual(first_valid([delayed('slow', 0.15), delayed('hedge', 0.5)], hedge_after=0.05), ('slow', 0))
+
+    def test_fast_call_never_starts_the_hedge(self):
+        started = []
+        self.assertEqual(first_valid([delayed('fast', 0, started), delayed('hedge', 0, started)], hedge_after=0.2),
+                         ('fast', 0))
+        self.assertEqual(started, ['fast'])
+
+    def test_fallback_without_hedging(self):
+        self.assertEqual(first_valid([delayed(None, 0), delayed('fallback', 0)]), ('fallback', 1))
+        self.assertEqual(first_valid([delayed(None, 0), delayed(None, 0)]), (None, None))
+
+    def test_async_hedge_wins_and_cancels_the_loser(self):
+        async def run():
+            slow = asyncio.Event()
+
+            async def never():
+                try:
+                    await asyncio.sleep(5)
+                finally:
+                    slow.set()
+            result = await afirst_valid([never, adelayed('hedge', 0)], hedge_after=0.05)
+            await asyncio.wait_for(slow.wait(), 1)
+            return result
+        self.assertEqual(asyncio.run(run()), ('hedge', 1))
+
+    def test_async_hedge_loses(self):
+        started = []
+        result = asyncio.run(afirst_valid([adelayed('slow', 0.1, started), adelayed('hedge', 0.5, started)],
+                                          hedge_after=0.05))
+        self.assertEqual(result, ('slow', 0))
+        self.assertEqual(started, ['slow', 'hedge'])
+
+
+class HedgingSettingsCheckTests(SimpleTestCase):
+    def test_warns_when_hedging_cannot_happen(self):
+        with self.settings(RESUME_HEDGE_AFTER=2.0, RESUME_PROVIDER_FALLBACK=False):
+            self.assertEqual([warning.id for warning in check_hedging(None)], ['api.W001'])
+        with self.settings(RESUME_HEDGE_AFTER=2.0, RESUME_PROVIDER_FALLBACK=True):
+            self.assertEqual(check_hedging(None), [])
+        with self.settings(RESUME_HEDGE_AFTER=0, RESUME_PROVIDER_FALLBACK=False):
+            self.assertEqual(check_hedging(None), [])
+
+
+class DictCache(dict):
+    def set(self, key, value):
+        self[key] = value
+
+
+def outcomes():
+    return {outcome: RESUME_SINGLEFLIGHT.total(outcome=outcome)
+            for outcome in ('leader', 'coalesced', 'duplicate', 'lease_wait', 'lease_timeout')}
+
+
+def counted(before):
+    return {outcome: total - before[outcome] for outcome, total in outcomes().items() if total != before[outcome]}
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_requests_share_one_provider_call(self):
+        cache, calls, results = DictCache(), [], []
+        started = threading.Event()
+        release = threading.Event()
+
+        def generate():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            cache.set('key', 'resume')
+            return 'resume'
+
+        def request():
+            results.append(coalesce('key', generate, cache))
+
+        before = outcomes()
+        leader = threading.Thread(target=request)
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=request) for _ in range(7)]
+        for thread in followers:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['resume'] * 8)
+        self.assertEqual(counted(before), {'leader': 1, 'coalesced': 7, 'duplicate': 7})
+
+    def test_async_requests_share_one_provider_call(self):
+        calls = []
+
+        async def generate():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'resume'
+
+        async def run():
+            return await asyncio.gather(*(acoalesce('key', generate, DictCache()) for _ in range(5)))
+
+        before = outcomes()
+        self.assertEqual(asyncio.run(run()), ['resume'] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(counted(before), {'leader': 1, 'coalesced': 4, 'duplicate': 4})
+
+
+@override_settings(RESUME_SINGLEFLIGHT_LEASE=True, RESUME_SINGLEFLIGHT_LEASE_TTL=0.2, RESUME_SINGLEFLIGHT_POLL=0.02)
+class SingleFlightLeaseTests(TestCase):
+    def hold(self, owner, seconds):
+        ResumeLease.objects.create(key='key', owner=owner, expires_at=timezone.now() + timedelta(seconds=seconds))
+
+    def test_waiter_takes_over_when_the_lease_times_out(self):
+        self.hold('other-node', 60)
+        calls = []
+        before = outcomes()
+        self.assertEqual(coalesce('key', lambda: calls.append(1) or 'resume', DictCache()), 'resume')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(counted(before), {'duplicate': 1, 'lease_timeout': 1})
+        # The other node still holds its lease: the waiter never claimed it
+        self.assertEqual(ResumeLease.objects.get(key='key').owner, 'other-node')
+
+    def test_expired_lease_is_taken_over(self):
+        self.hold('dead-node', -1)
+        before = outcomes()
+        self.assertEqual(coalesce('key', lambda: 'resume', DictCache()), 'resume')
+        self.assertEqual(counted(before), {'leader': 1})
+        self.assertFalse(ResumeLease.objects.exists())
+
+    def test_waiter_uses_the_holders_result(self):
+        self.hold('other-node', 60)
+        cache = DictCache(key='resume')
+        before = outcomes()
+        self.assertEqual(coalesce('key', mock.Mock(side_effect=AssertionError), cache), 'resume')
+        self.assertEqual(counted(before), {'duplicate': 1, 'lease_wait': 1})
+
+
+class ResumeJobTests(TestCase):
+    def job(self, status=ResumeJob.STATUS_QUEUED, deadline=60, started=None):
+        now = timezone.now()
+        return ResumeJob.objects.create(
+            user='ana', provider='deepseek', status=status, deadline=now + timedelta(seconds=deadline),
+            started_at=now - timedelta(seconds=started) if started is not None else None,
+        )
+
+    def test_post_queues_a_job(self):
+        with mock.patch('api.views.get_job_queue') as queue:
+            queue.return_value.submit.return_value = True
+            response = self.client.post('/resume/jobs/', {'user': 'ana'}, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        job = ResumeJob.objects.get()
+        self.assertEqual(response.json()['id'], str(job.id))
+        self.assertEqual((job.status, job.provider, job.source), (ResumeJob.STATUS_QUEUED, 'deepseek', 's3'))
+        queue.return_value.submit.assert_called_once_with(job.id)
+
+    def test_post_rejects_bad_input_and_a_full_queue(self):
+        for body in ({'user': 'a b'}, {'user': 'ana', 'api': 'nope'}, {'user': 'ana', 'source': 'ftp'}):
+            response = self.client.post('/resume/jobs/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        with mock.patch('api.views.get_job_queue') as queue:
+            queue.return_value.submit.return_value = False
+            response = self.client.post('/resume/jobs/', {'user': 'ana'}, content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertFalse(ResumeJob.objects.exists())
+
+    def test_get_returns_the_job(self):
+        job = self.job(status=ResumeJob.STATUS_SUCCEEDED)
+        response = self.client.get(f'/resume/jobs/{job.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'succeeded')
+        self.assertEqual(self.client.get('/resume/jobs/00000000-0000-0000-0000-000000000000/').status_code, 404)
+
+    @override_settings(RESUME_JOB_LEASE=30)
+    def test_get_resubmits_an_abandoned_job(self):
+        job = self.job(status=ResumeJob.STATUS_RUNNING, started=60)
+        with mock.patch('api.views.get_job_queue') as queue:
+            queue.return_value.submit.return_value = True
+            response = self.client.get(f'/resume/jobs/{job.id}/')
+        queue.return_value.submit.assert_called_once_with(job.id)
+        self.assertEqual(response.json()['status'], 'queued')
+
+    @override_settings(RESUME_JOB_LEASE=30)
+    def test_get_fails_an_abandoned_job_the_full_queue_cannot_take(self):
+        job = self.job(status=ResumeJob.STATUS_RUNNING, started=60)
+        with mock.patch('api.views.get_job_queue') as queue:
+            queue.return_value.submit.return_value = False
+            response = self.client.get(f'/resume/jobs/{job.id}/')
+        self.assertEqual(response.json()['status'], 'failed')
+        self.assertIn("Too many resume jobs", response.json()['error'])
+        self.assertIsNotNone(response.json()['finished_at'])
+
+    def test_job_past_its_deadline_expires_without_calling_the_provider(self):
+        job = self.job(deadline=-1)
+        with mock.patch('api.jobs._execute') as execute:
+            self.assertEqual(run_job(job.id), ResumeJob.STATUS_EXPIRED)
+        execute.assert_not_called()
+        # Already claimed: a second worker does nothing
+        self.assertIsNone(run_job(job.id))
+
+    def test_job_finishing_after_its_deadline_expires(self):
+        job = self.job(deadline=60)
+
+        def late(job, deadline):
+            job.deadline = timezone.now() - timedelta(seconds=1)
+            return {'skills': ['Billing']}
+
+        with mock.patch('api.jobs._execute', side_effect=late):
+            self.assertEqual(run_job(job.id), ResumeJob.STATUS_EXPIRED)
+        job.refresh_from_db()
+        self.assertIsNone(job.result)
+        self.assertEqual(job.error, "Deadline exceeded while running.")
+
+    def test_job_runs_and_stores_its_result(self):
+        job = self.job()
+        with mock.patch('api.jobs._execute', return_value={'skills': ['Billing']}):
+            self.assertEqual(run_job(job.id), ResumeJob.STATUS_SUCCEEDED)
+        job.refresh_from_db()
+        self.assertEqual(job.result, {'skills': ['Billing']})
+        with mock.patch('api.jobs._execute', side_effect=RuntimeError("Input text not found.")):
+            self.assertEqual(run_job(self.job().id), ResumeJob.STATUS_FAILED)
+
+    @override_settings(RESUME_JOB_LEASE=30)
+    def test_recover_stale_jobs(self):
+        abandoned = self.job(status=ResumeJob.STATUS_RUNNING, started=60)
+        overdue = self.job(status=ResumeJob.STATUS_RUNNING, started=60, deadline=-1)
+        running = self.job(status=ResumeJob.STATUS_RUNNING, started=5)
+        self.assertEqual(recover_stale_jobs(), (1, 1))
+        statuses = dict(ResumeJob.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[abandoned.id], ResumeJob.STATUS_QUEUED)
+        self.assertEqual(statuses[overdue.id], ResumeJob.STATUS_EXPIRED)
+        self.assertEqual(statuses[running.id], ResumeJob.STATUS_RUNNING)
+        self.assertEqual(recover_stale_jobs(), (0, 0))
+
+
+class StubStreamResponse(StubResponse):
+    """A 200 streamed response sending content in deltas, then a usage chunk and [DONE]."""
+
+    def __init__(self, deltas, usage=None):
+        super().__init__(200)
+        chunks = [{'choices': [{'delta': {'content': delta}}]} for delta in deltas]
+        if usage is not None:
+            chunks.append({'choices': [], 'usage': usage})
+        self.lines = [f"data: {json.dumps(chunk)}" for chunk in chunks] + ['', 'data: [DONE]']
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+USAGE = {'prompt_tokens': 120, 'completion_tokens': 30, 'prompt_cache_hit_tokens': 100}
+
+
+class StreamMetricsTests(SimpleTestCase):
+    def requests(self, provider, outcome):
+        return PROVIDER_REQUESTS.total(provider=provider, outcome=outcome)
+
+    def test_stream_chat_reports_usage_and_counts_the_call(self):
+        provider = Provider('stub', 'http://provider.invalid/chat', 'stub-model', 'STUB_API_KEY')
+        provider._session = StubSession(StubStreamResponse(['{"skills": ', '["Billing"]}'], USAGE))
+        usage = []
+        calls = self.requests('stub', 'success')
+        timings = RESUME_STAGE_SECONDS.count(stage='provider_call', provider='stub', model='stub-model')
+        content = ''.join(provider.stream_chat([{'role': 'user', 'content': 'x'}], 0.2, on_usage=usage.append))
+        self.assertEqual(content, '{"skills": ["Billing"]}')
+        self.assertEqual(usage, [{'choices': [], 'usage': USAGE}])
+        self.assertEqual(provider._session.calls[0]['json']['stream_options'], {'include_usage': True})
+        self.assertEqual(self.requests('stub', 'success'), calls + 1)
+        self.assertEqual(RESUME_STAGE_SECONDS.count(stage='provider_call', provider='stub', model='stub-model'),
+                         timings + 1)
+
+    def test_closed_stream_counts_as_cancelled(self):
+        provider = Provider('stub', 'http://provider.invalid/chat', 'stub-model', 'STUB_API_KEY')
+        response = StubStreamResponse(['a', 'b'])
+        provider._session = StubSession(response)
+        cancelled = self.requests('stub', 'cancelled')
+        stream = provider.stream_chat([{'role': 'user', 'content': 'x'}], 0.2)
+        self.assertEqual(next(stream), 'a')
+        stream.close()
+        self.assertTrue(response.closed)
+        self.assertEqual(self.requests('stub', 'cancelled'), cancelled + 1)
+
+    @override_settings(RESUME_DEDUP=True)
+    def test_resume_stream_records_usage(self):
+        async def events(text):
+            return [event async for event in _resume_events(text, 'deepseek')]
+
+        provider = get_provider('deepseek')
+        labels = {'template': RESUME_TEMPLATE.id, 'provider': 'deepseek', 'model': provider.model}
+        prompt = PROMPT_TOKENS.total(kind='prompt', **labels)
+        cached = PROMPT_TOKENS.total(kind='cached', **labels)
+        calls = self.requests('deepseek', 'success')
+        reply = StubStreamResponse(['{"skills": ["Billing"]', '}'], USAGE)
+        with mock.patch.object(provider, '_session', StubSession(reply)):
+            sent = asyncio.run(events(f"2024-05-01 Streamed resume {time.time_ns()}."))
+        self.assertIn('event: done', sent[-1])
+        self.assertEqual(PROMPT_TOKENS.total(kind='prompt', **labels), prompt + 120)
+        self.assertEqual(PROMPT_TOKENS.total(kind='cached', **labels), cached + 100)
+        self.assertEqual(self.requests('deepseek', 'success'), calls + 1)
+
+
+class PromptUsageTests(SimpleTestCase):
+    def test_parse_usage(self):
+        self.assertEqual(parse_usage({'usage': USAGE}), Usage(120, 100, 30))
+        openai = {'prompt_tokens': 2000, 'completion_tokens': 50, 'prompt_tokens_details': {'cached_tokens': 1024}}
+        self.assertEqual(parse_usage({'usage': openai}), Usage(2000, 1024, 50))
+        self.assertEqual(parse_usage({'usage': {'prompt_tokens': 10}}), Usage(10, 0, 0))
+        for result in ({}, {'usage': None}, None, []):
+            self.assertIsNone(parse_usage(result))
+
+    def test_cost_charges_cached_input_at_its_own_price(self):
+        # 900 uncached input tokens at 0.28, 100 cached at 0.028 and 500 output tokens at 0.42 per million
+        self.assertAlmostEqual(call_cost('deepseek-chat', Usage(1000, 100, 500)), 0.0004648)
+        self.assertIsNone(call_cost('unknown-model', Usage(1000, 100, 500)))
+
+    def test_prices_setting_overrides_and_extends_the_list_prices(self):
+        prices = {'deepseek-chat': [1.0, 0.5, 2.0], 'local-model': [0, 0, 0]}
+        with self.settings(RESUME_PROVIDER_PRICES=prices):
+            self.assertAlmostEqual(call_cost('deepseek-chat', Usage(1000, 100, 500)), 0.00195)
+            self.assertEqual(call_cost('local-model', Usage(1000, 100, 500)), 0)
+        self.assertIsNone(call_cost('local-model', Usage(1000, 100, 500)))
+
+    def test_record_usage(self):
+        template = PromptTemplate('usage_test', '1', "Instructions.", "{text}")
+        labels = {'template': 'usage_test-v1', 'provider': 'deepseek', 'model': 'deepseek-chat'}
+        usage = record_usage(template, 'deepseek', 'deepseek-chat', {'usage': USAGE}, 0.5)
+        self.assertEqual(usage, Usage(120, 100, 30))
+        self.assertEqual(PROMPT_TOKENS.total(kind='prompt', **labels), 120)
+        self.assertEqual(PROMPT_TOKENS.total(kind='cached', **labels), 100)
+        self.assertEqual(PROMPT_TOKENS.total(kind='completion', **labels), 30)
+        self.assertAlmostEqual(PROMPT_COST.total(**labels), (20 * 0.28 + 100 * 0.028 + 30 * 0.42) / 1_000_000)
+        # Latency is observed even when the response reports no usage
+        self.assertIsNone(record_usage(template, 'deepseek', 'deepseek-chat', {}, 0.5))
+        self.assertEqual(PROMPT_CALL_SECONDS.count(**labels), 2)
+        self.assertEqual(PROMPT_TOKENS.total(kind='prompt', **labels), 120)
+
+    def test_cache_version_follows_the_template_text(self):
+        template = PromptTemplate('versioned', '1', "Instructions.", "{text}")
+        same = PromptTemplate('versioned', '1', "Instructions.", "{text}")
+        self.assertEqual(template.cache_version, same.cache_version)
+        self.assertTrue(template.cache_version.startswith('versioned-v1-'))
+        # Edited without bumping the version: results cached under the old wording are not reused
+        for edited in (PromptTemplate('versioned', '1', "Instructions!", "{text}"),
+                       PromptTemplate('versioned', '1', "Instructions.", "Text: {text}")):
+            self.assertNotEqual(edited.cache_version, template.cache_version)
+            self.assertEqual(edited.id, template.id)
+
+
+SAMPLE_LINE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+LABEL_PAIR = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"(?:,|$)')
+LABEL_ESCAPES = {'\\': '\\', '"': '"', 'n': '\n'}
+
+
+class MetricsEndpointTests(SimpleTestCase):
+    def scrape(self):
+        """Parses /metrics/ into {(name, frozenset(labels)): value}, undoing the label escaping."""
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if line.startswith('#'):
+                continue
+            match = SAMPLE_LINE.match(line)
+            self.assertIsNotNone(match, line)
+            name, labels, value = match.groups()
+            pairs = LABEL_PAIR.findall(labels or '')
+            # An unescaped quote or backslash would leave part of the label block outside every pair
+            self.assertEqual(','.join(f'{k}="{v}"' for k, v in pairs), labels or '', line)
+            unescaped = {k: re.sub(r'\\(.)', lambda m: LABEL_ESCAPES.get(m.group(1), ''), v) for k, v in pairs}
+            samples[(name, frozenset(unescaped.items()))] = float(value)
+        return samples
+
+    def test_label_values_are_escaped(self):
+        provider = f'quote"back\\slash\nline {time.time_ns()}'
+        labels = {'provider': provider, 'model': 'stub-model', 'outcome': 'success'}
+        PROVIDER_REQUESTS.inc(2, **labels)
+        samples = self.scrape()
+        key = (PROVIDER_REQUESTS.name, frozenset(labels.items()))
+        self.assertEqual(samples[key], 2)
+
+    def test_histogram_buckets_are_cumulative(self):
+        labels = {'stage': 'serialize', 'provider': 'stub', 'model': f'model-{time.time_ns()}'}
+        for value in (0.003, 0.3, 400):
+            RESUME_STAGE_SECONDS.observe(value, **labels)
+        samples = self.scrape()
+        name = RESUME_STAGE_SECONDS.name
+        buckets = {
+            dict(key)['le']: value for (sample, key), value in samples.items()
+            if sample == f'{name}_bucket' and dict(key).items() > labels.items()
+        }
+        self.assertEqual(len(buckets), len(RESUME_STAGE_SECONDS.buckets) + 1)
+        for bound in RESUME_STAGE_SECONDS.buckets:
+            expected = (bound >= 0.003) + (bound >= 0.3)
+            self.assertEqual(buckets[str(bound)], expected, bound)
+        self.assertEqual(buckets['+Inf'], 3)
+        series = frozenset(labels.items())
+        self.assertAlmostEqual(samples[(f'{name}_sum', series)], 400.303)
+        self.assertEqual(samples[(f'{name}_count', series)], 3)
+
+
+def structure_diary(self, text, provider, timeout=None, dedupe=True, deadline=None):
+    return {'skills': [text.split()[0]]}, provider
+
+
+@mock.patch.object(ResumeAPIView, 'structure', autospec=True, side_effect=structure_diary)
+class BulkProcessResumesTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.checkpoint = self.dir / 'run.ckpt'
+        for user in ('ana', 'bo', 'cy'):
+            (self.dir / user).mkdir()
+            (self.dir / user / 'diary.txt').write_text(f"{user.title()} diary", encoding='utf-8')
+
+    def bulk(self, *args):
+        out = io.StringIO()
+        call_command('bulk_process_resumes', '--local-dir', str(self.dir), '--checkpoint', str(self.checkpoint),
+                     *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_writes_resumes_and_resumes_from_the_checkpoint(self, structure):
+        self.bulk('--limit', '2')
+        self.assertEqual(sorted(self.checkpoint.read_text().split()), ['ana', 'bo'])
+        self.assertEqual(json.loads((self.dir / 'ana' / 'resume.json').read_text()), {'skills': ['Ana']})
+        output = self.bulk()
+        self.assertIn("(1 written, 0 failed, 2 skipped from checkpoint)", output)
+        self.assertEqual(structure.call_count, 3)
+
+    def test_interrupted_run_flushes_what_it_collected(self, structure):
+        def interrupted(command):
+            yield from ('ana', 'bo', 'cy')
+            raise KeyboardInterrupt
+
+        with mock.patch.object(BulkProcessCommand, 'iter_users', interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                self.bulk('--concurrency', '1', '--batch-size', '10')
+        written = self.checkpoint.read_text().split()
+        self.assertIn('ana', written)
+        for user in written:
+            self.assertTrue((self.dir / user / 'resume.json').exists())
+
+    def test_versions_carry_over_incremental_progress(self, structure):
+        ResumeVersion.objects.create(user='ana', number=3, data={}, provider='deepseek', last_entry_id=42)
+        self.bulk('--save-versions')
+        ana = ResumeVersion.objects.filter(user='ana').order_by('-number').first()
+        self.assertEqual((ana.number, ana.last_entry_id, ana.data), (4, 42, {'skills': ['Ana']}))
+        bo = ResumeVersion.objects.get(user='bo')
+        self.assertEqual((bo.number, bo.last_entry_id), (1, 0))
+
+    def test_versions_survive_a_concurrent_regeneration(self, structure):
+        ResumeVersion.objects.create(user='bo', number=1, data={}, provider='deepseek', last_entry_id=7)
+        latest_versions = BulkProcessCommand.latest_versions
+        reads = []
+
+        def stale_first(users):
+            # The first read happened before a regeneration of bo created version 1
+            reads.append(users)
+            return {} if len(reads) == 1 else latest_versions(users)
+
+        with mock.patch.object(BulkProcessCommand, 'latest_versions', side_effect=stale_first):
+            self.bulk('--save-versions')
+        self.assertEqual(list(ResumeVersion.objects.filter(user='bo').values_list('number', 'last_entry_id')),
+                         [(2, 7), (1, 7)])
+        self.assertEqual(ResumeVersion.objects.count(), 4)
+
+
+BASE_RESUME = {
+    'title': 'Ana - Engineer',
+    'summary': {'professional_summary': 'Backend engineer.'},
+    'experience': [{'company': 'Acme', 'role': 'Engineer', 'timeline': '2020-', 'highlights': ['Billing']}],
+    'skills': ['Python', 'SQL'],
+    'education': {'USP': 'BSc Computer Science'},
+}
+
+
+class IncrementalRegenerationTests(TestCase):
+    def entry(self, content, entry_type='note'):
+        return DiaryEntry.objects.create(user='ana', content=content, entry_type=entry_type)
+
+    def test_merge_deduplicates_the_delta(self):
+        delta = {
+            'title': 'Someone else',
+            'experience': [
+                {'company': ' acme', 'role': 'ENGINEER', 'timeline': '2020-2024', 'highlights': ['billing', 'Payouts']},
+                {'company': 'Initech', 'role': 'Lead', 'highlights': []},
+            ],
+            'skills': ['python', 'Go'],
+            'education': {'USP': ['BSc Computer Science', 'MSc Databases']},
+        }
+        merged = merge_resume(BASE_RESUME, delta)
+        self.assertEqual(merged['title'], 'Ana - Engineer')
+        self.assertEqual(merged['skills'], ['Python', 'SQL', 'Go'])
+        self.assertEqual([item['company'] for item in merged['experience']], ['Initech', 'Acme'])
+        self.assertEqual(merged['experience'][1]['highlights'], ['Billing', 'Payouts'])
+        self.assertEqual(merged['experience'][1]['timeline'], '2020-2024')
+        self.assertEqual(merged['education'], {'USP': ['BSc Computer Science', 'MSc Databases']})
+        # Merging the same delta again changes nothing, and the base is left untouched
+        self.assertEqual(merge_resume(merged, delta), merged)
+        self.assertEqual(BASE_RESUME['skills'], ['Python', 'SQL'])
+
+    def test_only_new_entries_go_to_the_provider(self):
+        self.entry("Started at Acme as a backend engineer.")
+        process = mock.Mock(return_value=(BASE_RESUME, 'deepseek'))
+        first, created = regenerate_resume('ana', 'deepseek', process)
+        self.assertTrue(created)
+        self.entry("Led the Initech migration.")
+        process.return_value = ({'experience': [{'company': 'Initech', 'role': 'Lead'}]}, 'chatgpt')
+        second, created = regenerate_resume('ana', 'deepseek', process)
+        self.assertEqual((second.number, second.delta_entries, second.provider), (2, 1, 'chatgpt'))
+        self.assertNotIn('Acme', process.call_args.args[0])
+        self.assertEqual(second.data['skills'], ['Python', 'SQL'])
+        # Nothing new: the latest version is returned without a call
+        self.assertEqual(regenerate_resume('ana', 'deepseek', process), (second, False))
+        self.assertEqual(process.call_count, 2)
+
+    def test_known_skills_are_merged_without_the_provider(self):
+        self.entry("Started at Acme as a backend engineer.")
+        process = mock.Mock(return_value=(BASE_RESUME, 'deepseek'))
+        regenerate_resume('ana', 'deepseek', process)
+        self.entry("Kubernetes, Rust", entry_type='skill')
+        skipped = PROVIDER_REQUESTS.total(provider='deepseek', outcome='skipped_local')
+        version, created = regenerate_resume('ana', 'deepseek', process)
+        self.assertTrue(created)
+        self.assertEqual(process.call_count, 1)
+        self.assertEqual(version.provider, 'local')
+        self.assertEqual(version.data['skills'], ['Python', 'SQL', 'Kubernetes', 'Rust'])
+        self.assertEqual(PROVIDER_REQUESTS.total(provider='deepseek', outcome='skipped_local'), skipped + 1)
+
+    def test_losing_a_race_for_the_version_number_returns_the_winner(self):
+        entry = self.entry("Started at Acme as a backend engineer.")
+
+        def concurrent(text):
+            # Another regeneration of the same entries finishes while this one waits on the provider
+            ResumeVersion.objects.create(user='ana', number=1, data=BASE_RESUME, provider='deepseek',
+                                         last_entry_id=entry.id, delta_entries=1)
+            return {'skills': ['Python']}, 'deepseek'
+
+        version, created = regenerate_resume('ana', 'deepseek', concurrent)
+        self.assertFalse(created)
+        self.assertEqual(version.number, 1)
+        self.assertEqual(ResumeVersion.objects.count(), 1)
+
+    def test_losing_a_race_builds_on_the_winner(self):
+        older = self.entry("Started at Acme as a backend engineer.")
+        self.entry("Led the Initech migration.")
+
+        def concurrent(text):
+            # The winner only covered the entries written before this regeneration's newest one
+            ResumeVersion.objects.create(user='ana', number=1, data=BASE_RESUME, provider='deepseek',
+                                         last_entry_id=older.id, delta_entries=1)
+            return {'experience': [{'company': 'Initech', 'role': 'Lead'}], 'skills': ['sql']}, 'deepseek'
+
+        version, created = regenerate_resume('ana', 'deepseek', concurrent)
+        self.assertTrue(created)
+        self.assertEqual(version.number, 2)
+        self.assertEqual([item['company'] for item in version.data['experience']], ['Initech', 'Acme'])
+        self.assertEqual(version.data['skills'], ['Python', 'SQL'])
+
+
+class FakeS3:
+    """Stands in for the boto3 S3 client: objects in a dict, ETags from their content, conditional reads."""
+
+    def __init__(self):
+        self.objects = {}
+        self.before_get = {}
+
+    def put_object(self, Bucket, Key, Body, ContentType=None, Metadata=None):
+        etag = f'"{hashlib.md5(Body).hexdigest()}"'
+        self.objects[Key] = (Body, dict(Metadata or {}), etag, timezone.now())
+        return {'ETag': etag}
+
+    def _object(self, key, operation):
+        from botocore.exceptions import ClientError
+
+        if key not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey'}}, operation)
+        return self.objects[key]
+
+    def head_object(self, Bucket, Key):
+        body, metadata, etag, modified = self._object(Key, 'HeadObject')
+        return {'ETag': etag, 'LastModified': modified, 'ContentLength': len(body), 'Metadata': metadata}
+
+    def get_object(self, Bucket, Key, IfMatch=None, Range=None):
+        from botocore.exceptions import ClientError
+
+        if Key in self.before_get:
+            # Replaces the object between the caller's HEAD and this read
+            self.before_get.pop(Key)()
+        body, metadata, etag, modified = self._object(Key, 'GetObject')
+        if IfMatch is not None and IfMatch != etag:
+            raise ClientError({'Error': {'Code': 'PreconditionFailed'}}, 'GetObject')
+        return {'Body': io.BytesIO(body), 'ETag': etag, 'ContentLength': len(body), 'Metadata': metadata}
+
+
+@override_settings(AWS_STORAGE_BUCKET_NAME='bucket', RESUME_FRESHNESS_TTL=60)
+class ResumeFreshnessTests(SimpleTestCase):
+    def setUp(self):
+        self.s3 = FakeS3()
+        for target, value in (('api.storage.get_s3_client', lambda: self.s3), ('api.storage._freshness_memo', None)):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.s3.put_object('bucket', diary_key('ana'), b"2024-05-01 Billing service.")
+
+    def forget(self):
+        # A new process: only the S3 metadata is left
+        storage._freshness_memo = None
+
+    def diary(self):
+        return head_object(diary_key('ana'))
+
+    def test_fallback_resume_is_fresh_for_the_requested_provider(self):
+        write_resume_json('ana', {'skills': ['Billing']}, self.diary(), 'chatgpt', 'deepseek')
+        self.assertTrue(check_freshness('ana', 'deepseek').fresh)
+        self.forget()
+        freshness = check_freshness('ana', 'deepseek')
+        self.assertEqual((freshness.fresh, freshness.data), (True, {'skills': ['Billing']}))
+        self.assertEqual(freshness.resume.metadata['provider'], 'chatgpt')
+        self.assertFalse(check_freshness('ana', 'chatgpt').fresh)
+
+    def test_resume_without_the_requested_provider_uses_the_answering_one(self):
+        self.s3.put_object('bucket', resume_key('ana'), b'{}', Metadata={
+            'diary-etag': self.diary().etag, 'provider': 'chatgpt',
+        })
+        self.assertTrue(check_freshness('ana', 'chatgpt').fresh)
+        self.assertFalse(check_freshness('ana', 'deepseek').fresh)
+
+    def test_changed_diary_is_stale(self):
+        write_resume_json('ana', {'skills': ['Billing']}, self.diary(), 'deepseek')
+        self.s3.put_object('bucket', diary_key('ana'), b"2024-05-02 Payouts.")
+        self.forget()
+        self.assertFalse(check_freshness('ana', 'deepseek').fresh)
+
+    def test_resume_replaced_during_the_check_is_checked_again(self):
+        write_resume_json('ana', {'skills': ['Billing']}, self.diary(), 'deepseek')
+        self.forget()
+        self.s3.before_get[resume_key('ana')] = lambda: write_resume_json(
+            'ana', {'skills': ['Payouts']}, self.diary(), 'deepseek'
+        )
+        self.assertEqual(check_freshness('ana', 'deepseek').data, {'skills': ['Payouts']})
+
+    def test_diary_replaced_while_read_is_a_conflict(self):
+        self.s3.before_get[diary_key('ana')] = lambda: self.s3.put_object(
+            'bucket', diary_key('ana'), b"2024-05-02 Payouts."
+        )
+        with mock.patch.object(ResumeAPIView, 'structure') as structure:
+            response = self.client.get('/resume/', {'user': 'ana'})
+        self.assertEqual(response.status_code, 409)
+        structure.assert_not_called()
+
+    def test_fallback_answer_is_served_fresh_to_the_next_request(self):
+        with mock.patch.object(ResumeAPIView, 'structure', return_value=({'skills': ['Billing']}, 'chatgpt')) as call:
+            self.assertEqual(self.client.get('/resume/', {'user': 'ana'}).status_code, 200)
+            self.forget()
+            response = self.client.get('/resume/', {'user': 'ana'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {'skills': ['Billing']})
+        self.assertEqual(call.call_count, 1)
+
+
+class AsyncResumeUrls:
+    """URLconf of a process started with RESUME_ASYNC_VIEWS, where 'resume/' is served by resume_async."""
+    urlpatterns = [path('resume/', resume_async, name='resume')]
+
+
+@override_settings(AWS_STORAGE_BUCKET_NAME='bucket', RESUME_FRESHNESS_TTL=60, ROOT_URLCONF=AsyncResumeUrls)
+class ResumeAsyncTests(SimpleTestCase):
+    def setUp(self):
+        self.s3 = FakeS3()
+        for target, value in (('api.storage.get_s3_client', lambda: self.s3), ('api.storage._freshness_memo', None)):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.s3.put_object('bucket', diary_key('ana'), b"2024-05-01 Billing service.")
+        self.reply = ({'skills': ['Billing'], 'summary': {'professional_summary': 'Ação & <billing>'}}, 'deepseek')
+
+    async def test_returns_the_payload_of_the_sync_view(self):
+        with mock.patch.object(ResumeAPIView, 'structure', return_value=self.reply) as structure:
+            with override_settings(ROOT_URLCONF='dagbok.urls'):
+                expected = await sync_to_async(self.client.get)('/resume/', {'user': 'ana'})
+        self.assertEqual(expected.status_code, 200)
+        structure.assert_called_once()
+        # Stale again: the async view generates the resume instead of serving the one just written
+        self.s3.objects.pop(resume_key('ana'))
+        storage._freshness_memo = None
+        with mock.patch.object(ResumeAPIView, 'astructure', return_value=self.reply) as astructure:
+            response = await self.async_client.get('/resume/', {'user': 'ana'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content), json.loads(expected.content))
+            self.assertEqual(response['ETag'], expected['ETag'])
+            fresh = await self.async_client.get('/resume/', {'user': 'ana'})
+        self.assertEqual(json.loads(fresh.content), json.loads(expected.content))
+        self.assertEqual(astructure.call_count, 1)
+
+    async def test_busy_when_every_generation_slot_is_taken(self):
+        generations = threading.BoundedSemaphore(1)
+        generations.acquire()
+        with mock.patch('api.views._get_async_generations', return_value=generations), \
+                mock.patch.object(ResumeAPIView, 'astructure', return_value=self.reply) as astructure:
+            response = await self.async_client.get('/resume/', {'user': 'ana'})
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '5')
+            astructure.assert_not_called()
+            generations.release()
+            self.assertEqual((await self.async_client.get('/resume/', {'user': 'ana'})).status_code, 200)
+        # The slot taken by the generation is given back
+        self.assertTrue(generations.acquire(blocking=False))
+
+
+PDF_RESUME = {
+    'title': 'Ana Öz - Software Engineer',
+    'summary': {'professional_summary': 'Backend engineer <billing> & payments.'},
+    'experience': [{'company': 'Acme', 'role': 'Engineer', 'timeline': '2020-', 'highlights': ['Billing', 'Payouts']}],
+    'education': {'USP': ['BSc Computer Science']},
+    'skills': ['Python', 'SQL'],
+    'additional_information': {'languages': ['Portuguese', 'English'], 'interests': None},
+}
+
+
+class PdfExportTests(SimpleTestCase):
+    def test_render_is_byte_stable(self):
+        first = render_pdf(PDF_RESUME, 'modern', 'pt-BR')
+        self.assertTrue(first.startswith(b'%PDF'))
+        # Invariant mode: no creation date or random document id makes two renders differ
+        with mock.patch('time.time', return_value=time.time() + 86400 * 365):
+            self.assertEqual(render_pdf(PDF_RESUME, 'modern', 'pt-BR'), first)
+        self.assertNotEqual(render_pdf(PDF_RESUME, 'classic', 'pt-BR'), first)
+
+    def test_slot_is_released_when_the_pool_rejects_a_render(self):
+        renderer = PdfRenderer('thread', workers=1, max_pending=1)
+        renderer._executor.shutdown()
+        with self.assertRaises(RuntimeError):
+            renderer.render(PDF_RESUME, 'classic', 'en')
+        renderer._executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(renderer._executor.shutdown)
+        self.assertTrue(renderer.render(PDF_RESUME, 'classic', 'en', timeout=30).startswith(b'%PDF'))
+
+    def test_full_pool_rejects_renders_until_one_finishes(self):
+        renderer = PdfRenderer('thread', workers=1, max_pending=1)
+        self.addCleanup(renderer._executor.shutdown)
+        renderer._slots.acquire()
+        with self.assertRaises(PdfExportBusy):
+            renderer.render(PDF_RESUME, 'classic', 'en')
+        renderer._slots.release()
+        self.assertTrue(renderer.render(PDF_RESUME, 'classic', 'en', timeout=30).startswith(b'%PDF'))
+
+
+TAILOR_RESUME = {
+    'title': 'Ana - Engineer',
+    'experience': [
+        {'company': 'Acme', 'role': 'Data Engineer', 'description': 'Owned the warehouse.',
+         'highlights': ['Built Spark pipelines for billing', 'Cut query costs by half']},
+        {'company': 'Initech', 'role': 'Frontend Developer', 'highlights': ['Rewrote the checkout in React']},
+    ],
+    'skills': ['React', 'Kubernetes', 'SQL', 'Spark'],
+}
+
+
+class TailoringTests(TestCase):
+    def test_bm25_prefers_rare_terms_and_short_documents(self):
+        index = BM25Index(["spark pipelines", "spark", "billing reports and spark dashboards for finance"])
+        scores = index.scores("spark billing")
+        self.assertEqual(set(scores), {0, 1, 2})
+        # Only the third document has the rarer 'billing'
+        self.assertEqual(max(scores, key=scores.get), 2)
+        # Same single match: the shorter document scores higher
+        spark = index.scores("spark")
+        self.assertGreater(spark[1], spark[0])
+        self.assertGreater(spark[0], spark[2])
+        self.assertEqual(index.scores("unrelated words"), {})
+        self.assertEqual(tokenize("The Spark and C++ / C# stack"), ['spark', 'c++', 'c#', 'stack'])
+
+    def test_ranks_items_against_the_job_description(self):
+        job = "Data engineer for Spark billing pipelines"
+        experience, skills = rank_items('ana', 'rank-test', TAILOR_RESUME, job, 2)
+        self.assertEqual(experience[0].text, 'Built Spark pipelines for billing')
+        self.assertTrue(all(item.experience == 0 for item in experience))
+        self.assertEqual(len(experience), 2)
+        self.assertEqual(skills[0].text, 'Spark')
+
+    def test_skills_named_by_alias_are_kept_first(self):
+        _, skills = rank_items('ana', 'alias-test', TAILOR_RESUME, "We run everything on k8s.", 3)
+        self.assertEqual([item.text for item in skills], ['Kubernetes'])
+
+    def test_malformed_sections_yield_no_items(self):
+        resume = {'experience': 'Acme, 2020', 'skills': 'Python', 'title': 'x'}
+        self.assertEqual(resume_items(resume), [('skill', 'Python', None)])
+
+    def test_stored_resume_that_is_not_an_object_is_a_bad_gateway(self):
+        ResumeVersion.objects.create(user='ana', number=1, data=['not', 'a', 'resume'], provider='deepseek')
+        response = self.client.post('/resume/tailor/', {'user': 'ana', 'job_description': 'Spark'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 502)
+
+    def test_ranking_endpoint(self):
+        ResumeVersion.objects.create(user='ana', number=1, data=TAILOR_RESUME, provider='deepseek')
+        response = self.client.post('/resume/tailor/', {'user': 'ana', 'job_description': 'React checkout'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['experience'][0]['text'], 'Rewrote the checkout in React')
+        self.assertEqual(response.json()['skills'][0]['text'], 'React')
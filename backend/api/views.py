@@ -7,232 +7,1007 @@ Methods:
     get(self, request):
         Handles GET requests to the API endpoint. It checks if the input text file exists in the S3 bucket,
         processes it using the specified AI API if necessary, and returns the structured JSON data.
+        Whether the stored resume.json is still up to date is decided from S3 metadata alone (see
+        check_freshness in api/storage.py); the diary is only downloaded when it must be reprocessed.
+        Responses carry a strong ETag of the resume version and If-None-Match is answered with 304
+        before any body is built; bodies and their gzip/brotli variants are built once per version
+        (see api/conditional.py). A diary replaced while it is being read is answered with 409, so the
+        client asks again for the new version.
 
-    process_with_deepseek(self, text, api_key):
-        Processes the given unstructured resume text using the DeepSeek API and returns the structured JSON data.
-        Args:
-            text (str): The unstructured resume text.
-            api_key (str): The API key for accessing the DeepSeek API.
-        Returns:
-            dict: The structured JSON data extracted from the resume text, or None if an error occurs.
+    process_text(self, text, provider):
+        Structures the text with the given provider, going through the content-addressed result cache
+        (see api/cache.py) so unchanged text never triggers a second provider call. Provider calls go
+        through api/providers.py (pooled sessions, retries, circuit breaker), falling back to or hedging
+        with the other provider. Texts over the RESUME_CHUNK_TOKENS budget are map-reduced in chunks
+        (see api/chunking.py), after near-duplicate entries are collapsed (see api/dedup.py). Concurrent
+        misses of the same text are coalesced into a single generation (see api/singleflight.py).
+
+    build_messages(self, text, provider):
+        Builds the call from RESUME_TEMPLATE (see api/prompts.py): the instructions are a static system
+        message, byte-identical on every call so the providers' prompt caching applies to them, and only
+        the text and the candidate skills matched in it are sent in the user message.
 
-    process_with_chatgpt(self, text, api_key):
-        Processes the given unstructured resume text using the ChatGPT API and returns the structured JSON data.
+    process_with(self, provider, text, api_key):
+        Processes the given unstructured resume text with the given provider and returns the structured JSON
+        data, or None if an error occurs. The prompt, cached and completion tokens of the call, its estimated
+        cost and its latency are recorded under the template version (see api/prompts.py).
+        process_with_deepseek and process_with_chatgpt are kept as shortcuts for the two providers.
         Args:
+            provider (str): Key of PROVIDERS.
             text (str): The unstructured resume text.
-            api_key (str): The API key for accessing the ChatGPT API.
+            api_key (str): The API key of the provider.
         Returns:
             dict: The structured JSON data extracted from the resume text, or None if an error occurs.
+
+DiaryEntryAPIView stores new diary entries and lists a user's entries, and ResumeVersionListAPIView lists a
+user's resume versions; both listings are keyset-paginated (see api/pagination.py). DiarySearchAPIView ranks a
+user's entries against a full-text query through the database's own index (see api/search.py).
+ResumeRegenerateAPIView creates a new ResumeVersion by sending only the entries added since the previous
+version to the provider and merging the result section by section (see api/incremental.py).
+
+TailorAPIView ranks the highlights and skills of a user's stored resume against a job description locally
+(BM25 over a cached per-version index, see api/tailoring.py) and, when asked, sends only the best ones to the
+provider to write a tailored resume or cover letter.
+
+ResumePdfAPIView downloads the current resume (or a given ResumeVersion) as a PDF rendered on a bounded pool and
+cached by (resume version, template, locale) on disk or S3; repeated downloads are static bytes with ETag and
+Range support (see api/pdf.py and api/conditional.py).
+
+ResumeJobAPIView queues a generation and returns its id right away; ResumeJobDetailAPIView reports its status
+and result. Jobs run on the bounded executor of api/jobs.py, so web workers never wait on the provider.
+
+resume_async is an async version of ResumeAPIView.get, mapped to 'resume/' when RESUME_ASYNC_VIEWS is set: under
+dagbok/asgi.py a generation waiting on the provider holds no thread, so one process can keep hundreds of them
+in flight (limits: RESUME_ASYNC_PROVIDER_CONNECTIONS, RESUME_ASYNC_OFFLOAD_WORKERS, RESUME_ASYNC_MAX_GENERATIONS).
+
+resume_stream is an async view (served through dagbok/asgi.py) that calls the provider in stream mode and
+pushes every top-level section of the resume ('title', 'summary', each 'experience' item, 'skills', ...) as a
+server-sent event as soon as it is complete (see api/streaming.py).
+
+ResumeCacheStatsAPIView returns the hit/miss counters of the result cache, including the number of
+provider calls and seconds of provider latency saved by cache hits.
+
+metrics_view serves the Prometheus metrics of api/metrics.py: the duration of every generation stage
+(s3_fetch, dedup, prompt_build, provider_call, json_extraction, serialization) by provider and model,
+provider calls by outcome, the prompt tokens saved by near-duplicate collapsing, the tokens, cost and
+latency of provider calls per prompt template version (see api/prompts.py) and the result cache
+counters. Logging goes through the 'api' logger as JSON lines
+(see api/log.py); raw provider payloads are only logged for a sample of calls.
 """
 import re
-import json
-import boto3
-import requests
-import traceback
-from datetime import datetime
-from botocore.exceptions import ClientError
-from dotenv import load_dotenv
+import time
+import asyncio
+import logging
+import functools
+import threading
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from datetime import timedelta
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-# Load environment variables from .env file
-load_dotenv()
+from .cache import get_result_cache, make_cache_key
+from .chunking import chunk_text, estimate_tokens, process_chunks, reduce_partials
+from .conditional import etag_matches, file_response, make_etag, not_modified_response, resume_response
+from .dedup import dedupe_text
+from .extraction import normalize_resume, extract_resume
+from .incremental import regenerate_resume
+from .jobs import get_job_queue, recover_stale_jobs
+from .log import log_sampled
+from .metrics import RESUME_PROMPT_TOKENS, render as render_metrics, timed
+from .offload import run_blocking
+from .pagination import KeysetPagination
+from .pdf import PdfExportBusy, export_pdf, pdf_cache_key
+from .prompts import PROVIDER_NOTES, RESUME_TEMPLATE, detected_skills_note, record_usage
+from .providers import PROVIDERS, ProviderError, afirst_valid, first_valid, get_provider
+from .search import search_entries
+from .singleflight import acoalesce, coalesce
+from .tailoring import build_tailoring_prompt, load_profile, rank_items
+from .skills import REJECTED_SKILLS_KEY, enrich_resume, pre_extract
+from .models import DiaryEntry, ResumeJob, ResumeVersion
+from .storage import (
+    ObjectChangedError, check_freshness, diary_key, read_diary_text, read_object_text, write_resume_json,
+)
+from .serializers import (
+    DiaryEntrySerializer,
+    DiarySearchQuerySerializer,
+    ResumeJobSerializer,
+    ResumePdfQuerySerializer,
+    ResumeVersionSerializer,
+    ResumeVersionSummarySerializer,
+    TailorRequestSerializer,
+)
+from .streaming import SectionStreamParser, iter_sections, sse_event
+
+logger = logging.getLogger(__name__)
+
+# Fixed resume served when settings.RESUME_USE_SAMPLE is enabled (local testing without S3/AI keys)
+SAMPLE_RESUME = {
+    "title": "Adriano Alves - Desenvolvedor Full Stack",
+    "summary": {
+        "professional_summary": "Desenvolvedor Full Stack experiente com mais de 10 anos de experiência em desenvolvimento web. Especializado em Python, Django, JavaScript e React.js."
+    },
+    "education": {
+        "Universidade Federal do Paraná": "Bacharel em Ciência da Computação (2010-2014)"
+    },
+    "experience": [
+        {
+            "company": "Agilizatop",
+            "role": "Desenvolvedor Full Stack Sênior",
+            "timeline": "2018 - Presente",
+            "description": "Desenvolvimento de aplicações web utilizando Django e React.js",
+            "highlights": [
+                "Implementação de sistema de autenticação OAuth",
+                "Otimização de queries que melhoraram o desempenho em 40%",
+                "Liderança de equipe de 5 desenvolvedores"
+            ]
+        },
+        {
+            "company": "TechSolutions",
+            "role": "Desenvolvedor Backend",
+            "timeline": "2015 - 2018",
+            "description": "Desenvolvimento de APIs RESTful em Python/Django",
+            "highlights": [
+                "Criação de microserviços",
+                "Integração com sistemas de pagamento",
+                "Implementação de CI/CD"
+            ]
+        }
+    ],
+    "skills": [
+        "Python", "Django", "JavaScript", "React.js", "Docker", "AWS",
+        "Git", "SQL", "MongoDB", "REST APIs", "Agile", "Scrum"
+    ],
+    "additional_information": {
+        "languages": ["Português (nativo)", "Inglês (fluente)"],
+        "interests": ["Desenvolvimento open source", "Machine Learning", "Hiking"],
+        "availability": "Disponível para projetos imediatamente"
+    }
+}
+
+TEMPERATURE = 0.7
+
+
+# Users are mapped to S3 keys, so only allow simple identifiers
+USER_ID_RE = re.compile(r'^[A-Za-z0-9_.@-]{1,128}$')
+
+# 409 answer when the diary or its resume was replaced while a request was reading it
+DIARY_CHANGED_ERROR = "The diary changed while it was being read, try again."
 
-# Configure the S3 client with the specified region
-s3_client = boto3.client('s3', region_name=os.getenv('AWS_S3_REGION_NAME'))
 
 class ResumeAPIView(APIView):
     def get(self, request):
         """
-        IMPLEMENTAÇÃO TEMPORÁRIA PARA TESTE - Retorna dados JSON fixos sem acessar S3
+        Returns the structured resume of a user.
+
+        Query parameters:
+            user: Identifier of the user whose diary is stored at RESUME_S3_PREFIX/<user>/diary.txt.
+            api: AI provider used to structure the text ('deepseek' or 'chatgpt', default 'deepseek').
         """
         try:
-            # Retornar dados de teste para simular um currículo
-            sample_resume = {
-                "title": "Adriano Alves - Desenvolvedor Full Stack",
-                "summary": {
-                    "professional_summary": "Desenvolvedor Full Stack experiente com mais de 10 anos de experiência em desenvolvimento web. Especializado em Python, Django, JavaScript e React.js."
-                },
-                "education": {
-                    "Universidade Federal do Paraná": "Bacharel em Ciência da Computação (2010-2014)"
-                },
-                "experience": [
-                    {
-                        "company": "Agilizatop",
-                        "role": "Desenvolvedor Full Stack Sênior",
-                        "timeline": "2018 - Presente",
-                        "description": "Desenvolvimento de aplicações web utilizando Django e React.js",
-                        "highlights": [
-                            "Implementação de sistema de autenticação OAuth",
-                            "Otimização de queries que melhoraram o desempenho em 40%",
-                            "Liderança de equipe de 5 desenvolvedores"
-                        ]
-                    },
-                    {
-                        "company": "TechSolutions",
-                        "role": "Desenvolvedor Backend",
-                        "timeline": "2015 - 2018",
-                        "description": "Desenvolvimento de APIs RESTful em Python/Django",
-                        "highlights": [
-                            "Criação de microserviços",
-                            "Integração com sistemas de pagamento",
-                            "Implementação de CI/CD"
-                        ]
-                    }
-                ],
-                "skills": [
-                    "Python", "Django", "JavaScript", "React.js", "Docker", "AWS",
-                    "Git", "SQL", "MongoDB", "REST APIs", "Agile", "Scrum"
-                ],
-                "additional_information": {
-                    "languages": ["Português (nativo)", "Inglês (fluente)"],
-                    "interests": ["Desenvolvimento open source", "Machine Learning", "Hiking"],
-                    "availability": "Disponível para projetos imediatamente"
-                }
-            }
-            
-            return Response(sample_resume)
+            if settings.RESUME_USE_SAMPLE:
+                return Response(SAMPLE_RESUME)
+
+            user = request.query_params.get('user', '')
+            if not USER_ID_RE.match(user):
+                return Response({"error": "Invalid or missing 'user' parameter."}, status=status.HTTP_400_BAD_REQUEST)
+            provider = request.query_params.get('api', 'deepseek')
+            if provider not in PROVIDERS:
+                return Response({"error": f"Unknown api '{provider}'."}, status=status.HTTP_400_BAD_REQUEST)
+
+            with timed('s3_fetch', provider, PROVIDERS[provider]["model"]):
+                freshness = check_freshness(user, provider)
+            if freshness.diary is None:
+                return Response({"error": "Input text not found."}, status=status.HTTP_404_NOT_FOUND)
+            if freshness.fresh:
+                etag = make_etag(freshness.resume.etag)
+                with timed('serialization', provider, PROVIDERS[provider]["model"]):
+                    return resume_response(request, etag, freshness.data)
+
+            # The diary changed since resume.json was generated (or there is none yet)
+            with timed('s3_fetch', provider, PROVIDERS[provider]["model"]):
+                text = read_object_text(diary_key(user), freshness.diary)
+            structured, answered_by = self.structure(text, provider)
+            if structured is None:
+                return Response({"error": "Failed to process resume text."}, status=status.HTTP_502_BAD_GATEWAY)
+            etag = make_etag(write_resume_json(user, structured, freshness.diary, answered_by, provider))
+            with timed('serialization', provider, PROVIDERS[provider]["model"]):
+                return resume_response(request, etag, structured)
+        except ObjectChangedError as e:
+            logger.info("%s", e)
+            return Response({"error": DIARY_CHANGED_ERROR}, status=status.HTTP_409_CONFLICT)
         except Exception as e:
-            error_trace = traceback.format_exc()
-            print(f"Error in ResumeAPIView: {e}\nTraceback:\n{error_trace}")
+            logger.exception("Error in ResumeAPIView: %s", e)
             return Response({"error": f"Internal server error: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    def process_with_deepseek(self, text, api_key):
-        try:
-            print("Processing text with DeepSeek API...")
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
-            prompt = (
-                "You are a helpful assistant that interprets unstructured resume text and structures it into a JSON format. "
-                "Extract and categorize the following sections:\n"
-                "Return in English a JSON object with the following sections:\n"
-                "- 'title': The person's name and professional title (e.g., 'Adriano Alves - Software Engineer').\n"
-                "- 'summary': An object with 'professional_summary' (a brief overview of the person's career). Do NOT include a 'key_skills' field here, as skills should only be in the 'skills' section.\n"
-                "- 'education': An object where each key is an institution name, with the value being either a single string (e.g., 'Bachelor of Computer Science (2014-2018)') or a list of strings if multiple degrees are mentioned.\n"
-                "- 'experience': A list of objects, each describing a professional experience with the following fields: 'company' (company name), 'role', 'timeline', 'description', and 'highlights' (a list of achievements). Extract this from job history or narrative text.\n"
-                "- 'skills': A list of technical and soft skills mentioned anywhere in the text (e.g., ['JavaScript', 'Leadership']). This should be the only section containing skills.\n"
-                "- 'additional_information': An object with fields like 'languages', 'citizenship', 'availability', and 'interests' if present.\n"
-                "Ensure that 'experience' and 'skills' are always populated if relevant information exists in the text. If the text mentions jobs or roles, include them in the 'experience' section with full details. If skills are mentioned (e.g., 'experienced in JavaScript', 'leadership skills'), list them in the 'skills' section. "
-                "Return a valid JSON object with these sections.\n\n"
-                f"Unstructured resume text:\n\n{text}"
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Renders the response here (instead of in the handler) so its serialization is timed."""
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if not isinstance(response, Response):
+            # Conditional responses (api/conditional.py) are already encoded and timed
+            return response
+        provider = request.query_params.get('api', 'deepseek')
+        model = PROVIDERS[provider]["model"] if provider in PROVIDERS else ''
+        with timed('serialization', provider, model):
+            response.render()
+        return response
+
+    def process_text(self, text, provider, timeout=None, dedupe=True, deadline=None):
+        """
+        Structures text with the given provider, reusing a cached result when the same text was
+        already processed with the same provider, model, prompt version and temperature.
+
+        Args:
+            text (str): The unstructured resume text.
+            provider (str): Key of PROVIDERS.
+            timeout (float): Provider request timeout in seconds (default settings.RESUME_PROVIDER_TIMEOUT).
+            dedupe (bool): Collapse near-duplicate entries on a cache miss (when settings.RESUME_DEDUP
+                is set).
+            deadline (float): Optional time.monotonic() value by which the whole generation must end;
+                every provider call (fallbacks, chunks) only gets the time left, and none starts after it.
+        Returns:
+            dict: The structured JSON data, or None if every provider call failed.
+        """
+        return self.structure(text, provider, timeout=timeout, dedupe=dedupe, deadline=deadline)[0]
+
+    def structure(self, text, provider, timeout=None, dedupe=True, deadline=None):
+        """
+        Same as process_text, but also tells which provider produced the result.
+
+        The requested provider goes first. With settings.RESUME_PROVIDER_FALLBACK the others are
+        fallbacks (and hedges when settings.RESUME_HEDGE_AFTER is set), each generating the whole text
+        under its own result cache key, so a result is never stored or labelled as another provider's.
+
+        Returns:
+            tuple: (structured JSON data or None, key of PROVIDERS that produced it or None)
+        """
+        names = [provider]
+        if settings.RESUME_PROVIDER_FALLBACK:
+            names += [name for name in PROVIDERS if name != provider]
+        calls = [
+            functools.partial(self.structure_with, text, name, timeout=timeout, dedupe=dedupe, deadline=deadline)
+            for name in names
+        ]
+        result, index = first_valid(calls, hedge_after=settings.RESUME_HEDGE_AFTER or None)
+        if result is None:
+            return None, None
+        if index:
+            logger.info("Resume for provider %s produced by %s", provider, names[index],
+                        extra={'provider': provider, 'fallback': names[index]})
+        return result, names[index]
+
+    def structure_with(self, text, provider, timeout=None, dedupe=True, deadline=None):
+        """Structures text with this provider only, through the result cache (see process_text)."""
+        config = PROVIDERS[provider]
+        cache_key = make_cache_key(text, provider, config["model"], RESUME_TEMPLATE.cache_version, TEMPERATURE)
+        cached = get_result_cache().get(cache_key)
+        if cached is not None:
+            return cached
+        # Concurrent requests for the same key (several tabs, retries) share one generation
+        return coalesce(
+            cache_key,
+            lambda: self.generate(text, provider, cache_key, timeout=timeout, dedupe=dedupe, deadline=deadline),
+            get_result_cache(),
+        )
+
+    def generate(self, text, provider, cache_key, timeout=None, dedupe=True, deadline=None):
+        """
+        Structures text with the provider (map-reducing it in chunks when it is too long) and stores
+        the result in the result cache under cache_key. Called by structure_with on a cache miss.
+
+        Near-duplicates are collapsed within each chunk, after chunking: the chunks are hashed on
+        their raw text, so entries appended to the diary never change the bytes, and the cache keys,
+        of the chunks before them.
+        """
+        chunks = chunk_text(text, settings.RESUME_CHUNK_TOKENS)
+        started = time.monotonic()
+        if len(chunks) > 1:
+            # Too long for one call: structure the chunks concurrently (each one cached by its own
+            # content hash) and merge the partial resumes
+            result = process_chunks(
+                chunks,
+                lambda chunk: self.structure_with(chunk, provider, timeout=timeout, dedupe=dedupe, deadline=deadline),
+                settings.RESUME_CHUNK_WORKERS,
             )
-            payload = {
-                "model": "deepseek-chat",  # Replace with the correct DeepSeek model
-                "messages": [
-                    {"role": "system", "content": "You are a helpful assistant that interprets unstructured resume text and structures it into a JSON format."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.7
-            }
-
-            # Send the request to the DeepSeek API
-            response = requests.post("https://api.deepseek.com/v1/chat/completions", headers=headers, json=payload, timeout=3000)
-            response.raise_for_status()  # Raise an exception for 4xx/5xx status codes
-
-            # Log the full API response
-            print("API Response:", response.text)
-
-            # Decode the response as JSON
-            result = response.json()
-
-            # Check if the response contains the expected structure
-            if not result.get('choices'):
-                print("No 'choices' found in the API response.")
-                return None
+        else:
+            if dedupe and settings.RESUME_DEDUP:
+                text = self.dedupe(text, provider)
+            result = self.process_with(
+                provider, text, os.getenv(PROVIDERS[provider]["api_key_env"]), timeout=timeout, deadline=deadline
+            )
+            if result is not None:
+                result = enrich_resume(result, pre_extract(text))
+        if result is not None:
+            get_result_cache().set(cache_key, result, elapsed=time.monotonic() - started)
+        return result
 
-            content = result['choices'][0]['message']['content']
-            print(f"DeepSeek response:\n{content}")  # Log for debugging
+    async def aprocess_text(self, text, provider, timeout=None, dedupe=True):
+        """
+        Async version of process_text: cache and lease calls run on the offload executor
+        (api/offload.py) and the providers are called with the async client.
+        """
+        return (await self.astructure(text, provider, timeout=timeout, dedupe=dedupe))[0]
 
-            # Extract JSON from the Markdown code block
-            json_match = re.search(r'```json\s*({.*?})\s*```', content, re.DOTALL)
-            if not json_match:
-                print("No JSON found in the 'content'.")
-                return None
+    async def astructure(self, text, provider, timeout=None, dedupe=True):
+        """Async version of structure."""
+        names = [provider]
+        if settings.RESUME_PROVIDER_FALLBACK:
+            names += [name for name in PROVIDERS if name != provider]
+        calls = [
+            functools.partial(self.astructure_with, text, name, timeout=timeout, dedupe=dedupe)
+            for name in names
+        ]
+        result, index = await afirst_valid(calls, hedge_after=settings.RESUME_HEDGE_AFTER or None)
+        if result is None:
+            return None, None
+        if index:
+            logger.info("Resume for provider %s produced by %s", provider, names[index],
+                        extra={'provider': provider, 'fallback': names[index]})
+        return result, names[index]
 
-            json_str = json_match.group(1)  # Extract JSON string
-            return json.loads(json_str)  # Decode the extracted JSON
+    async def astructure_with(self, text, provider, timeout=None, dedupe=True):
+        """Async version of structure_with."""
+        config = PROVIDERS[provider]
+        cache_key = make_cache_key(text, provider, config["model"], RESUME_TEMPLATE.cache_version, TEMPERATURE)
+        cached = await run_blocking(get_result_cache().get, cache_key)
+        if cached is not None:
+            return cached
+        return await acoalesce(
+            cache_key,
+            lambda: self.agenerate(text, provider, cache_key, timeout=timeout, dedupe=dedupe),
+            get_result_cache(),
+        )
 
-        except requests.exceptions.HTTPError as e:
-            error_response = response.text if response else "No response from server"
-            print(f"HTTPError: {e}. Response: {error_response}")
+    async def agenerate(self, text, provider, cache_key, timeout=None, dedupe=True):
+        """Async version of generate."""
+        chunks = chunk_text(text, settings.RESUME_CHUNK_TOKENS)
+        started = time.monotonic()
+        if len(chunks) > 1:
+            limit = asyncio.Semaphore(settings.RESUME_CHUNK_WORKERS)
+
+            async def process_chunk(chunk):
+                async with limit:
+                    return await self.astructure_with(chunk, provider, timeout=timeout, dedupe=dedupe)
+
+            partials = await asyncio.gather(*(process_chunk(chunk) for chunk in chunks))
+            result = None if any(partial is None for partial in partials) else reduce_partials(partials)
+        else:
+            if dedupe and settings.RESUME_DEDUP:
+                text = self.dedupe(text, provider)
+            result = await self.aprocess_with(
+                provider, text, os.getenv(PROVIDERS[provider]["api_key_env"]), timeout=timeout
+            )
+            if result is not None:
+                result = enrich_resume(result, pre_extract(text))
+        if result is not None:
+            await run_blocking(get_result_cache().set, cache_key, result, elapsed=time.monotonic() - started)
+        return result
+
+    async def aprocess_with(self, provider, text, api_key, timeout=None):
+        """Async version of process_with."""
+        model = PROVIDERS[provider]["model"]
+        try:
+            with timed('prompt_build', provider, model):
+                messages = self.build_messages(text, provider)
+            started = time.monotonic()
+            result = await get_provider(provider).achat(messages, TEMPERATURE, api_key=api_key, timeout=timeout)
+            record_usage(RESUME_TEMPLATE, provider, model, result, time.monotonic() - started)
+            return self.parse_result(result, provider)
+        except ProviderError as e:
+            logger.warning(
+                "ProviderError: %s", e,
+                extra={'provider': provider, 'status_code': e.status_code, 'body': (e.body or '')[:500]},
+            )
+            return None
+        except Exception as e:
+            logger.exception("Error processing with %s: %s", provider, e, extra={'provider': provider})
             return None
-        except requests.exceptions.Timeout as e:
-            print(f"TimeoutError: The request timed out. {e}")
+
+    def dedupe(self, text, provider):
+        """Returns text with its near-duplicate entries collapsed, recording the prompt size saved."""
+        with timed('dedup', provider, PROVIDERS[provider]["model"]):
+            deduplicated = dedupe_text(text)
+        before, after = estimate_tokens(text), estimate_tokens(deduplicated)
+        RESUME_PROMPT_TOKENS.inc(before, stage='raw')
+        RESUME_PROMPT_TOKENS.inc(after, stage='deduplicated')
+        if after < before:
+            logger.info("Collapsed near-duplicate entries: ~%d -> ~%d tokens", before, after,
+                        extra={'provider': provider, 'tokens_before': before, 'tokens_after': after})
+        return deduplicated
+
+    def stream_completion(self, text, provider, api_key, timeout=None, on_usage=None):
+        """
+        Calls the provider in stream mode and yields the content of the response as it arrives.
+        on_usage is called with the final chunk of the stream, which carries the token usage.
+        """
+        return get_provider(provider).stream_chat(
+            self.build_messages(text, provider), TEMPERATURE, api_key=api_key, timeout=timeout, on_usage=on_usage
+        )
+
+    def build_messages(self, text, provider):
+        """
+        Returns the chat messages asking the provider to structure the resume text: the static
+        instructions of RESUME_TEMPLATE, then the text and the skills of the local vocabulary matched
+        in it (api/skills.py; the ones the provider does not reject are merged into the result afterwards).
+        """
+        return RESUME_TEMPLATE.messages(
+            notes=PROVIDER_NOTES.get(provider, ''),
+            detected_skills=detected_skills_note(pre_extract(text).skills),
+            text=text,
+        )
+
+    def parse_content(self, content, provider=''):
+        """
+        Extracts the resume JSON from the message content of a provider response, wherever it sits
+        (code fence, surrounding prose), and repairs common schema defects locally (see api/extraction.py).
+
+        Args:
+            content (str): The message content.
+            provider (str): Key of PROVIDERS that produced it (metric and log labels).
+        Returns:
+            dict: The structured resume, or None if the content holds no usable resume JSON.
+        """
+        model = PROVIDERS[provider]["model"] if provider in PROVIDERS else ''
+        with timed('json_extraction', provider, model):
+            resume, repairs = extract_resume(content)
+        if resume is None:
+            logger.warning("No valid resume JSON found in the 'content'.", extra={'provider': provider})
+            log_sampled(logger, logging.WARNING, "Unparseable provider content", content, provider=provider)
             return None
-        except json.JSONDecodeError as e:
-            print(f"JSONDecodeError: {e}. Response content is not valid JSON.")
+        if repairs:
+            logger.info("Repaired provider output: %s", '; '.join(repairs), extra={'provider': provider})
+        return resume
+
+    def process_with(self, provider, text, api_key, timeout=None, deadline=None):
+        """
+        Processes the unstructured resume text with the given provider and returns the structured JSON
+        data, or None if an error occurs. Tokens, cost and latency of the call are accounted under the
+        version of RESUME_TEMPLATE (see api/prompts.py). With a deadline (see process_text) the call,
+        retries included, is cut to the time left, and skipped once it has passed.
+        """
+        model = PROVIDERS[provider]["model"]
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning("Deadline exceeded before calling %s", provider, extra={'provider': provider})
+                return None
+            timeout = min(timeout, remaining) if timeout else remaining
+        try:
+            logger.debug("Processing text with %s API...", provider, extra={'provider': provider})
+            with timed('prompt_build', provider, model):
+                messages = self.build_messages(text, provider)
+            started = time.monotonic()
+            result = get_provider(provider).chat(messages, TEMPERATURE, api_key=api_key, timeout=timeout)
+            record_usage(RESUME_TEMPLATE, provider, model, result, time.monotonic() - started)
+            return self.parse_result(result, provider)
+        except ProviderError as e:
+            logger.warning(
+                "ProviderError: %s", e,
+                extra={'provider': provider, 'status_code': e.status_code, 'body': (e.body or '')[:500]},
+            )
             return None
         except Exception as e:
-            error_trace = traceback.format_exc()
-            print(f"Error processing with DeepSeek: {e}\nTraceback:\n{error_trace}")
+            logger.exception("Error processing with %s: %s", provider, e, extra={'provider': provider})
+            return None
+
+    def parse_result(self, result, provider):
+        """Returns the resume of a chat-completion response (see parse_content), or None if it has none."""
+        # Full responses are large: only a sample of them is logged
+        log_sampled(logger, logging.DEBUG, "API Response", result, provider=provider)
+
+        # Check if the response contains the expected structure
+        if not result.get('choices'):
+            logger.warning("No 'choices' found in the API response.", extra={'provider': provider})
             return None
+        return self.parse_content(result['choices'][0]['message']['content'], provider)
+
+    def process_with_deepseek(self, text, api_key, timeout=None):
+        return self.process_with("deepseek", text, api_key, timeout=timeout)
+
+    def process_with_chatgpt(self, text, api_key, timeout=None):
+        return self.process_with("chatgpt", text, api_key, timeout=timeout)
+
+
+class ResumeCacheStatsAPIView(APIView):
+    def get(self, request):
+        """Returns the counters of the provider result cache."""
+        return Response(get_result_cache().stats())
+
+
+class DiaryEntryAPIView(APIView):
+    def get(self, request):
+        """
+        Lists the diary entries of a user, newest first.
+
+        Query parameters:
+            user: The diary owner.
+            entry_type: Optional, only entries of this type.
+            limit, cursor: Keyset pagination (see api/pagination.py).
+        """
+        user = request.query_params.get('user', '')
+        if not user:
+            return Response({"error": "The user parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+        entries = DiaryEntry.objects.filter(user=user)
+        entry_type = request.query_params.get('entry_type')
+        if entry_type:
+            entries = entries.filter(entry_type=entry_type)
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(entries, request, view=self)
+        return paginator.get_paginated_response(DiaryEntrySerializer(page, many=True).data)
 
-    def process_with_chatgpt(self, text, api_key):
+    def post(self, request):
+        """Stores a new diary entry (user, content, optional entry_type and entry_date)."""
+        serializer = DiaryEntrySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class DiarySearchAPIView(APIView):
+    def get(self, request):
+        """
+        Searches the diary entries of a user, best matches first.
+
+        Query parameters:
+            user: The diary owner.
+            q: Search terms, all required; 'term*' matches words starting with term.
+            entry_type, since, until: Optional type and entry_date range filters.
+            limit: Maximum number of results (default 20, at most 100).
+        """
+        query = DiarySearchQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+        hits = search_entries(
+            params['user'], params['q'], entry_type=params.get('entry_type'),
+            since=params.get('since'), until=params.get('until'), limit=params['limit'],
+        )
+        return Response({
+            "results": [
+                {**DiaryEntrySerializer(hit.entry).data, "rank": hit.rank} for hit in hits
+            ],
+        })
+
+
+class ResumeVersionListAPIView(APIView):
+    def get(self, request):
+        """
+        Lists the resume versions of a user, newest first, without their resume data (fetch a version
+        through resume/regenerate/ for that).
+
+        Query parameters:
+            user: The resume owner.
+            limit, cursor: Keyset pagination (see api/pagination.py).
+        """
+        user = request.query_params.get('user', '')
+        if not user:
+            return Response({"error": "The user parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+        versions = ResumeVersion.objects.filter(user=user).defer('data')
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(versions, request, view=self)
+        return paginator.get_paginated_response(ResumeVersionSummarySerializer(page, many=True).data)
+
+
+class ResumeRegenerateAPIView(APIView):
+    def get(self, request):
+        """
+        Returns the latest ResumeVersion of the user given in the 'user' query parameter.
+
+        Answers If-None-Match with 304 after looking up the id of the latest version only.
+        """
+        user = request.query_params.get('user', '')
+        latest = ResumeVersion.objects.filter(user=user).order_by('-number')
+        latest_id = latest.values_list('id', flat=True).first()
+        if latest_id is None:
+            return Response({"error": "No resume version found."}, status=status.HTTP_404_NOT_FOUND)
+        etag = make_etag(f"rv{latest_id}")
+        if etag_matches(request, etag):
+            return not_modified_response(request, etag)
+        return resume_response(request, etag, ResumeVersionSerializer(latest.get(id=latest_id)).data)
+
+    def post(self, request):
+        """
+        Brings the user's resume up to date with the diary.
+
+        Body parameters:
+            user: The diary owner.
+            api: AI provider used for the delta ('deepseek' or 'chatgpt', default 'deepseek').
+        """
         try:
-            print("Processing text with ChatGPT API...")
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
-            prompt = (
-                "You are a helpful assistant that interprets unstructured resume text and structures it into a JSON format. "
-                "Extract and categorize the following sections:\n"
-                "- 'title': The person's name and professional title (e.g., 'Adriano Alves - Software Engineer').\n"
-                "- 'summary': An object with 'professional_summary' (a brief overview of the person's career). Do NOT include a 'key_skills' field here, as skills should only be in the 'skills' section.\n"
-                "- 'education': An object where each key is an institution name, with the value being either a single string (e.g., 'Bachelor of Computer Science (2014-2018)') or a list of strings if multiple degrees are mentioned.\n"
-                "- 'experience': A list of objects, each describing a professional experience with the following fields: 'company' (company name), 'role', 'timeline', 'description', and 'highlights' (a list of achievements). Extract this from job history or narrative text.\n"
-                "- 'skills': A list of technical and soft skills mentioned anywhere in the text (e.g., ['JavaScript', 'Leadership']). This should be the only section containing skills.\n"
-                "- 'additional_information': An object with fields like 'languages', 'citizenship', 'availability', and 'interests' if present.\n"
-                "Ensure that 'experience' and 'skills' are always populated if relevant information exists in the text. If the text mentions jobs or roles, include them in the 'experience' section with full details. If skills are mentioned (e.g., 'experienced in JavaScript', 'leadership skills'), list them in the 'skills' section. "
-                "Return a valid JSON object with these sections.\n\n"
-                f"Unstructured resume text:\n\n{text}"
+            user = request.data.get('user', '')
+            if not USER_ID_RE.match(user):
+                return Response({"error": "Invalid or missing 'user' parameter."}, status=status.HTTP_400_BAD_REQUEST)
+            provider = request.data.get('api', 'deepseek')
+            if provider not in PROVIDERS:
+                return Response({"error": f"Unknown api '{provider}'."}, status=status.HTTP_400_BAD_REQUEST)
+
+            processor = ResumeAPIView()
+            version, created = regenerate_resume(user, provider, lambda text: processor.structure(text, provider))
+            if version is None:
+                if not DiaryEntry.objects.filter(user=user).exists():
+                    return Response({"error": "No diary entries found."}, status=status.HTTP_404_NOT_FOUND)
+                return Response({"error": "Failed to process diary entries."}, status=status.HTTP_502_BAD_GATEWAY)
+            return Response(
+                ResumeVersionSerializer(version).data,
+                status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
             )
-            payload = {
-                "model": "gpt-3.5-turbo",
-                "messages": [
-                    {"role": "system", "content": "You are a helpful assistant that interprets unstructured resume text and structures it into a JSON format."},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.7
-            }
-
-            # Send the request to the ChatGPT API with a timeout
-            response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload, timeout=3000)
-            response.raise_for_status()  # Raise an exception for 4xx/5xx status codes
-
-            # Log the full API response
-            print("API Response:", response.text)
-
-            # Decode the response as JSON
-            result = response.json()
-
-            # Check if the response contains the expected structure
-            if not result.get('choices'):
-                print("No 'choices' found in the API response.")
-                return None
+        except Exception as e:
+            logger.exception("Error in ResumeRegenerateAPIView: %s", e)
+            return Response({"error": f"Internal server error: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            content = result['choices'][0]['message']['content']
-            print(f"ChatGPT response:\n{content}")  # Log for debugging
 
-            # Try to decode the content as JSON
-            try:
-                return json.loads(content)
-            except json.JSONDecodeError as e:
-                print(f"JSONDecodeError: {e}. Response content is not valid JSON.")
-                return None
+class TailorAPIView(APIView):
+    def post(self, request):
+        """
+        Ranks the stored resume items of a user against a job description and optionally writes a
+        tailored document from the best ones.
 
-        except requests.exceptions.HTTPError as e:
-            error_response = response.text if response else "No response from server"
-            print(f"HTTPError: {e}. Response: {error_response}")
-            return None
-        except requests.exceptions.Timeout as e:
-            print(f"TimeoutError: The request timed out. {e}")
+        Body parameters:
+            user: The resume owner.
+            job_description: The job description.
+            document: 'none' (ranking only, default), 'resume' or 'cover_letter'.
+            api: AI provider writing the document (default 'deepseek').
+            top_k: Experience items and skills kept (default RESUME_TAILOR_TOP_K).
+        """
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        params = TailorRequestSerializer(data=request.data)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = params.validated_data
+        try:
+            token, resume = load_profile(params['user'])
+        except (BotoCoreError, ClientError, ValueError) as e:
+            logger.exception("Error loading the resume of %s: %s", params['user'], e)
+            return Response({"error": "Failed to read the stored resume."}, status=status.HTTP_502_BAD_GATEWAY)
+        if resume is None:
+            return Response({"error": "No resume found for this user."}, status=status.HTTP_404_NOT_FOUND)
+
+        experience, skills = rank_items(
+            params['user'], token, resume, params['job_description'],
+            params.get('top_k') or settings.RESUME_TAILOR_TOP_K,
+        )
+        body = {
+            "experience": [item._asdict() for item in experience],
+            "skills": [item._asdict() for item in skills],
+        }
+        if params['document'] == 'none':
+            return Response(body)
+
+        provider = params['api']
+        template, messages = build_tailoring_prompt(
+            params['document'], resume, experience, skills, params['job_description']
+        )
+        document = self.write_document(template, messages, params['document'], provider)
+        if document is None:
+            return Response({"error": "Failed to generate the document."}, status=status.HTTP_502_BAD_GATEWAY)
+        body["prompt_tokens"] = template.prefix_tokens + estimate_tokens(messages[-1]["content"])
+        body[params['document']] = document
+        return Response(body)
+
+    def write_document(self, template, messages, document, provider):
+        """
+        Returns the tailored document (resume dict or cover letter text) written by the provider for
+        the messages built from template, through the result cache, or None if the call failed.
+        """
+        config = PROVIDERS[provider]
+        cache_key = make_cache_key(
+            messages[-1]["content"], provider, config["model"], template.cache_version, TEMPERATURE
+        )
+        cached = get_result_cache().get(cache_key)
+        if cached is not None:
+            return cached[document]
+        started = time.monotonic()
+        try:
+            result = get_provider(provider).chat(
+                messages, TEMPERATURE, api_key=os.getenv(config["api_key_env"])
+            )
+            record_usage(template, provider, config["model"], result, time.monotonic() - started)
+            content = result['choices'][0]['message']['content']
+        except (ProviderError, KeyError, IndexError, TypeError) as e:
+            logger.warning("Tailoring call failed: %s", e, extra={'provider': provider})
             return None
+        if document == 'cover_letter':
+            output = content.strip()
+        else:
+            output, _ = extract_resume(content)
+            if output is None:
+                log_sampled(logger, logging.WARNING, "Unparseable tailored resume", content, provider=provider)
+                return None
+        get_result_cache().set(cache_key, {document: output}, elapsed=time.monotonic() - started)
+        return output
+
+
+class ResumePdfAPIView(APIView):
+    def perform_content_negotiation(self, request, force=False):
+        # The body is a PDF whatever the Accept header says; never answer 'Accept: application/pdf' with 406
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        """
+        Downloads the resume of a user as a PDF, rendered once per (version, template, locale).
+
+        Query parameters:
+            user: The resume owner.
+            api: AI provider used if the resume must be regenerated first (default 'deepseek').
+            template: Layout, one of api.pdf.TEMPLATES (default 'classic').
+            locale: Section labels and page size, one of api.pdf.LOCALES (default 'en').
+            version: Optional ResumeVersion number; otherwise the current resume, as served by resume/.
+        """
+        params = ResumePdfQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = params.validated_data
+        user, provider = params['user'], params['api']
+        try:
+            if params.get('version'):
+                row = ResumeVersion.objects.filter(user=user, number=params['version']).values_list('id', 'data').first()
+                if row is None:
+                    return Response({"error": "Resume version not found."}, status=status.HTTP_404_NOT_FOUND)
+                token, resume = f"rv{row[0]}", row[1]
+            elif settings.RESUME_USE_SAMPLE:
+                token, resume = 'sample', SAMPLE_RESUME
+            else:
+                with timed('s3_fetch', provider, PROVIDERS[provider]["model"]):
+                    freshness = check_freshness(user, provider)
+                if freshness.diary is None:
+                    return Response({"error": "Input text not found."}, status=status.HTTP_404_NOT_FOUND)
+                if freshness.fresh:
+                    token, resume = freshness.resume.etag, freshness.data
+                else:
+                    with timed('s3_fetch', provider, PROVIDERS[provider]["model"]):
+                        text = read_object_text(diary_key(user), freshness.diary)
+                    resume, answered_by = ResumeAPIView().structure(text, provider)
+                    if resume is None:
+                        return Response({"error": "Failed to process resume text."}, status=status.HTTP_502_BAD_GATEWAY)
+                    token = write_resume_json(user, resume, freshness.diary, answered_by, provider)
+
+            template, locale = params['template'], params['locale']
+            # The render is deterministic, so the cache key identifies the bytes
+            etag = make_etag(f"pdf-{pdf_cache_key(token, template, locale)[:40]}")
+            body = b'' if etag_matches(request, etag) else export_pdf(token, resume, template, locale)
+            suffix = f"-v{params['version']}" if params.get('version') else ''
+            return file_response(
+                request, etag, body, 'application/pdf', f"resume-{user}{suffix}-{template}.pdf",
+                immutable=bool(params.get('version')),
+            )
+        except PdfExportBusy:
+            return Response(
+                {"error": "Too many PDF exports in progress, try again later."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "5"},
+            )
+        except FuturesTimeoutError:
+            return Response({"error": "PDF rendering timed out."}, status=status.HTTP_504_GATEWAY_TIMEOUT)
+        except ObjectChangedError as e:
+            logger.info("%s", e)
+            return Response({"error": DIARY_CHANGED_ERROR}, status=status.HTTP_409_CONFLICT)
         except Exception as e:
-            error_trace = traceback.format_exc()
-            print(f"Error processing with ChatGPT: {e}\nTraceback:\n{error_trace}")
-            return None
\ No newline at end of file
+            logger.exception("Error in ResumePdfAPIView: %s", e)
+            return Response({"error": f"Internal server error: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ResumeJobAPIView(APIView):
+    def post(self, request):
+        """
+        Queues a resume generation and returns 202 with the job id.
+
+        Body parameters:
+            user: The diary owner.
+            api: AI provider ('deepseek' or 'chatgpt', default 'deepseek').
+            source: 's3' to structure the diary text stored in S3 (default) or 'diary' to
+                regenerate incrementally from the stored diary entries.
+        """
+        user = request.data.get('user', '')
+        if not USER_ID_RE.match(user):
+            return Response({"error": "Invalid or missing 'user' parameter."}, status=status.HTTP_400_BAD_REQUEST)
+        provider = request.data.get('api', 'deepseek')
+        if provider not in PROVIDERS:
+            return Response({"error": f"Unknown api '{provider}'."}, status=status.HTTP_400_BAD_REQUEST)
+        source = request.data.get('source', 's3')
+        if source not in dict(ResumeJob.SOURCES):
+            return Response({"error": f"Unknown source '{source}'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = ResumeJob.objects.create(
+            user=user,
+            provider=provider,
+            source=source,
+            deadline=timezone.now() + timedelta(seconds=settings.RESUME_JOB_DEADLINE),
+        )
+        if not get_job_queue().submit(job.id):
+            job.delete()
+            return Response(
+                {"error": "Too many resume jobs in progress, try again later."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": "5"},
+            )
+        return Response(ResumeJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class ResumeJobDetailAPIView(APIView):
+    def get(self, request, job_id):
+        """
+        Returns the status of a resume job and, once it succeeded, its result.
+
+        A job whose worker stopped while running it is requeued or expired here (see
+        api/jobs.recover_stale_jobs), so a polling client never waits on it forever. If the queue
+        is too full to take the requeued job back, it is marked failed so the client can retry.
+        """
+        job = ResumeJob.objects.filter(id=job_id).first()
+        if job is None:
+            return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+        if job.status == ResumeJob.STATUS_RUNNING:
+            requeued, expired = recover_stale_jobs(ResumeJob.objects.filter(id=job_id))
+            if requeued and not get_job_queue().submit(job.id):
+                logger.warning("Job queue full, failing recovered resume job %s", job.id,
+                               extra={'job_id': str(job.id)})
+                # Conditional: a run_resume_jobs worker may have claimed it in the meantime
+                ResumeJob.objects.filter(id=job.id, status=ResumeJob.STATUS_QUEUED).update(
+                    status=ResumeJob.STATUS_FAILED,
+                    error="Too many resume jobs in progress, try again later.",
+                    finished_at=timezone.now(),
+                )
+            if requeued or expired:
+                job.refresh_from_db()
+        return Response(ResumeJobSerializer(job).data)
+
+
+async def _resume_events(text, provider):
+    """Yields the server-sent events of a streamed resume generation."""
+    config = PROVIDERS[provider]
+    cache_key = make_cache_key(text, provider, config["model"], RESUME_TEMPLATE.cache_version, TEMPERATURE)
+    cached = await run_blocking(get_result_cache().get, cache_key)
+    if cached is not None:
+        for section in iter_sections(cached):
+            yield sse_event("section", section)
+        yield sse_event("done", {"cached": True})
+        return
+
+    started = time.monotonic()
+    parser = SectionStreamParser()
+    view = ResumeAPIView()
+    prompt_text = await run_blocking(view.dedupe, text, provider) if settings.RESUME_DEDUP else text
+    usage = {}
+    # Builds the prompt, which matches the skills vocabulary against the text
+    chunks = await run_blocking(
+        view.stream_completion, prompt_text, provider, os.getenv(config["api_key_env"]), on_usage=usage.update
+    )
+    # The provider stream is read with blocking requests, one chunk at a time off the event loop
+    next_chunk = sync_to_async(next, thread_sensitive=False)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                break
+            for section in parser.feed(chunk):
+                if section['section'] != REJECTED_SKILLS_KEY:
+                    yield sse_event("section", section)
+        result = parser.result()
+    except Exception as e:
+        logger.exception("Error streaming with %s: %s", provider, e, extra={'provider': provider})
+        yield sse_event("error", {"error": f"Failed to process resume text: {str(e)}"})
+        return
+    finally:
+        # Closing a stream cut short releases its connection, which may block
+        await run_blocking(chunks.close)
+    record_usage(RESUME_TEMPLATE, provider, config["model"], usage, time.monotonic() - started)
+
+    if result is not None:
+        result, _ = normalize_resume(result)
+    if result is not None:
+        result = enrich_resume(result, pre_extract(text))
+    if result is None:
+        yield sse_event("error", {"error": "No valid resume JSON found in the provider response."})
+        return
+    if 'skills' in result:
+        # The candidate skills the provider kept were left out of its own 'skills' section
+        yield sse_event("section", {'section': 'skills', 'index': None, 'value': result['skills']})
+    await run_blocking(get_result_cache().set, cache_key, result, elapsed=time.monotonic() - started)
+    yield sse_event("done", {"cached": False})
+
+
+@require_GET
+async def resume_stream(request):
+    """
+    Streams the structured resume of a user as server-sent events.
+
+    Takes the same query parameters as ResumeAPIView.get. Emits one 'section' event per completed
+    section ({"section": name, "index": item index or null, "value": ...}), then 'done' or 'error'.
+    """
+    user = request.GET.get('user', '')
+    if not USER_ID_RE.match(user):
+        return JsonResponse({"error": "Invalid or missing 'user' parameter."}, status=400)
+    provider = request.GET.get('api', 'deepseek')
+    if provider not in PROVIDERS:
+        return JsonResponse({"error": f"Unknown api '{provider}'."}, status=400)
+
+    with timed('s3_fetch', provider, PROVIDERS[provider]["model"]):
+        text = await run_blocking(read_diary_text, user)
+    if text is None:
+        return JsonResponse({"error": "Input text not found."}, status=404)
+
+    response = StreamingHttpResponse(_resume_events(text, provider), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Tell nginx not to buffer the event stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+_async_generations = None
+_async_generations_lock = threading.Lock()
+
+
+def _get_async_generations():
+    global _async_generations
+    with _async_generations_lock:
+        if _async_generations is None:
+            _async_generations = threading.BoundedSemaphore(settings.RESUME_ASYNC_MAX_GENERATIONS)
+        return _async_generations
+
+
+@require_GET
+async def resume_async(request):
+    """
+    Async version of ResumeAPIView.get (same parameters and responses), mapped to 'resume/' when
+    settings.RESUME_ASYNC_VIEWS is set and served through dagbok/asgi.py.
+
+    S3 and cache calls run on the bounded offload executor and the providers are called with the
+    async client, so a generation waiting on the network holds no thread. Once
+    settings.RESUME_ASYNC_MAX_GENERATIONS generations are in progress in the process, requests that
+    need one are answered 503.
+    """
+    if settings.RESUME_USE_SAMPLE:
+        return JsonResponse(SAMPLE_RESUME)
+    user = request.GET.get('user', '')
+    if not USER_ID_RE.match(user):
+        return JsonResponse({"error": "Invalid or missing 'user' parameter."}, status=400)
+    provider = request.GET.get('api', 'deepseek')
+    if provider not in PROVIDERS:
+        return JsonResponse({"error": f"Unknown api '{provider}'."}, status=400)
+    model = PROVIDERS[provider]["model"]
+
+    try:
+        with timed('s3_fetch', provider, model):
+            freshness = await run_blocking(check_freshness, user, provider)
+        if freshness.diary is None:
+            return JsonResponse({"error": "Input text not found."}, status=404)
+        if freshness.fresh:
+            with timed('serialization', provider, model):
+                return resume_response(request, make_etag(freshness.resume.etag), freshness.data)
+
+        generations = _get_async_generations()
+        if not generations.acquire(blocking=False):
+            response = JsonResponse({"error": "Too many resume generations in progress, try again later."}, status=503)
+            response["Retry-After"] = "5"
+            return response
+        try:
+            with timed('s3_fetch', provider, model):
+                text = await run_blocking(read_object_text, diary_key(user), freshness.diary)
+            structured, answered_by = await ResumeAPIView().astructure(text, provider)
+            if structured is None:
+                return JsonResponse({"error": "Failed to process resume text."}, status=502)
+            etag = make_etag(
+                await run_blocking(write_resume_json, user, structured, freshness.diary, answered_by, provider)
+            )
+        finally:
+            generations.release()
+        with timed('serialization', provider, model):
+            return resume_response(request, etag, structured)
+    except ObjectChangedError as e:
+        logger.info("%s", e)
+        return JsonResponse({"error": DIARY_CHANGED_ERROR}, status=409)
+    except Exception as e:
+        logger.exception("Error in resume_async: %s", e)
+        return JsonResponse({"error": f"Internal server error: {str(e)}"}, status=500)
+
+
+@require_GET
+def metrics_view(request):
+    """Exposes the per-stage latency histograms, provider call counters and cache counters to Prometheus."""
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,12 @@
+"""
+End-to-end load benchmark of the resume endpoints, with local stand-ins for the external services.
+
+Modules:
+    stub_provider: OpenAI-compatible chat-completions server with configurable latency, errors and streaming.
+    stub_s3: In-memory server implementing the subset of the S3 REST API used by api/storage.py.
+    run_load: Starts both stubs and the Django app, drives it at increasing concurrency and reports
+        req/s, latency percentiles and memory per worker.
+
+Usage (from backend/):
+    $ python -m bench.run_load --levels 1,4,16,32 --requests 200 --latency 0.8
+"""
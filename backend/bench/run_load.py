@@ -0,0 +1,260 @@
+"""
+Drives the Django app at increasing concurrency against local stand-ins for the providers and S3.
+
+Starts bench.stub_provider and bench.stub_s3 in this process, seeds one diary per simulated user,
+launches the app under gunicorn (WSGI, or ASGI with --server gunicorn-asgi for the streaming view and,
+with --async-views, the async resume view; or `manage.py runserver` with --server runserver) pointed at the stubs through DEEPSEEK_API_URL,
+OPENAI_API_URL and AWS_S3_ENDPOINT_URL, then sends --requests
+requests at every concurrency level and reports req/s, p50/p95/p99 latency, errors, S3 requests and
+bytes per request and the resident memory of every server worker. --json writes the results so runs can be compared over time.
+
+Requests cycle over --users distinct diaries, so with the default in-memory result cache the first
+request of every user reaches the stub provider and the following ones are cache hits; pass
+--cache-backend none to measure the uncached path.
+
+Usage (from backend/):
+    $ python -m bench.run_load --levels 1,4,16,32 --requests 200 --latency 0.8 --workers 4
+    $ python -m bench.run_load --cache-backend none --error-rate 0.05 --json before.json
+    $ python -m bench.run_load --server gunicorn-asgi --async-views --workers 1 --levels 50,200 --users 400
+"""
+import os
+import sys
+import json
+import math
+import time
+import socket
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench import stub_provider, stub_s3
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+BUCKET = 'dagbok-bench'
+PREFIX = 'users/'
+
+
+def percentile(sorted_values, fraction):
+    """Returns the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_in_thread(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def make_diary(index, chars):
+    """Returns a diary of about `chars` characters, distinct for every user index."""
+    lines = []
+    day = 0
+    while sum(len(line) for line in lines) < chars:
+        day += 1
+        lines.append(
+            f"2024-{1 + day // 28 % 12:02d}-{1 + day % 28:02d} User {index} worked on service {day} "
+            f"with Python and Django, reviewed pull requests and improved query latency.\n"
+        )
+    return ''.join(lines)
+
+
+def rss_kib(pid):
+    """Returns the resident set size of a process in KiB, or None where /proc is not available."""
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def worker_pids(parent_pid):
+    """Returns the server process and its children (the gunicorn workers)."""
+    pids = [parent_pid]
+    try:
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                with open(f'/proc/{entry}/stat') as stat:
+                    # The process name may contain spaces; the fields after it are fixed
+                    ppid = int(stat.read().rsplit(')', 1)[1].split()[1])
+                if ppid == parent_pid:
+                    pids.append(int(entry))
+    except OSError:
+        pass
+    return pids
+
+
+def start_app(args, port, provider_url, s3_url):
+    env = {
+        **os.environ,
+        'DEEPSEEK_API_URL': f"{provider_url}/v1/chat/completions",
+        'OPENAI_API_URL': f"{provider_url}/v1/chat/completions",
+        'DEEPSEEK_API_KEY': 'bench',
+        'OPENAI_API_KEY': 'bench',
+        'AWS_S3_ENDPOINT_URL': s3_url,
+        'AWS_STORAGE_BUCKET_NAME': BUCKET,
+        'AWS_S3_REGION_NAME': 'us-east-1',
+        'AWS_ACCESS_KEY_ID': 'bench',
+        'AWS_SECRET_ACCESS_KEY': 'bench',
+        'RESUME_S3_PREFIX': PREFIX,
+        'RESUME_USE_SAMPLE': 'False',
+        'RESUME_CACHE_BACKEND': args.cache_backend,
+        'API_LOG_LEVEL': 'WARNING',
+        'RESUME_ASYNC_VIEWS': str(args.async_views),
+    }
+    if args.server == 'gunicorn':
+        command = [
+            sys.executable, '-m', 'gunicorn', 'dagbok.wsgi:application',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers), '--threads', str(args.threads),
+            '--timeout', '120', '--log-level', 'warning',
+        ]
+    elif args.server == 'gunicorn-asgi':
+        # Needed for the async views (e.g. --path /resume/stream/)
+        command = [
+            sys.executable, '-m', 'gunicorn', 'dagbok.asgi:application', '-k', 'uvicorn.workers.UvicornWorker',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers), '--timeout', '120', '--log-level', 'warning',
+        ]
+    else:
+        command = [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload']
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"The app exited with status {process.returncode}")
+        try:
+            requests.get(f"http://127.0.0.1:{port}/metrics/", timeout=1)
+            return process
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("The app did not start within 60s")
+
+
+def run_level(base_url, args, concurrency, s3_server):
+    """Sends args.requests requests with `concurrency` clients and returns the measurements."""
+    counter = iter(range(args.requests))
+    counter_lock = threading.Lock()
+    latencies = []
+    statuses = {}
+    results_lock = threading.Lock()
+
+    def client():
+        session = requests.Session()
+        while True:
+            with counter_lock:
+                index = next(counter, None)
+            if index is None:
+                return
+            url = f"{base_url}{args.path}?user=bench{index % args.users}&api={args.api}"
+            started = time.perf_counter()
+            try:
+                code = session.get(url, timeout=args.timeout).status_code
+            except requests.exceptions.RequestException:
+                code = 'exception'
+            elapsed = time.perf_counter() - started
+            with results_lock:
+                latencies.append(elapsed)
+                statuses[code] = statuses.get(code, 0) + 1
+
+    s3_before = dict(s3_server.stats)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for _ in range(concurrency):
+            executor.submit(client)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    count = max(1, len(latencies))
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'errors': sum(n for code, n in statuses.items() if code != 200),
+        'statuses': {str(code): n for code, n in statuses.items()},
+        's3_requests_per_request': round((s3_server.stats['requests'] - s3_before['requests']) / count, 2),
+        's3_bytes_per_request': round((s3_server.stats['bytes_sent'] - s3_before['bytes_sent']) / count),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--levels', default='1,4,16,32', help="Comma-separated concurrency levels.")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per concurrency level.")
+    parser.add_argument('--users', type=int, default=50, help="Distinct diaries the requests cycle over.")
+    parser.add_argument('--diary-chars', type=int, default=4000, help="Approximate size of every diary.")
+    parser.add_argument('--path', default='/resume/')
+    parser.add_argument('--api', default='deepseek')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--server', choices=('gunicorn', 'gunicorn-asgi', 'runserver'), default='gunicorn')
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn worker processes.")
+    parser.add_argument('--threads', type=int, default=8, help="gunicorn threads per worker.")
+    parser.add_argument('--async-views', action='store_true', help="Serve /resume/ with the async view (ASGI).")
+    parser.add_argument('--cache-backend', default='memory', help="RESUME_CACHE_BACKEND of the app.")
+    parser.add_argument('--latency', type=float, default=0.5, help="Mean stub provider latency (s).")
+    parser.add_argument('--jitter', type=float, default=0.1, help="Stub provider latency deviation (s).")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of failing provider calls.")
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--json', default=None, help="Write the results to this file.")
+    args = parser.parse_args()
+
+    provider_server = stub_provider.make_server(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, error_status=args.error_status
+    )
+    s3_server = stub_s3.make_server()
+    for index in range(args.users):
+        s3_server.store.put(BUCKET, f"{PREFIX}bench{index}/diary.txt", make_diary(index, args.diary_chars).encode('utf-8'))
+    provider_url = start_in_thread(provider_server)
+    s3_url = start_in_thread(s3_server)
+
+    port = free_port()
+    app = start_app(args, port, provider_url, s3_url)
+    base_url = f"http://127.0.0.1:{port}"
+    results = []
+    try:
+        print(
+            f"{'conc':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} "
+            f"{'s3 req':>7} {'s3 bytes':>9}  RSS per process (MiB)"
+        )
+        for concurrency in [int(level) for level in args.levels.split(',')]:
+            result = run_level(base_url, args, concurrency, s3_server)
+            result['rss_mib'] = [
+                round(kib / 1024, 1) for kib in (rss_kib(pid) for pid in worker_pids(app.pid)) if kib is not None
+            ]
+            results.append(result)
+            print(
+                f"{concurrency:>5} {result['rps']:>8} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+                f"{result['p99_ms']:>9} {result['errors']:>7} {result['s3_requests_per_request']:>7} "
+                f"{result['s3_bytes_per_request']:>9}  {result['rss_mib']}"
+            )
+    finally:
+        app.terminate()
+        app.wait(timeout=30)
+        provider_server.shutdown()
+        s3_server.shutdown()
+
+    if args.json:
+        run = {'args': vars(args), 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'levels': results}
+        Path(args.json).write_text(json.dumps(run, indent=2))
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Local stand-in for the DeepSeek/OpenAI chat-completions API.
+
+Answers every POST with a resume JSON wrapped in a Markdown code fence (like the real providers do),
+after a configurable latency. A share of the requests can fail with a configurable status code, and
+requests sent with "stream": true are answered as server-sent events split into several deltas.
+
+Classes:
+    StubProviderHandler: Request handler; its behaviour is read from the server's `config`.
+
+Functions:
+    make_server(host, port, **config): Returns a ThreadingHTTPServer ready to serve_forever().
+
+Usage:
+    $ python -m bench.stub_provider --port 8101 --latency 0.8 --jitter 0.2 --error-rate 0.05
+"""
+import json
+import time
+import random
+import hashlib
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_CONFIG = {
+    'latency': 0.5,
+    'jitter': 0.1,
+    'error_rate': 0.0,
+    'error_status': 503,
+    'stream_chunks': 20,
+}
+
+
+def build_resume(prompt):
+    """Returns a deterministic resume for a prompt, so identical prompts get identical answers."""
+    digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+    return {
+        "title": f"Software Engineer {digest[:6]}",
+        "summary": {"professional_summary": "Engineer with experience in backend services and data pipelines."},
+        "education": {"Example University": "BSc in Computer Science"},
+        "experience": [
+            {
+                "company": "Example Corp",
+                "role": "Backend Developer",
+                "timeline": "2021 - Present",
+                "description": "Builds and operates the company's APIs.",
+                "highlights": ["Cut p95 latency by 40%", f"Shipped feature {digest[6:12]}"],
+            }
+        ],
+        "skills": ["Python", "Django", "PostgreSQL", "AWS"],
+        "additional_information": {"languages": ["English", "Portuguese"]},
+    }
+
+
+class StubProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        config = self.server.config
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        payload = json.loads(body or b'{}')
+        messages = payload.get('messages') or [{}]
+
+        delay = max(0.0, random.gauss(config['latency'], config['jitter']))
+        if random.random() < config['error_rate']:
+            time.sleep(delay / 4)
+            self._send_json(config['error_status'], {"error": {"message": "stub provider error"}}, retry_after=1)
+            return
+
+        content = "```json\n" + json.dumps(build_resume(messages[-1].get('content', '')), indent=2) + "\n```"
+        if payload.get('stream'):
+            self._send_stream(content, delay, config['stream_chunks'])
+            return
+        time.sleep(delay)
+        self._send_json(200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "model": payload.get('model', 'stub'),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(body) // 4, "completion_tokens": len(content) // 4},
+        })
+
+    def _send_json(self, status, data, retry_after=None):
+        encoded = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(encoded)))
+        if retry_after is not None and status in (429, 503):
+            self.send_header('Retry-After', str(retry_after))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def _send_stream(self, content, delay, chunks):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        # No Content-Length: the end of the stream is the end of the connection
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        size = max(1, len(content) // chunks)
+        pieces = [content[i:i + size] for i in range(0, len(content), size)]
+        for piece in pieces:
+            time.sleep(delay / len(pieces))
+            event = {"choices": [{"index": 0, "delta": {"content": piece}}]}
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    # The default listen backlog (5) resets connections when hundreds of requests arrive at once
+    request_queue_size = 1024
+
+
+def make_server(host='127.0.0.1', port=0, **config):
+    """
+    Creates the stub server (port 0 picks a free port, see server.server_address).
+
+    Args:
+        latency (float): Mean response time in seconds.
+        jitter (float): Standard deviation of the response time.
+        error_rate (float): Share of requests answered with error_status.
+        error_status (int): Status code of the failed requests (e.g. 429 or 503).
+        stream_chunks (int): Number of deltas of a streamed answer.
+    """
+    server = StubHTTPServer((host, port), StubProviderHandler)
+    server.daemon_threads = True
+    server.config = {**DEFAULT_CONFIG, **config}
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8101)
+    parser.add_argument('--latency', type=float, default=DEFAULT_CONFIG['latency'])
+    parser.add_argument('--jitter', type=float, default=DEFAULT_CONFIG['jitter'])
+    parser.add_argument('--error-rate', type=float, default=DEFAULT_CONFIG['error_rate'])
+    parser.add_argument('--error-status', type=int, default=DEFAULT_CONFIG['error_status'])
+    parser.add_argument('--stream-chunks', type=int, default=DEFAULT_CONFIG['stream_chunks'])
+    args = parser.parse_args()
+    server = make_server(
+        args.host, args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        error_status=args.error_status, stream_chunks=args.stream_chunks,
+    )
+    print(f"Stub provider listening on http://{args.host}:{server.server_address[1]}/v1/chat/completions")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+"""
+In-memory stand-in for the S3 REST API, covering what the app uses through boto3.
+
+Implements path-style GetObject, HeadObject, PutObject, DeleteObject and ListObjectsV2 (set
+AWS_S3_ENDPOINT_URL to its address). Buckets are created on first use and requests are not
+authenticated. User metadata (x-amz-meta-*), conditional requests (If-Match, If-None-Match,
+If-Modified-Since) and Range reads are honoured so the app's freshness checks behave as against S3.
+The server counts the requests it answered and the body bytes it sent in `stats`.
+
+Classes:
+    ObjectStore: Thread-safe {(bucket, key): object} store.
+    StubS3Handler: Request handler serving the server's `store`.
+
+Functions:
+    make_server(host, port, store): Returns a ThreadingHTTPServer ready to serve_forever().
+
+Usage:
+    $ python -m bench.stub_s3 --port 8102
+"""
+import time
+import hashlib
+import argparse
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+
+class ObjectStore:
+    def __init__(self):
+        self._objects = {}
+        self._lock = threading.Lock()
+
+    def put(self, bucket, key, body, content_type='binary/octet-stream', metadata=None):
+        """Stores body and returns its ETag."""
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        with self._lock:
+            self._objects[(bucket, key)] = {
+                'body': body,
+                'etag': etag,
+                'last_modified': time.time(),
+                'content_type': content_type,
+                'metadata': dict(metadata or {}),
+            }
+        return etag
+
+    def get(self, bucket, key):
+        with self._lock:
+            return self._objects.get((bucket, key))
+
+    def delete(self, bucket, key):
+        with self._lock:
+            self._objects.pop((bucket, key), None)
+
+    def list(self, bucket, prefix=''):
+        """Returns the (key, object) pairs of bucket under prefix, sorted by key."""
+        with self._lock:
+            items = [(k, o) for (b, k), o in self._objects.items() if b == bucket and k.startswith(prefix)]
+        return sorted(items, key=lambda item: item[0])
+
+
+def _decode_aws_chunked(body):
+    """Decodes a body sent with Content-Encoding: aws-chunked (checksum trailers are dropped)."""
+    data = b''
+    while body:
+        header, _, body = body.partition(b'\r\n')
+        size = int(header.split(b';')[0], 16)
+        if size == 0:
+            break
+        data += body[:size]
+        body = body[size + 2:]
+    return data
+
+
+class StubS3Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _target(self):
+        url = urlsplit(self.path)
+        bucket, _, key = url.path.lstrip('/').partition('/')
+        return unquote(bucket), unquote(key), parse_qs(url.query)
+
+    def _read_body(self):
+        if 'chunked' in self.headers.get('Transfer-Encoding', ''):
+            body = b''
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        else:
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if 'aws-chunked' in self.headers.get('Content-Encoding', ''):
+            body = _decode_aws_chunked(body)
+        return body
+
+    def _send(self, status, body=b'', headers=None, head=False):
+        with self.server.stats_lock:
+            self.server.stats['requests'] += 1
+            self.server.stats['bytes_sent'] += 0 if head else len(body)
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def _send_error(self, status, code, head=False):
+        body = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code><Message>{code}</Message></Error>'
+        self._send(status, body.encode('utf-8'), {'Content-Type': 'application/xml'}, head=head)
+
+    def _object_headers(self, obj):
+        headers = {
+            'ETag': obj['etag'],
+            'Last-Modified': formatdate(obj['last_modified'], usegmt=True),
+            'Content-Type': obj['content_type'],
+            'Accept-Ranges': 'bytes',
+        }
+        for name, value in obj['metadata'].items():
+            headers[f'x-amz-meta-{name}'] = value
+        return headers
+
+    def _not_modified(self, obj):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return if_none_match == obj['etag']
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return int(obj['last_modified']) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _get_object(self, head):
+        bucket, key, query = self._target()
+        if not key:
+            if 'list-type' in query:
+                self._list_objects(bucket, query)
+            else:
+                self._send_error(400, 'InvalidRequest', head=head)
+            return
+        obj = self.server.store.get(bucket, key)
+        if obj is None:
+            self._send_error(404, 'NoSuchKey', head=head)
+            return
+        headers = self._object_headers(obj)
+        if_match = self.headers.get('If-Match')
+        if if_match is not None and if_match != obj['etag']:
+            self._send_error(412, 'PreconditionFailed', head=head)
+            return
+        if self._not_modified(obj):
+            self._send(304, headers=headers, head=True)
+            return
+        body = obj['body']
+        range_header = self.headers.get('Range', '')
+        if range_header.startswith('bytes=') and body:
+            start, _, end = range_header[len('bytes='):].partition('-')
+            if start:
+                first, last = int(start), int(end) if end else len(body) - 1
+            else:
+                first, last = max(0, len(body) - int(end)), len(body) - 1
+            last = min(last, len(body) - 1)
+            headers['Content-Range'] = f"bytes {first}-{last}/{len(body)}"
+            self._send(206, body[first:last + 1], headers, head=head)
+            return
+        self._send(200, body, headers, head=head)
+
+    def _list_objects(self, bucket, query):
+        prefix = query.get('prefix', [''])[0]
+        max_keys = int(query.get('max-keys', ['1000'])[0])
+        after = query.get('continuation-token', query.get('start-after', ['']))[0]
+        items = [(key, obj) for key, obj in self.server.store.list(bucket, prefix) if key > after]
+        page, truncated = items[:max_keys], len(items) > max_keys
+        contents = ''.join(
+            f"<Contents><Key>{escape(key)}</Key><LastModified>"
+            f"{time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(obj['last_modified']))}</LastModified>"
+            f"<ETag>{escape(obj['etag'])}</ETag><Size>{len(obj['body'])}</Size>"
+            f"<StorageClass>STANDARD</StorageClass></Contents>"
+            for key, obj in page
+        )
+        next_token = f"<NextContinuationToken>{escape(page[-1][0])}</NextContinuationToken>" if truncated else ''
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            f"<Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(page)}</KeyCount>"
+            f"<MaxKeys>{max_keys}</MaxKeys><IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"
+            f"{next_token}{contents}</ListBucketResult>"
+        )
+        self._send(200, body.encode('utf-8'), {'Content-Type': 'application/xml'})
+
+    def do_GET(self):
+        self._get_object(head=False)
+
+    def do_HEAD(self):
+        self._get_object(head=True)
+
+    def do_PUT(self):
+        bucket, key, _ = self._target()
+        body = self._read_body()
+        metadata = {
+            name[len('x-amz-meta-'):].lower(): value
+            for name, value in self.headers.items() if name.lower().startswith('x-amz-meta-')
+        }
+        etag = self.server.store.put(
+            bucket, key, body, self.headers.get('Content-Type', 'binary/octet-stream'), metadata
+        )
+        self._send(200, headers={'ETag': etag})
+
+    def do_DELETE(self):
+        bucket, key, _ = self._target()
+        self.server.store.delete(bucket, key)
+        self._send(204)
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    # The default listen backlog (5) resets connections when hundreds of requests arrive at once
+    request_queue_size = 1024
+
+
+def make_server(host='127.0.0.1', port=0, store=None):
+    """Creates the stub server (port 0 picks a free port, see server.server_address)."""
+    server = StubHTTPServer((host, port), StubS3Handler)
+    server.daemon_threads = True
+    server.store = store if store is not None else ObjectStore()
+    server.stats = {'requests': 0, 'bytes_sent': 0}
+    server.stats_lock = threading.Lock()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8102)
+    args = parser.parse_args()
+    server = make_server(args.host, args.port)
+    print(f"Stub S3 listening on http://{args.host}:{server.server_address[1]}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,12 @@ ASGI config for dagbok project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server to use the async streaming endpoint ('resume/stream/') and, with
+RESUME_ASYNC_VIEWS=True, the async 'resume/' view whose generations hold no thread while they wait on
+the provider, e.g.:
+
+    RESUME_ASYNC_VIEWS=True gunicorn dagbok.asgi:application -k uvicorn.workers.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
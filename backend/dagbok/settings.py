@@ -18,7 +18,8 @@ Attributes:
     ROOT_URLCONF (str): The root URL configuration module for the Django project.
     TEMPLATES (list): List of template configurations for the Django project.
     WSGI_APPLICATION (str): The WSGI application module for the Django project.
-    DATABASES (dict): Database configurations for the Django project.
+    DATABASES (dict): Database configurations for the Django project: PostgreSQL when POSTGRES_DB is set
+        (production), SQLite at SQLITE_PATH otherwise.
     AUTH_PASSWORD_VALIDATORS (list): List of password validators for the Django project.
     LANGUAGE_CODE (str): The language code for the Django project.
     TIME_ZONE (str): The time zone for the Django project.
@@ -28,12 +29,71 @@ Attributes:
     AWS_SECRET_ACCESS_KEY (str): AWS secret access key for S3, loaded from environment variables.
     AWS_STORAGE_BUCKET_NAME (str): AWS S3 bucket name for static files, loaded from environment variables.
     AWS_S3_REGION_NAME (str): AWS S3 region name for static files, loaded from environment variables.
+    AWS_S3_ENDPOINT_URL (str): Custom S3 endpoint (e.g. the local stand-in of backend/bench), or None for AWS.
     STATICFILES_STORAGE (str): Storage backend for static files.
     STATIC_URL (str): URL for serving static files.
+    RESUME_USE_SAMPLE (bool): Serve the fixed sample resume instead of processing S3 text.
+    RESUME_S3_PREFIX (str): S3 prefix holding one '<user>/diary.txt' object per user.
+    RESUME_FRESHNESS_TTL (float): Seconds a "resume.json is up to date" decision is reused without S3 requests.
+    RESUME_FRESHNESS_MAX_ENTRIES (int): Maximum users whose freshness decision is memoized per process.
+    RESUME_S3_RANGE_SIZE (int): Objects larger than this are downloaded as concurrent ranges of this size.
+    RESUME_VARIANT_CACHE_BYTES (int): Size bound of the serialized/compressed resume bodies kept per process.
+    RESUME_MICROCACHE_SECONDS (int): X-Accel-Expires of resume responses (nginx micro-cache), 0 to disable.
+    RESUME_PROVIDER_TIMEOUT (float): Default timeout in seconds of a provider request.
+    RESUME_PROVIDER_POOL_SIZE (int): Keep-alive connections kept per AI provider.
+    RESUME_PROVIDER_MAX_RETRIES (int): Retries of a provider call on 429/5xx/connection errors.
+    RESUME_PROVIDER_BACKOFF_BASE (float): Base delay in seconds of the jittered exponential backoff.
+    RESUME_PROVIDER_BACKOFF_MAX (float): Maximum backoff delay in seconds.
+    RESUME_CIRCUIT_FAILURES (int): Consecutive failures that open a provider's circuit breaker.
+    RESUME_CIRCUIT_RESET (float): Seconds an open circuit waits before letting a trial call through.
+    RESUME_PROVIDER_FALLBACK (bool): Try the other provider when the requested one fails (off by default, as it
+        sends the diary to a second provider); results are cached and recorded under the provider that answered.
+    RESUME_HEDGE_AFTER (float): Seconds after which the other provider is also called (0 disables hedging).
+        Hedged calls go to the fallback providers, so it only takes effect with RESUME_PROVIDER_FALLBACK
+        (manage.py warns otherwise, check api.W001).
+    RESUME_HEDGE_WORKERS (int): Threads available for fallback/hedged provider calls.
+    RESUME_PROVIDER_PRICES (dict): Per-model [input, cached input, output] USD per million tokens overriding
+        the list prices of api/prompts.py (JSON, e.g. '{"deepseek-chat": [0.28, 0.028, 0.42]}').
+    RESUME_ASYNC_VIEWS (bool): Serve 'resume/' with the async view (run under dagbok/asgi.py).
+    RESUME_ASYNC_PROVIDER_CONNECTIONS (int): Concurrent requests per AI provider and event loop of the async client.
+    RESUME_ASYNC_OFFLOAD_WORKERS (int): Threads running the blocking calls (S3, cache, database) of async views.
+    RESUME_ASYNC_MAX_GENERATIONS (int): Generations in progress per process beyond which async requests get 503.
+    RESUME_CHUNK_TOKENS (int): Estimated token budget of the text sent in one provider call.
+    RESUME_CHUNK_WORKERS (int): Concurrent provider calls when a long diary is processed in chunks.
+    RESUME_JOB_EXECUTOR (str): Executor of resume jobs ('thread', 'process' or 'none' for run_resume_jobs).
+    RESUME_JOB_WORKERS (int): Number of workers of the resume job executor.
+    RESUME_JOB_MAX_PENDING (int): Maximum number of in-flight jobs before new jobs are rejected with 503.
+    RESUME_JOB_DEADLINE (int): Seconds after submission by which a resume job must finish.
+    RESUME_JOB_LEASE (int): Seconds after which a job still 'running' is considered abandoned by its worker
+        and is requeued (or expired once past its deadline); must exceed the longest legitimate run.
+    RESUME_CACHE_BACKEND (str): Provider result cache backend ('memory', 'disk', 's3' or 'none').
+    RESUME_SINGLEFLIGHT_LEASE (bool): Coalesce generations across processes with a database lease
+        (useful with a shared 'disk' or 's3' result cache).
+    RESUME_SINGLEFLIGHT_LEASE_TTL (float): Seconds a lease is held before other processes may take it over.
+    RESUME_SINGLEFLIGHT_POLL (float): Seconds between result cache checks while another process holds the lease.
+    RESUME_DEDUP (bool): Collapse near-duplicate diary entries before prompting (see api/dedup.py).
+    RESUME_DEDUP_MAX_DISTANCE (int): Maximum SimHash bit distance between two entries considered duplicates.
+    RESUME_TAILOR_TOP_K (int): Default number of experience items and of skills sent in a tailoring prompt.
+    RESUME_TAILOR_INDEX_ENTRIES (int): Maximum resume versions whose BM25 index is kept per process.
+    RESUME_PDF_EXECUTOR (str): Pool rendering PDF exports ('thread' or 'process').
+    RESUME_PDF_WORKERS (int): Number of workers of the PDF render pool.
+    RESUME_PDF_MAX_PENDING (int): Maximum number of in-flight renders before new exports are rejected with 503.
+    RESUME_PDF_TIMEOUT (float): Seconds an export waits for its render.
+    RESUME_PDF_CACHE_BACKEND (str): Rendered PDF cache backend ('disk', 's3', 'memory' or 'none').
+    RESUME_PDF_CACHE_DIR (str): Directory used by the 'disk' PDF cache backend.
+    RESUME_PDF_CACHE_S3_PREFIX (str): S3 prefix used by the 's3' PDF cache backend.
+    RESUME_PDF_CACHE_MAX_BYTES (int): Size limit of the 'memory' PDF cache backend.
+    RESUME_CACHE_MAX_BYTES (int): Size limit of the in-process LRU result cache.
+    RESUME_CACHE_DIR (str): Directory used by the 'disk' result cache backend.
+    RESUME_CACHE_S3_PREFIX (str): S3 prefix used by the 's3' result cache backend.
     DEFAULT_AUTO_FIELD (str): Default primary key field type for models.
+    LOGGING (dict): JSON structured logging of the 'api' logger (level API_LOG_LEVEL).
+    API_LOG_SAMPLE_RATE (float): Fraction of raw provider payloads written to the debug log.
+    API_LOG_PAYLOAD_CHARS (int): Maximum logged characters of a sampled payload.
 """
 from dotenv import load_dotenv  # Importe load_dotenv
 import os
+import json
 
 # Carregue as variáveis de ambiente do arquivo .env
 load_dotenv()
@@ -114,11 +174,27 @@ WSGI_APPLICATION = 'dagbok.wsgi.application'
 
 
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.dummy'
+if os.getenv('POSTGRES_DB'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB'),
+            'USER': os.getenv('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+            'PORT': os.getenv('POSTGRES_PORT', '5432'),
+            # Reuse connections across requests instead of reconnecting every time
+            'CONN_MAX_AGE': int(os.getenv('POSTGRES_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', str(BASE_DIR / 'db.sqlite3')),
+        }
     }
-}
 
 
 # Password validation
@@ -160,11 +236,97 @@ AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
 AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 AWS_STORAGE_BUCKET_NAME = os.getenv('AWS_STORAGE_BUCKET_NAME')
 AWS_S3_REGION_NAME = os.getenv('AWS_S3_REGION_NAME')
+AWS_S3_ENDPOINT_URL = os.getenv('AWS_S3_ENDPOINT_URL') or None
 
 STATICFILES_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 STATIC_URL = f'https://{AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com/static/'
 
+# Resume generation
+RESUME_USE_SAMPLE = os.getenv('RESUME_USE_SAMPLE', 'False') == 'True'
+RESUME_S3_PREFIX = os.getenv('RESUME_S3_PREFIX', 'users/')
+RESUME_FRESHNESS_TTL = float(os.getenv('RESUME_FRESHNESS_TTL', '30'))
+RESUME_FRESHNESS_MAX_ENTRIES = int(os.getenv('RESUME_FRESHNESS_MAX_ENTRIES', '1024'))
+RESUME_S3_RANGE_SIZE = int(os.getenv('RESUME_S3_RANGE_SIZE', str(8 * 1024 * 1024)))
+RESUME_VARIANT_CACHE_BYTES = int(os.getenv('RESUME_VARIANT_CACHE_BYTES', str(16 * 1024 * 1024)))
+RESUME_MICROCACHE_SECONDS = int(os.getenv('RESUME_MICROCACHE_SECONDS', '5'))
+RESUME_PROVIDER_TIMEOUT = float(os.getenv('RESUME_PROVIDER_TIMEOUT', '3000'))
+
+# AI provider client (see api/providers.py)
+RESUME_PROVIDER_POOL_SIZE = int(os.getenv('RESUME_PROVIDER_POOL_SIZE', '10'))
+RESUME_PROVIDER_MAX_RETRIES = int(os.getenv('RESUME_PROVIDER_MAX_RETRIES', '3'))
+RESUME_PROVIDER_BACKOFF_BASE = float(os.getenv('RESUME_PROVIDER_BACKOFF_BASE', '0.5'))
+RESUME_PROVIDER_BACKOFF_MAX = float(os.getenv('RESUME_PROVIDER_BACKOFF_MAX', '30'))
+RESUME_CIRCUIT_FAILURES = int(os.getenv('RESUME_CIRCUIT_FAILURES', '5'))
+RESUME_CIRCUIT_RESET = float(os.getenv('RESUME_CIRCUIT_RESET', '30'))
+RESUME_PROVIDER_FALLBACK = os.getenv('RESUME_PROVIDER_FALLBACK', 'False') == 'True'
+RESUME_HEDGE_AFTER = float(os.getenv('RESUME_HEDGE_AFTER', '0'))
+RESUME_HEDGE_WORKERS = int(os.getenv('RESUME_HEDGE_WORKERS', '16'))
+# Prices used for the per-template cost metrics (see api/prompts.py)
+RESUME_PROVIDER_PRICES = json.loads(os.getenv('RESUME_PROVIDER_PRICES', '{}'))
+
+# Async resume view and provider client (see api/offload.py and api/providers.py)
+RESUME_ASYNC_VIEWS = os.getenv('RESUME_ASYNC_VIEWS', 'False') == 'True'
+RESUME_ASYNC_PROVIDER_CONNECTIONS = int(os.getenv('RESUME_ASYNC_PROVIDER_CONNECTIONS', '200'))
+RESUME_ASYNC_OFFLOAD_WORKERS = int(os.getenv('RESUME_ASYNC_OFFLOAD_WORKERS', '32'))
+RESUME_ASYNC_MAX_GENERATIONS = int(os.getenv('RESUME_ASYNC_MAX_GENERATIONS', '500'))
+
+# Diaries above RESUME_CHUNK_TOKENS are processed in chunks (see api/chunking.py)
+RESUME_CHUNK_TOKENS = int(os.getenv('RESUME_CHUNK_TOKENS', '6000'))
+RESUME_CHUNK_WORKERS = int(os.getenv('RESUME_CHUNK_WORKERS', '4'))
+
+# Asynchronous resume jobs (see api/jobs.py)
+RESUME_JOB_EXECUTOR = os.getenv('RESUME_JOB_EXECUTOR', 'thread')
+RESUME_JOB_WORKERS = int(os.getenv('RESUME_JOB_WORKERS', '4'))
+RESUME_JOB_MAX_PENDING = int(os.getenv('RESUME_JOB_MAX_PENDING', '32'))
+RESUME_JOB_DEADLINE = int(os.getenv('RESUME_JOB_DEADLINE', '600'))
+RESUME_JOB_LEASE = int(os.getenv('RESUME_JOB_LEASE', str(RESUME_JOB_DEADLINE + 60)))
+
+# Cache of structured resumes returned by the AI providers
+RESUME_CACHE_BACKEND = os.getenv('RESUME_CACHE_BACKEND', 'memory')
+RESUME_CACHE_MAX_BYTES = int(os.getenv('RESUME_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+RESUME_CACHE_DIR = os.getenv('RESUME_CACHE_DIR', str(BASE_DIR / '.cache' / 'resumes'))
+RESUME_CACHE_S3_PREFIX = os.getenv('RESUME_CACHE_S3_PREFIX', 'cache/resumes/')
+RESUME_SINGLEFLIGHT_LEASE = os.getenv('RESUME_SINGLEFLIGHT_LEASE', 'False') == 'True'
+RESUME_SINGLEFLIGHT_LEASE_TTL = float(os.getenv('RESUME_SINGLEFLIGHT_LEASE_TTL', '300'))
+RESUME_SINGLEFLIGHT_POLL = float(os.getenv('RESUME_SINGLEFLIGHT_POLL', '0.5'))
+
+# Near-duplicate diary entries collapsed before prompting (see api/dedup.py)
+RESUME_DEDUP = os.getenv('RESUME_DEDUP', 'True') == 'True'
+RESUME_DEDUP_MAX_DISTANCE = int(os.getenv('RESUME_DEDUP_MAX_DISTANCE', '3'))
+
+# Tailoring to a job description (see api/tailoring.py)
+RESUME_TAILOR_TOP_K = int(os.getenv('RESUME_TAILOR_TOP_K', '8'))
+RESUME_TAILOR_INDEX_ENTRIES = int(os.getenv('RESUME_TAILOR_INDEX_ENTRIES', '256'))
+
+# PDF export, rendered on a bounded pool and cached per (version, template, locale) (see api/pdf.py)
+RESUME_PDF_EXECUTOR = os.getenv('RESUME_PDF_EXECUTOR', 'thread')
+RESUME_PDF_WORKERS = int(os.getenv('RESUME_PDF_WORKERS', '2'))
+RESUME_PDF_MAX_PENDING = int(os.getenv('RESUME_PDF_MAX_PENDING', '16'))
+RESUME_PDF_TIMEOUT = float(os.getenv('RESUME_PDF_TIMEOUT', '30'))
+RESUME_PDF_CACHE_BACKEND = os.getenv('RESUME_PDF_CACHE_BACKEND', 'disk')
+RESUME_PDF_CACHE_DIR = os.getenv('RESUME_PDF_CACHE_DIR', str(BASE_DIR / '.cache' / 'pdf'))
+RESUME_PDF_CACHE_S3_PREFIX = os.getenv('RESUME_PDF_CACHE_S3_PREFIX', 'cache/pdf/')
+RESUME_PDF_CACHE_MAX_BYTES = int(os.getenv('RESUME_PDF_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Logging: one JSON object per line; raw provider payloads are only logged for a sample of calls
+API_LOG_SAMPLE_RATE = float(os.getenv('API_LOG_SAMPLE_RATE', '0.01'))
+API_LOG_PAYLOAD_CHARS = int(os.getenv('API_LOG_PAYLOAD_CHARS', '2000'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'api.log.JsonFormatter'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'json'},
+    },
+    'loggers': {
+        'api': {'handlers': ['console'], 'level': os.getenv('API_LOG_LEVEL', 'INFO'), 'propagate': False},
+    },
+}
@@ -8,15 +8,67 @@ This module defines the URL patterns for the dagbok application, mapping the
 'resume/' URL to the ResumeAPIView.
 
 Routes:
-    - 'resume/': Maps to ResumeAPIView.as_view(), accessible with the name 'resume'.
+    - 'resume/': Maps to ResumeAPIView.as_view(), or to the async resume_async view when
+      settings.RESUME_ASYNC_VIEWS is set, accessible with the name 'resume'.
+    - 'resume/regenerate/': Maps to ResumeRegenerateAPIView.as_view(), accessible with the name 'resume-regenerate'.
+    - 'diary/entries/': Maps to DiaryEntryAPIView.as_view(), accessible with the name 'diary-entries'.
+    - 'diary/search/': Maps to DiarySearchAPIView.as_view(), accessible with the name 'diary-search'.
+    - 'resume/versions/': Maps to ResumeVersionListAPIView.as_view(), accessible with the name 'resume-versions'.
+    - 'resume/tailor/': Maps to TailorAPIView.as_view(), accessible with the name 'resume-tailor'.
+    - 'resume/pdf/': Maps to ResumePdfAPIView.as_view(), accessible with the name 'resume-pdf'.
+    - 'resume/jobs/': Maps to ResumeJobAPIView.as_view(), accessible with the name 'resume-jobs'.
+    - 'resume/jobs/<uuid:job_id>/': Maps to ResumeJobDetailAPIView.as_view(), accessible with the name 'resume-job-detail'.
+    - 'resume/stream/': Maps to the async resume_stream view (server-sent events), accessible with the name 'resume-stream'.
+    - 'resume/cache/stats/': Maps to ResumeCacheStatsAPIView.as_view(), accessible with the name 'resume-cache-stats'.
+    - 'metrics/': Maps to metrics_view (Prometheus text format), accessible with the name 'metrics'.
 
 Imports:
     - path: Function to define URL patterns.
+    - settings: Django settings (RESUME_ASYNC_VIEWS).
     - ResumeAPIView: View to handle requests to the 'resume/' URL.
+    - ResumeRegenerateAPIView: View that incrementally regenerates a user's resume from new diary entries.
+    - DiaryEntryAPIView: View that stores and lists diary entries.
+    - DiarySearchAPIView: View searching a user's diary entries (full-text index).
+    - ResumeVersionListAPIView: View listing a user's resume versions.
+    - TailorAPIView: View tailoring a user's resume or cover letter to a job description.
+    - ResumePdfAPIView: View exporting a user's resume as a cached PDF.
+    - ResumeJobAPIView: View that queues asynchronous resume generation jobs.
+    - ResumeJobDetailAPIView: View reporting the status and result of a resume job.
+    - resume_async: Async version of ResumeAPIView for ASGI deployments.
+    - resume_stream: Async view streaming the resume sections as server-sent events.
+    - ResumeCacheStatsAPIView: View exposing the provider result cache counters.
+    - metrics_view: View exposing the Prometheus metrics.
 """
-from api.views import ResumeAPIView
+from django.conf import settings
+
+from api.views import (
+    DiaryEntryAPIView,
+    DiarySearchAPIView,
+    ResumeAPIView,
+    ResumeCacheStatsAPIView,
+    ResumeJobAPIView,
+    ResumeJobDetailAPIView,
+    ResumePdfAPIView,
+    ResumeRegenerateAPIView,
+    ResumeVersionListAPIView,
+    TailorAPIView,
+    metrics_view,
+    resume_async,
+    resume_stream,
+)
 
 # Define the URL patterns for the dagbok application.
 urlpatterns = [
-    path('resume/', ResumeAPIView.as_view(), name='resume'),
+    path('resume/', resume_async if settings.RESUME_ASYNC_VIEWS else ResumeAPIView.as_view(), name='resume'),
+    path('resume/regenerate/', ResumeRegenerateAPIView.as_view(), name='resume-regenerate'),
+    path('diary/entries/', DiaryEntryAPIView.as_view(), name='diary-entries'),
+    path('diary/search/', DiarySearchAPIView.as_view(), name='diary-search'),
+    path('resume/versions/', ResumeVersionListAPIView.as_view(), name='resume-versions'),
+    path('resume/tailor/', TailorAPIView.as_view(), name='resume-tailor'),
+    path('resume/pdf/', ResumePdfAPIView.as_view(), name='resume-pdf'),
+    path('resume/jobs/', ResumeJobAPIView.as_view(), name='resume-jobs'),
+    path('resume/jobs/<uuid:job_id>/', ResumeJobDetailAPIView.as_view(), name='resume-job-detail'),
+    path('resume/stream/', resume_stream, name='resume-stream'),
+    path('resume/cache/stats/', ResumeCacheStatsAPIView.as_view(), name='resume-cache-stats'),
+    path('metrics/', metrics_view, name='metrics'),
 ]